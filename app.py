@@ -1,23 +1,64 @@
+# Lo primero: cronometrar todo lo que se importa al arrancar (ver utils/arranque.py)
+from utils import arranque
+arranque.iniciar()
+
 import dash
 from dash import Dash, html, dcc
 import dash_bootstrap_components as dbc
 from dotenv import load_dotenv
+from flask import jsonify
+import diskcache
 import os
 
 # Cargar variables de entorno (GOOGLE_API_KEY)
+# Va antes de importar utils/, que lee su configuración del entorno.
 load_dotenv()
 
+from utils.config import CACHE_DIR
+from utils import (assets, biblioteca, cache_respuestas, estructurado, metricas, procesos, prompts, similares,
+                   vuelo_unico)
+
+# --- Gestor de Callbacks en Segundo Plano ---
+# Los callbacks largos (ej. la generación con Gemini) corren fuera del request
+# y van publicando su progreso en este caché en disco, que comparten todos
+# los workers de Gunicorn. Con workers en modo hilos, cada trabajo se lanza
+# cuando ningún otro pedido del worker está usando SQLite (ver utils/procesos.py).
+background_callback_manager = procesos.GestorSegundoPlano(diskcache.Cache(os.path.join(CACHE_DIR, 'callbacks')))
+
 # Inicializar la app de Dash
 # use_pages=True activa la carpeta /pages
 # external_stylesheets nos da un look profesional (Bootstrap)
-app = Dash(__name__, 
-           use_pages=True, 
-           external_stylesheets=[dbc.themes.BOOTSTRAP],
-           suppress_callback_exceptions=True)
+with arranque.medir('Dash + páginas'):
+    app = Dash(__name__, 
+               use_pages=True, 
+               external_stylesheets=[dbc.themes.BOOTSTRAP],
+               background_callback_manager=background_callback_manager,
+               suppress_callback_exceptions=True)
 
 # Exponer el servidor Flask para el despliegue (ej. Gunicorn)
 server = app.server
 
+# Caché largo para /assets y compresión gzip/brotli de las respuestas
+assets.configurar_servidor(server)
+# Latencia de callbacks, Gemini y PDFs en /metrics (formato Prometheus)
+metricas.configurar_servidor(server)
+# Los forks de los callbacks en segundo plano esperan a los pedidos en curso
+procesos.configurar_servidor(server)
+
+# Contadores del caché de respuestas (aciertos, fallos, ahorro), de pedidos similares, de la
+# biblioteca, de los pedidos idénticos en curso que compartieron una sola llamada y de las
+# rúbricas reutilizadas por los planes estructurados
+@server.route('/api/cache/estadisticas')
+def estadisticas_cache():
+    return jsonify({**cache_respuestas.resumen(), 'similares': similares.resumen(),
+                    'biblioteca': biblioteca.resumen(), 'vuelo_unico': vuelo_unico.resumen(),
+                    'rubricas': estructurado.resumen()})
+
+# Tokens de los prompts antes/después de limpiarlos y recortarlos
+@server.route('/api/prompts/estadisticas')
+def estadisticas_prompts():
+    return jsonify(prompts.resumen())
+
 # --- El "Caparazón" de la App ---
 app.layout = dbc.Container(
     [
@@ -26,11 +67,12 @@ app.layout = dbc.Container(
         dbc.NavbarSimple(
             children=[
                 # Crear un link para cada página registrada en la carpeta /pages
-                # Excluimos las páginas legales que irán en el footer
+                # Excluimos las páginas legales que irán en el footer y las estadísticas internas
                 dbc.NavItem(dbc.NavLink(page['name'], href=page['relative_path']))
-                for page in dash.page_registry.values() if page['path'] not in ['/terminos-y-condiciones', '/politica-de-privacidad']
+                for page in dash.page_registry.values()
+                if page['path'] not in ['/terminos-y-condiciones', '/politica-de-privacidad', '/feedback/estadisticas']
             ],
-            brand=html.Img(src='/assets/Guidia_Texto.png', height='30px'),
+            brand=assets.imagen('Guidia_Texto.png', alto=30, alt='Guidia'),
             brand_href="/",
             color="primary",
             dark=True,
@@ -63,5 +105,11 @@ app.layout = dbc.Container(
     fluid=True # Usar todo el ancho de la pantalla
 )
 
+# Con Gunicorn y preload_app, cargar ahora lo pesado para que los workers lo
+# hereden ya importado; si no, se carga con la primera generación/PDF
+if arranque.PRECARGA:
+    arranque.precargar()
+arranque.reporte()
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
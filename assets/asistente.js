@@ -0,0 +1,166 @@
+/* assets/asistente.js
+ * Callbacks del navegador (clientside) de la página Asistente IA.
+ * Solo muestran/ocultan tarjetas y arman opciones: corren en el navegador,
+ * sin ir al servidor, así el formulario responde al instante aunque los
+ * workers estén ocupados con Gemini. Dash carga este archivo solo.
+ */
+(function () {
+    var VISIBLE = {'display': 'block'};
+    var OCULTO = {'display': 'none'};
+
+    function visibleSi(condicion) {
+        return condicion ? VISIBLE : OCULTO;
+    }
+
+    // Tipos de plan que se ofrecen según el nivel elegido
+    var OPCIONES_PLAN = {
+        'Primario': [
+            {'label': 'Plan Anual (Parrilla)', 'value': 'Anual-Primaria'},
+            {'label': 'Plan Mensual (Actividades y Rúbricas)', 'value': 'Mensual-Primaria'}
+        ],
+        'Secundario': [
+            {'label': 'Plan Anual (desde Libro Matriz)', 'value': 'Anual-Secundaria'},
+            {'label': 'Plan Mensual (desde Anual)', 'value': 'Mensual-Secundaria'}
+        ]
+    };
+    // Default o Nivel Inicial
+    var OPCIONES_PLAN_OTRO = [{'label': 'Planificación de Actividades', 'value': 'Actividades'}];
+
+    var PLANES_MENSUALES = ['Mensual-Primaria', 'Mensual-Secundaria'];
+
+    window.dash_clientside = window.dash_clientside || {};
+    window.dash_clientside.asistente = {
+        // Tarjeta de la acción elegida (crear / analizar / adaptar)
+        mostrarFormularioPrincipal: function (accion) {
+            return [
+                visibleSi(accion === 'crear'),
+                visibleSi(accion === 'analizar'),
+                visibleSi(accion === 'adaptar')
+            ];
+        },
+
+        // Niveles y contexto de la escuela elegida (se busca por id en el perfil)
+        actualizarNivelesYContexto: function (escuelaId, datosPerfil) {
+            var escuela = buscarEscuela(datosPerfil, escuelaId);
+            if (!escuela) {
+                return [[], null, ''];
+            }
+            var niveles = escuela.niveles || [];
+            var contexto = 'contexto' in escuela ? escuela.contexto : 'Urbana';
+            var opciones = niveles.map(function (nivel) {
+                return {'label': nivel, 'value': nivel};
+            });
+            // Seleccionar automáticamente el primer nivel si existe
+            return [opciones, opciones.length ? opciones[0].value : null, contexto];
+        },
+
+        // Campos y tipos de plan propios del nivel (Primaria vs Secundaria)
+        mostrarContextoEspecificoCrear: function (nivel) {
+            var esOtro = nivel !== 'Primario' && nivel !== 'Secundario';
+            return [
+                visibleSi(nivel === 'Primario'),
+                visibleSi(nivel === 'Secundario'),
+                visibleSi(esOtro),
+                // Al cambiar de nivel los campos arrancan vacíos
+                null, null, null,
+                esOtro ? OPCIONES_PLAN_OTRO : OPCIONES_PLAN[nivel]
+            ];
+        },
+
+        // El campo de mes solo tiene sentido en los planes mensuales
+        toggleMesContainer: function (tipoPlan) {
+            return visibleSi(PLANES_MENSUALES.indexOf(tipoPlan) !== -1);
+        },
+
+        // Arma el pedido de "Generar" con los campos de la acción elegida
+        // solamente (no viajan los textos pegados en las otras tarjetas).
+        // Las claves son los nombres de los argumentos en Python.
+        empaquetarSolicitud: function (nClicks, accion, escuelaId, nivel, contexto,
+                                       tipoPlan, materia, anoGrado, mesPlan, cantAlumnos,
+                                       diasClase, cantEval, cantTps, inclusionCant,
+                                       planBaseCrear, diasPatios, libroMatriz, contextoGeneral,
+                                       accionAnalizar, planBaseAnalizar,
+                                       inclusionAdaptar, planBaseAdaptar, regenerar, estructurado) {
+            var solicitud = {'n_clicks': nClicks, 'accion': accion, 'regenerar': regenerar};
+            if (accion === 'crear') {
+                Object.assign(solicitud, camposCrear(escuelaId, nivel, contexto, tipoPlan, materia, anoGrado,
+                    cantAlumnos, diasClase, cantEval, cantTps, inclusionCant,
+                    planBaseCrear, diasPatios, libroMatriz, contextoGeneral));
+                solicitud.mes_plan = mesPlan;
+                solicitud.plan_estructurado = estructurado;
+            } else if (accion === 'analizar') {
+                Object.assign(solicitud, {'escuela_id': escuelaId, 'accion_analizar': accionAnalizar,
+                                          'plan_base_analizar': planBaseAnalizar});
+            } else if (accion === 'adaptar') {
+                Object.assign(solicitud, {'escuela_id': escuelaId, 'inclusion_adaptar': inclusionAdaptar,
+                                          'plan_base_adaptar': planBaseAdaptar});
+            }
+            return solicitud;
+        },
+
+        // Identificador al azar de este navegador para el historial de planes
+        // (se crea una sola vez y queda en localStorage)
+        asegurarIdHistorial: function (_modificado, actual) {
+            if (typeof actual === 'string' && /^[0-9a-f]{32}$/.test(actual)) {
+                return window.dash_clientside.no_update;
+            }
+            var bytes = new Uint8Array(16);
+            window.crypto.getRandomValues(bytes);
+            return Array.prototype.map.call(bytes, function (b) {
+                return ('0' + b.toString(16)).slice(-2);
+            }).join('');
+        },
+
+        // "Regenerar esta parte": la parte se identifica por su clave (utils/secciones.py).
+        // Al redibujar el plan los botones nuevos disparan este callback sin clic.
+        pedirSeccion: function (_clics, resultadoId, indicaciones) {
+            var disparo = window.dash_clientside.callback_context.triggered[0];
+            if (!disparo || !disparo.value || !resultadoId) {
+                return window.dash_clientside.no_update;
+            }
+            var boton = JSON.parse(disparo.prop_id.split('.n_clicks')[0]);
+            return {'clave': boton.index, 'resultado_id': resultadoId,
+                    'indicaciones': indicaciones || null, 'momento': Date.now()};
+        },
+
+        // Igual, para "Generar Meses en Lote"
+        empaquetarLote: function (nClicks, escuelaId, nivel, contexto, tipoPlan, materia, anoGrado,
+                                  cantAlumnos, diasClase, cantEval, cantTps, inclusionCant,
+                                  planBaseCrear, diasPatios, libroMatriz, contextoGeneral,
+                                  mesDesde, mesHasta, regenerar) {
+            var solicitud = camposCrear(escuelaId, nivel, contexto, tipoPlan, materia, anoGrado,
+                cantAlumnos, diasClase, cantEval, cantTps, inclusionCant,
+                planBaseCrear, diasPatios, libroMatriz, contextoGeneral);
+            return Object.assign(solicitud, {'n_clicks': nClicks, 'mes_desde': mesDesde,
+                                             'mes_hasta': mesHasta, 'regenerar': regenerar});
+        }
+    };
+
+    // Mismo criterio que utils/perfil.cargar(): dict, o string JSON de versiones anteriores
+    function buscarEscuela(datosPerfil, escuelaId) {
+        if (escuelaId === null || escuelaId === undefined || !datosPerfil) {
+            return null;
+        }
+        var perfil = typeof datosPerfil === 'string' ? JSON.parse(datosPerfil) : datosPerfil;
+        perfil = perfil.perfil || perfil;
+        var instituciones = perfil.instituciones || [];
+        for (var i = 0; i < instituciones.length; i++) {
+            if (instituciones[i].id === escuelaId) {
+                return instituciones[i];
+            }
+        }
+        return null;
+    }
+
+    function camposCrear(escuelaId, nivel, contexto, tipoPlan, materia, anoGrado,
+                         cantAlumnos, diasClase, cantEval, cantTps, inclusionCant,
+                         planBaseCrear, diasPatios, libroMatriz, contextoGeneral) {
+        return {
+            'escuela_id': escuelaId, 'nivel': nivel, 'contexto': contexto,
+            'tipo_plan_crear': tipoPlan, 'materia': materia, 'ano_grado': anoGrado,
+            'cant_alumnos': cantAlumnos, 'dias_clase': diasClase, 'cant_eval': cantEval,
+            'cant_tps': cantTps, 'inclusion_cant': inclusionCant, 'plan_base_crear': planBaseCrear,
+            'dias_patios': diasPatios, 'libro_matriz': libroMatriz, 'contexto_general': contextoGeneral
+        };
+    }
+})();
@@ -0,0 +1,14 @@
+"""La app de Guidia con Gemini simulado (ver benchmarks/gemini_falso.py).
+
+Es lo que levanta benchmarks/carga.py; también se puede usar a mano:
+    gunicorn -c gunicorn.conf.py benchmarks.app_simulada:server
+"""
+import os
+
+os.environ.setdefault('GOOGLE_API_KEY', 'simulada')  # La página exige una clave configurada
+
+from benchmarks import gemini_falso  # noqa: E402
+
+gemini_falso.instalar()
+
+from app import app, server  # noqa: E402,F401
@@ -0,0 +1,104 @@
+"""Benchmark del export a PDF con planes grandes generados sintéticamente.
+
+Compara el render anterior (Markdown -> <br> -> write_html, con fallback a
+texto plano) contra el renderer de utils/markdown_pdf.py.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_pdf [--meses 1 4 10] [--repeticiones 3]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fpdf import FPDF  # noqa: E402
+
+from utils import markdown_pdf, pdf  # noqa: E402
+from utils.config import BASE_DIR  # noqa: E402
+
+fallbacks_anterior = 0  # Veces que write_html falló y hubo que renderizar de nuevo
+
+MESES = ['Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+DESAFIOS = ['TDAH', 'Dislexia', 'TDA', 'TEA', 'Discalculia', 'Altas Capacidades']
+
+
+def plan_sintetico(meses):
+    """Un plan con la forma típica de las respuestas de Gemini."""
+    partes = ["# Planificación Anual – Matemática 5to Grado\n",
+              "**Escuela:** 4-123 (Urbana) · **Docente:** Ana\n"]
+    for mes in MESES[:meses]:
+        partes.append(f"## {mes}: Números y Operaciones\n")
+        partes.append("**Objetivo:** que los alumnos *comprendan* el valor posicional y resuelvan problemas "
+                      "en contexto, trabajando en grupos y con material concreto.\n")
+        for semana in range(1, 5):
+            partes.append(f"### Semana {semana}\n")
+            partes.append("  * **Inicio:** problema disparador con la recta numérica.\n"
+                          "  * **Desarrollo:** juego de cartas con descomposiciones aditivas.\n"
+                          "  * **Cierre:** puesta en común y registro en el cuaderno.\n")
+        partes.append(f"### Rúbricas de {mes}\n")
+        partes.append("| Desafío | Criterio | Logrado | En proceso | No logrado |\n|---|---|---|---|---|")
+        for desafio in DESAFIOS:
+            partes.append(f"| {desafio} | **Resolución** de problemas | Resuelve solo | Con apoyo | No resuelve |")
+        partes.append("")
+    return '\n'.join(partes)
+
+
+def render_anterior(markdown_text):
+    # Reproduce el camino anterior: fuente nueva por clic, write_html y fallback
+    global fallbacks_anterior
+    try:
+        documento = FPDF()
+        documento.add_page()
+        documento.add_font('Arial', '', os.path.join(BASE_DIR, 'fonts', 'arial.ttf'))
+        documento.set_font('Arial', size=12)
+        documento.write_html(markdown_text.replace('\n', '<br>'))
+        return bytes(documento.output())
+    except Exception:
+        fallbacks_anterior += 1
+        documento = FPDF()
+        documento.add_page()
+        documento.add_font('Arial', '', os.path.join(BASE_DIR, 'fonts', 'arial.ttf'))
+        documento.set_font('Arial', size=12)
+        documento.multi_cell(0, 10, markdown_text)
+        return bytes(documento.output())
+
+
+def render_nuevo(markdown_text):
+    documento = pdf.nuevo_pdf()
+    markdown_pdf.renderizar(documento, markdown_text)
+    return bytes(documento.output())
+
+
+def medir(funcion, markdown_text, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(markdown_text)
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), len(resultado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--meses', type=int, nargs='+', default=[1, 4, 10])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    global fallbacks_anterior
+    pdf.precargar_fuentes()
+    print(f"{'meses':>5} {'KB md':>7} {'anterior (s)':>13} {'fallback':>9} {'nuevo (s)':>10} {'x':>6} {'KB pdf':>7}")
+    for meses in args.meses:
+        markdown_text = plan_sintetico(meses)
+        fallbacks_anterior = 0
+        t_anterior, _ = medir(render_anterior, markdown_text, args.repeticiones)
+        hubo_fallback = 'sí' if fallbacks_anterior else 'no'
+        t_nuevo, tamano = medir(render_nuevo, markdown_text, args.repeticiones)
+        print(f"{meses:>5} {len(markdown_text) / 1024:>7.1f} {t_anterior:>13.3f} {hubo_fallback:>9} {t_nuevo:>10.3f} "
+              f"{t_anterior / t_nuevo:>6.2f} {tamano / 1024:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
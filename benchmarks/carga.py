@@ -0,0 +1,318 @@
+"""Prueba de carga de Guidia con Gemini simulado (benchmarks/gemini_falso.py).
+
+Por cada configuración de Gunicorn (workers x hilos) levanta la app de
+benchmarks/app_simulada.py y simula docentes que, en bucle, guardan su
+perfil, generan una planificación y descargan el PDF. Todo va por
+/_dash-update-component, igual que desde el navegador (los callbacks en
+segundo plano se consultan hasta que terminan). Informa el throughput y los
+percentiles p50/p95/p99 de cada callback, y agrega los resultados a
+benchmarks/resultados/carga.jsonl para compararlos con corridas anteriores.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.carga --configuraciones 1x1 2x1 2x4 --docentes 10 --duracion 60
+    python -m benchmarks.carga --latencia 3 --errores 429:0.05,503:0.01
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import biblioteca  # noqa: E402
+from utils.config import BASE_DIR  # noqa: E402
+
+ARCHIVO_RESULTADOS = os.path.join(BASE_DIR, 'benchmarks', 'resultados', 'carga.jsonl')
+INTERVALO_SONDEO = 0.25  # El navegador consulta cada 500 ms; un poco más seguido para medir mejor
+TIMEOUT_CALLBACK = 300
+
+# Callbacks que recorre cada docente: nombre en el informe -> parte de su salida
+CALLBACKS = {
+    'guardar_perfil': 'session-storage.data',
+    'registrar_solicitud': 'ia-solicitud-id.data',
+    'generar_respuesta': '..ia-output-div-unificado.children...ia-resultado-id.data..',
+    'descargar_pdf': 'download-pdf.data',
+}
+
+
+class Cliente:
+    """Arma y manda las peticiones de callbacks como lo hace el navegador."""
+
+    def __init__(self, url):
+        self.url = url
+        self.dependencias = requests.get(f'{url}/_dash-dependencies', timeout=30).json()
+
+    def _dependencia(self, salida):
+        for dependencia in self.dependencias:
+            if salida in dependencia['output']:
+                return dependencia
+        raise KeyError(salida)
+
+    @staticmethod
+    def _valor(entrada, valores):
+        componente = entrada['id']
+        if isinstance(componente, str) and componente.startswith('{'):
+            componente = json.loads(componente)
+        if isinstance(componente, dict):  # Pattern-matching (ALL): una entrada por componente
+            return [{'id': {**componente, 'index': i}, 'property': entrada['property'], 'value': valor}
+                    for i, valor in enumerate(valores.get(componente['type'], []))]
+        return {'id': componente, 'property': entrada['property'], 'value': valores.get(componente)}
+
+    def _cuerpo(self, dependencia, valores):
+        salidas = []
+        for salida in dependencia['output'].strip('.').split('...'):
+            componente, propiedad = salida.rsplit('.', 1)
+            salidas.append({'id': json.loads(componente) if componente.startswith('{') else componente,
+                            'property': propiedad.split('@')[0]})
+        disparador = dependencia['inputs'][0]
+        return {
+            'output': dependencia['output'],
+            'outputs': salidas if len(salidas) > 1 else salidas[0],
+            'inputs': [self._valor(e, valores) for e in dependencia['inputs']],
+            'state': [self._valor(e, valores) for e in dependencia['state']],
+            'changedPropIds': [f"{disparador['id']}.{disparador['property']}"],
+        }
+
+    def llamar(self, sesion, salida, valores):
+        """Respuesta final del callback (esperando a los que corren en segundo plano)."""
+        cuerpo = self._cuerpo(self._dependencia(salida), valores)
+        url = f'{self.url}/_dash-update-component'
+        respuesta = sesion.post(url, json=cuerpo, timeout=TIMEOUT_CALLBACK)
+        respuesta.raise_for_status()
+        datos = respuesta.json() if respuesta.status_code != 204 else {}
+        limite = time.monotonic() + TIMEOUT_CALLBACK
+        while 'cacheKey' in datos:
+            if time.monotonic() > limite:
+                raise TimeoutError(salida)
+            time.sleep(INTERVALO_SONDEO)
+            respuesta = sesion.post(url, json=cuerpo, timeout=TIMEOUT_CALLBACK,
+                                    params={'cacheKey': datos['cacheKey'], 'job': datos['job']})
+            respuesta.raise_for_status()
+            parcial = respuesta.json() if respuesta.status_code != 204 else {}
+            if parcial.get('response') or parcial.get('done'):
+                return parcial
+        return datos
+
+
+class Mediciones:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tiempos = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.flujos = 0
+
+    def medir(self, nombre, funcion):
+        inicio = time.perf_counter()
+        try:
+            resultado = funcion()
+        except Exception:
+            with self.lock:
+                self.errores[nombre] += 1
+            raise
+        with self.lock:
+            self.tiempos[nombre].append(time.perf_counter() - inicio)
+        return resultado
+
+    def error(self, nombre):
+        with self.lock:
+            self.errores[nombre] += 1
+
+
+def _docente(numero, cliente, mediciones, fin):
+    sesion = requests.Session()
+    nivel = random.choice(['Primario', 'Secundario'])
+    id_historial = secrets.token_hex(16)  # Como el que crea assets/asistente.js en cada navegador
+    valores = {
+        'guardar-perfil-btn': 1, 'perfil-nombre': f'Docente {numero}', 'perfil-apellido': 'Carga',
+        'perfil-correo': None, 'escuela-nombre': [f'Escuela {numero % 7}'], 'escuela-niveles': [[nivel]],
+        'escuela-contexto': ['Urbana'],
+    }
+    while time.monotonic() < fin:
+        try:
+            perfil = mediciones.medir('guardar_perfil', lambda: cliente.llamar(
+                sesion, CALLBACKS['guardar_perfil'], valores))['response']['session-storage']['data']
+
+            # Lo mismo que arma assets/asistente.js (empaquetarSolicitud) para "Crear"
+            solicitud = {
+                'n_clicks': 1, 'accion': 'crear', 'regenerar': False, 'escuela_id': 0, 'nivel': nivel,
+                'contexto': 'Urbana', 'tipo_plan_crear': random.choice(biblioteca.TIPOS_PLAN[nivel]),
+                'materia': random.choice(biblioteca.MATERIAS[nivel]),
+                'ano_grado': random.choice(biblioteca.GRADOS[nivel]), 'mes_plan': None,
+                'cant_alumnos': random.randint(20, 35), 'dias_clase': 20, 'cant_eval': 2, 'cant_tps': 3,
+                'inclusion_cant': [random.randint(0, 2) for _ in range(6)], 'plan_base_crear': None,
+                'dias_patios': None, 'libro_matriz': None, 'contexto_general': None,
+            }
+            solicitud_id = mediciones.medir('registrar_solicitud', lambda: cliente.llamar(
+                sesion, CALLBACKS['registrar_solicitud'], {'ia-solicitud': solicitud}))['response']['ia-solicitud-id']['data']
+
+            respuesta = mediciones.medir('generar_respuesta', lambda: cliente.llamar(
+                sesion, CALLBACKS['generar_respuesta'], {'ia-solicitud-id': solicitud_id, 'session-storage': perfil,
+                                                           'historial-docente': id_historial}))
+            resultado_id = respuesta['response']['ia-resultado-id']['data']
+            if not resultado_id:  # La página mostró un mensaje de error en vez de un plan
+                mediciones.error('generar_respuesta')
+                continue
+
+            mediciones.medir('descargar_pdf', lambda: cliente.llamar(
+                sesion, CALLBACKS['descargar_pdf'], {'btn-download-pdf': 1, 'ia-resultado-id': resultado_id}))
+            with mediciones.lock:
+                mediciones.flujos += 1
+        except Exception:
+            time.sleep(1)  # Ya quedó contado; no martillar un servidor caído
+
+
+def _percentiles(tiempos):
+    if len(tiempos) < 2:
+        return {'p50': tiempos[0] if tiempos else None, 'p95': None, 'p99': None}
+    cortes = statistics.quantiles(tiempos, n=100, method='inclusive')
+    return {'p50': cortes[49], 'p95': cortes[94], 'p99': cortes[98]}
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _levantar(workers, hilos, entorno):
+    puerto = _puerto_libre()
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers),
+         '--threads', str(hilos), '--bind', f'127.0.0.1:{puerto}', 'benchmarks.app_simulada:server'],
+        cwd=BASE_DIR, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f'http://127.0.0.1:{puerto}'
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        try:
+            if requests.get(f'{url}/_dash-dependencies', timeout=2).ok:
+                return proceso, url
+        except requests.ConnectionError:
+            time.sleep(0.5)
+    proceso.kill()
+    raise RuntimeError('Gunicorn no arrancó en 60 s')
+
+
+def correr(configuracion, args, entorno):
+    workers, hilos = (int(x) for x in configuracion.split('x'))
+    with tempfile.TemporaryDirectory() as carpeta_cache:
+        # Cachés vacíos en cada corrida: se mide la generación, no el caché
+        proceso, url = _levantar(workers, hilos, {**entorno, 'GUIDIA_CACHE_DIR': carpeta_cache})
+        try:
+            cliente = Cliente(url)
+            mediciones = Mediciones()
+            fin = time.monotonic() + args.duracion
+            docentes = [threading.Thread(target=_docente, args=(i, cliente, mediciones, fin))
+                        for i in range(args.docentes)]
+            inicio = time.perf_counter()
+            for docente in docentes:
+                docente.start()
+            for docente in docentes:
+                docente.join()
+            segundos = time.perf_counter() - inicio
+        finally:
+            proceso.terminate()
+            proceso.wait(timeout=30)
+
+    callbacks = {}
+    for nombre in CALLBACKS:
+        tiempos = mediciones.tiempos[nombre]
+        callbacks[nombre] = {'n': len(tiempos), 'errores': mediciones.errores[nombre],
+                             'por_segundo': len(tiempos) / segundos, **_percentiles(tiempos)}
+    return {'configuracion': configuracion, 'segundos': segundos, 'flujos': mediciones.flujos,
+            'flujos_por_minuto': mediciones.flujos * 60 / segundos, 'callbacks': callbacks}
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _anterior(parametros):
+    """La última corrida guardada con los mismos parámetros, o None."""
+    if not os.path.exists(ARCHIVO_RESULTADOS):
+        return None
+    anterior = None
+    with open(ARCHIVO_RESULTADOS, encoding='utf-8') as archivo:
+        for linea in archivo:
+            corrida = json.loads(linea)
+            if corrida['parametros'] == parametros:
+                anterior = corrida
+    return anterior
+
+
+def _ms(valor):
+    return f'{valor * 1000:>8.0f}' if valor is not None else f'{"-":>8}'
+
+
+def informar(resultado, anterior):
+    previo = None
+    if anterior:
+        previo = next((r for r in anterior['resultados'] if r['configuracion'] == resultado['configuracion']), None)
+    print(f"\n== {resultado['configuracion']} (workers x hilos): {resultado['flujos']} flujos completos, "
+          f"{resultado['flujos_por_minuto']:.1f}/min ==")
+    print(f"{'callback':<20} {'n':>5} {'err':>4} {'req/s':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+          + (f" {'p95 antes':>9}" if previo else ''))
+    for nombre, datos in resultado['callbacks'].items():
+        linea = (f"{nombre:<20} {datos['n']:>5} {datos['errores']:>4} {datos['por_segundo']:>6.2f} "
+                 f"{_ms(datos['p50'])} {_ms(datos['p95'])} {_ms(datos['p99'])}")
+        if previo:
+            linea += f" {_ms(previo['callbacks'][nombre]['p95']):>9}"
+        print(linea)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--configuraciones', nargs='+', default=['1x1', '2x1', '2x4'], help='workers x hilos')
+    parser.add_argument('--docentes', type=int, default=10, help='docentes simulados en paralelo')
+    parser.add_argument('--duracion', type=float, default=60, help='segundos por configuración')
+    parser.add_argument('--latencia', type=float, default=8, help='segundos promedio de Gemini')
+    parser.add_argument('--variacion', type=float, default=0.3)
+    parser.add_argument('--primer-fragmento', type=float, default=1)
+    parser.add_argument('--tokens', type=int, default=1500)
+    parser.add_argument('--errores', default='', help='ej. 429:0.05,503:0.01')
+    parser.add_argument('--sin-guardar', action='store_true', help=f'no agregar a {ARCHIVO_RESULTADOS}')
+    args = parser.parse_args()
+
+    parametros = {'docentes': args.docentes, 'duracion': args.duracion, 'latencia': args.latencia,
+                  'variacion': args.variacion, 'primer_fragmento': args.primer_fragmento,
+                  'tokens': args.tokens, 'errores': args.errores}
+    entorno = {
+        **os.environ,
+        'GUIDIA_FALSO_LATENCIA': str(args.latencia), 'GUIDIA_FALSO_VARIACION': str(args.variacion),
+        'GUIDIA_FALSO_PRIMER_FRAGMENTO': str(args.primer_fragmento), 'GUIDIA_FALSO_TOKENS': str(args.tokens),
+        'GUIDIA_FALSO_ERRORES': args.errores,
+    }
+    anterior = _anterior(parametros)
+    resultados = []
+    for configuracion in args.configuraciones:
+        resultado = correr(configuracion, args, entorno)
+        informar(resultado, anterior)
+        resultados.append(resultado)
+
+    if not args.sin_guardar:
+        os.makedirs(os.path.dirname(ARCHIVO_RESULTADOS), exist_ok=True)
+        corrida = {'fecha': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': _commit(),
+                   'parametros': parametros, 'resultados': resultados}
+        with open(ARCHIVO_RESULTADOS, 'a', encoding='utf-8') as archivo:
+            archivo.write(json.dumps(corrida, ensure_ascii=False) + '\n')
+        print(f"\nResultados agregados a {os.path.relpath(ARCHIVO_RESULTADOS, BASE_DIR)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Gemini simulado para pruebas de carga (sin API key ni costo).
+
+Reemplaza los modelos de utils/llm.py por uno local que responde un plan
+sintético (o un JSON, en el modo estructurado) con la latencia, el streaming y los errores que se configuren por
+variables de entorno (así también los heredan los workers de Gunicorn y los
+procesos de los callbacks en segundo plano):
+
+    GUIDIA_FALSO_LATENCIA           segundos promedio de una respuesta completa (8)
+    GUIDIA_FALSO_LATENCIA_RAPIDO    lo mismo para los modelos "flash" (un tercio de la anterior)
+    GUIDIA_FALSO_VARIACION          desvío relativo de esa latencia, log-normal (0.3)
+    GUIDIA_FALSO_PRIMER_FRAGMENTO   segundos hasta el primer fragmento en streaming (1)
+    GUIDIA_FALSO_FRAGMENTOS         fragmentos en los que llega la respuesta (20)
+    GUIDIA_FALSO_TOKENS             tamaño aproximado de la respuesta (1500)
+    GUIDIA_FALSO_ERRORES            probabilidad de error por código, ej. "429:0.05,503:0.01"
+"""
+import asyncio
+import json
+import math
+import os
+import random
+
+from benchmarks.bench_pdf import plan_sintetico
+from utils.prompts import CARACTERES_POR_TOKEN
+
+LATENCIA = float(os.environ.get('GUIDIA_FALSO_LATENCIA', 8))
+LATENCIA_RAPIDO = float(os.environ.get('GUIDIA_FALSO_LATENCIA_RAPIDO', LATENCIA / 3))
+VARIACION = float(os.environ.get('GUIDIA_FALSO_VARIACION', 0.3))
+PRIMER_FRAGMENTO = float(os.environ.get('GUIDIA_FALSO_PRIMER_FRAGMENTO', 1))
+FRAGMENTOS = int(os.environ.get('GUIDIA_FALSO_FRAGMENTOS', 20))
+TOKENS = int(os.environ.get('GUIDIA_FALSO_TOKENS', 1500))
+ERRORES = {int(codigo): float(probabilidad)
+           for codigo, probabilidad in (par.split(':') for par in os.environ.get('GUIDIA_FALSO_ERRORES', '').split(',') if par)}
+
+_TEXTO = plan_sintetico(10)[:TOKENS * CARACTERES_POR_TOKEN]
+
+# Respuestas del modo estructurado (utils/estructurado.py)
+_ACTIVIDAD = {'titulo': "Actividad de práctica", 'descripcion': "Resolución guiada en parejas. " * 4,
+              'duracion': "80 minutos", 'adaptaciones': ["Consignas cortas y de a una.", "Tiempo extra."]}
+_JSON_PLAN = json.dumps({
+    'titulo': "Planificación sintética", 'fundamentacion': "Texto de fundamentación. " * 10,
+    'unidades': [{'titulo': f"Unidad sintética {n}", 'periodo': "Marzo", 'objetivos': ["Comprender el tema."] * 3,
+                  'contenidos': ["Contenido del tema."] * 4, 'actividades': [_ACTIVIDAD] * 3,
+                  'evaluacion': "Trabajo práctico grupal."} for n in range(1, 5)],
+}, ensure_ascii=False)
+_JSON_RUBRICA = json.dumps({
+    'criterios': [{'criterio': f"Criterio {n}", 'logrado': "Lo hace solo.", 'en_proceso': "Con ayuda.",
+                   'inicial': "Todavía no."} for n in range(1, 6)],
+    'sugerencias': ["Evaluar en forma oral.", "Dar más tiempo."],
+}, ensure_ascii=False)
+
+
+def _latencia(media):
+    # Log-normal con la media pedida: casi todas cerca del promedio, algunas muy lentas
+    if media <= 0:
+        return 0.0
+    sigma = math.sqrt(math.log(1 + VARIACION ** 2))
+    return random.lognormvariate(math.log(media) - sigma ** 2 / 2, sigma)
+
+
+def _error():
+    from google.api_core import exceptions
+    sorteo = random.random()
+    for codigo, probabilidad in ERRORES.items():
+        if sorteo < probabilidad:
+            return exceptions.from_http_status(codigo, 'Error simulado')
+        sorteo -= probabilidad
+    return None
+
+
+class _Fragmento:
+    def __init__(self, texto):
+        self.text = texto
+
+
+class _Streaming:
+    def __init__(self, total, texto):
+        self.total = total
+        self.texto = texto
+
+    async def __aiter__(self):
+        await asyncio.sleep(min(PRIMER_FRAGMENTO, self.total))
+        largo = math.ceil(len(self.texto) / FRAGMENTOS)
+        pausa = max(0.0, self.total - PRIMER_FRAGMENTO) / FRAGMENTOS
+        for i in range(0, len(self.texto), largo):
+            yield _Fragmento(self.texto[i:i + largo])
+            await asyncio.sleep(pausa)
+
+
+class ModeloFalso:
+    def __init__(self, nombre):
+        self.model_name = nombre
+        self.latencia = LATENCIA_RAPIDO if 'flash' in nombre else LATENCIA
+
+    async def generate_content_async(self, prompt, stream=False, generation_config=None):
+        error = _error()
+        if error is not None:
+            await asyncio.sleep(PRIMER_FRAGMENTO)
+            raise error
+        texto = _TEXTO
+        if generation_config and generation_config.get('response_mime_type') == 'application/json':
+            texto = _JSON_RUBRICA if 'RÚBRICA' in prompt else _JSON_PLAN
+        if stream:
+            return _Streaming(_latencia(self.latencia), texto)
+        await asyncio.sleep(_latencia(self.latencia))
+        return _Fragmento(texto)
+
+
+def instalar():
+    """Desde ahora, utils/llm.py usa ModeloFalso en vez de Gemini."""
+    from utils import llm
+
+    def modelo(cliente, nombre):
+        return cliente.modelos.setdefault(nombre, ModeloFalso(nombre))
+
+    llm._ClienteProceso.modelo = modelo
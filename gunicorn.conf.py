@@ -0,0 +1,26 @@
+# --- Configuración de Gunicorn ---
+# Gunicorn lee este archivo solo al correr `gunicorn app:server` desde la raíz.
+# preload_app importa la app (páginas, Gemini, fpdf, fuentes del PDF) una
+# sola vez en el proceso maestro; los workers se crean con fork y comparten
+# esa memoria en vez de repetir el arranque cada uno.
+import gc
+import os
+
+os.environ.setdefault('GUIDIA_PRECARGA', '1')  # Ver utils/arranque.py
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8050')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+preload_app = os.environ['GUIDIA_PRECARGA'] == '1'
+timeout = 120
+
+
+def pre_fork(server, worker):
+    # Congelar lo ya cargado: el GC deja de recorrerlo y no "ensucia" las
+    # páginas de memoria compartidas con los workers (copy-on-write)
+    gc.freeze()
+
+
+def worker_exit(server, worker):
+    # Guardar el feedback que quedó en cola antes de que el worker termine
+    from utils import feedback
+    feedback.vaciar()
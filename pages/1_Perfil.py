@@ -1,7 +1,8 @@
 import dash
 from dash import dcc, html, Input, Output, State, callback, ALL
 import dash_bootstrap_components as dbc
-import json # Usaremos json para guardar los datos
+
+from utils import perfil
 
 # Registrar esta página
 dash.register_page(__name__, path='/', name='Perfil', order=1)
@@ -123,27 +124,30 @@ def guardar_perfil_completo(n_clicks, nombre, apellido, correo, nombres_esc, niv
     if not nombre or not apellido:
         return "Error: Nombre y Apellido son requeridos.", True, "danger", dash.no_update
 
-    # Construimos el objeto de perfil
-    perfil_data = {
-        'nombre_docente': nombre,
-        'apellido_docente': apellido,
-        'correo_docente': correo,
-        'instituciones': []
-    }
-
-    # Procesamos las escuelas
+    # Procesamos las escuelas (el id es la posición: el dropdown del Asistente las elige por id)
+    instituciones = []
     for i in range(len(nombres_esc)):
         if not nombres_esc[i]:
             return f"Error: Por favor, completa el nombre de la Institución #{i + 1}.", True, "danger", dash.no_update
-        
-        escuela = {
-            'id': i,
-            'nombre': nombres_esc[i],
-            'niveles': niveles_esc[i] if niveles_esc[i] else [], # Manejar si no selecciona ninguno
-            'contexto': contextos_esc[i]
-        }
-        perfil_data['instituciones'].append(escuela)
+
+        instituciones.append(perfil.Escuela(
+            id=i,
+            nombre=nombres_esc[i],
+            niveles=niveles_esc[i] if niveles_esc[i] else [], # Manejar si no selecciona ninguno
+            contexto=contextos_esc[i],
+        ))
+
+    # Construimos el perfil (validado por utils/perfil.py)
+    try:
+        perfil_docente = perfil.Perfil(
+            nombre_docente=nombre,
+            apellido_docente=apellido,
+            correo_docente=correo,
+            instituciones=instituciones,
+        )
+    except ValueError as e:
+        return f"Error en los datos del perfil: {e}", True, "danger", dash.no_update
 
     # Devolvemos el mensaje de éxito y los nuevos datos
-    # Usamos json.dumps para guardar el diccionario como un string en dcc.Store
-    return f"¡Perfil de {nombre} guardado con {len(perfil_data['instituciones'])} escuela(s)!", True, "success", json.dumps(perfil_data)
\ No newline at end of file
+    # dcc.Store guarda el dict tal cual (sin pasarlo a string JSON)
+    return f"¡Perfil de {nombre} guardado con {len(instituciones)} escuela(s)!", True, "success", perfil_docente.model_dump()
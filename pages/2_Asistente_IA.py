@@ -1,31 +1,33 @@
+import datetime
+import re
+
 import dash
-from dash import dcc, html, Input, Output, State, callback, no_update, ALL
+from dash import dcc, html, Input, Output, State, Patch, callback, clientside_callback, ClientsideFunction, no_update, ALL
 import dash_bootstrap_components as dbc
-import google.generativeai as genai
-import os
-import json
-from fpdf import FPDF # Importar la biblioteca de PDF
+
+from utils import (analisis, biblioteca, cache_respuestas, estructurado, historial, llm, lote, pdf, perfil, prompts,
+                   resultados, rutas, secciones, similares, trabajos, vuelo_unico)
+from utils.config import MODELO_IA
 
 # Registrar esta página
 dash.register_page(__name__, name='Asistente IA', order=2)
 
 # --- Constantes ---
-DESAFIOS_INCLUSION = [
-    'TDAH (Déficit de Atención con Hiperactividad)',
-    'Dislexia',
-    'TDA (Déficit de Atención sin Hiperactividad)',
-    'TEA (Trastorno del Espectro Autista Leve)',
-    'Discalculia (Dificultad Matemática)',
-    'Altas Capacidades',
-]
-
-# --- Configurar la API de Gemini ---
-try:
-    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
-    model = genai.GenerativeModel('models/gemini-pro-latest')
-    API_CONFIGURADA = True
-except Exception as e:
-    API_CONFIGURADA = False
+# Se antepone al plan de un pedido muy parecido que se ofrece en vez de generar
+AVISO_SIMILAR = ("> ♻️ Este plan se generó para un pedido muy parecido al tuyo (similitud {porcentaje}%). "
+                 "Úsalo como punto de partida, o marca **Regenerar** para pedir uno nuevo.\n\n")
+
+PLANES_POR_PAGINA_HISTORIAL = 8
+
+# Estilos de la caja de resultados (visible / oculta)
+ESTILO_OUTPUT = {'border': '1px solid #ddd', 'padding': '10px', 'min-height': '200px', 'background-color': '#fff'}
+ESTILO_OUTPUT_OCULTO = {**ESTILO_OUTPUT, 'display': 'none'}
+
+# --- API de Gemini (el cliente se crea en utils/llm.py) ---
+API_CONFIGURADA = llm.configurada()
+
+# Las fuentes del PDF (y fpdf) se cargan con el primer PDF, o antes del fork
+# si la app arranca en modo precarga (ver utils/arranque.py)
 
 # --- 1. Layout de la Página ---
 layout = dbc.Container([
@@ -33,6 +35,19 @@ layout = dbc.Container([
     
     html.Div(id="ia-welcome-message"),
     dcc.Download(id="download-pdf"),
+    dcc.Download(id="download-zip"),
+    # IDs de pedidos y resultados guardados en el servidor (utils/resultados.py)
+    dcc.Store(id="ia-solicitud"),
+    dcc.Store(id="ia-solicitud-id"),
+    dcc.Store(id="ia-lote-solicitud"),
+    dcc.Store(id="ia-lote-solicitud-id"),
+    dcc.Store(id="ia-resultado-id"),
+    # Historial: identificador al azar de este navegador (persiste al cerrar la pestaña)
+    # y cursores de las páginas recorridas del listado
+    dcc.Store(id="historial-docente", storage_type='local'),
+    dcc.Store(id="historial-cursores", data={'pila': [None], 'siguiente': None}),
+    # Parte del plan a regenerar (la arma assets/asistente.js al hacer clic)
+    dcc.Store(id="ia-seccion-pedido"),
     
     dbc.Row([
         # --- Columna Izquierda (Contexto y Acción) ---
@@ -69,6 +84,21 @@ layout = dbc.Container([
                     dbc.Input(id="ia-contexto-escuela", disabled=True)
                 ])
             ]),
+            html.Br(),
+
+            # --- Historial de planes generados (utils/historial.py) ---
+            dbc.Card([
+                dbc.CardHeader("📚 Mis planes anteriores"),
+                dbc.CardBody([
+                    dbc.Input(id="historial-busqueda", type="search", debounce=True,
+                              placeholder="Buscar (ej: rúbrica dislexia, Matemática 5to)..."),
+                    html.Div(id="historial-lista", className="mt-2"),
+                    dbc.ButtonGroup([
+                        dbc.Button("« Más nuevos", id="historial-anteriores-btn", size="sm", color="secondary", outline=True),
+                        dbc.Button("Más viejos »", id="historial-siguientes-btn", size="sm", color="secondary", outline=True),
+                    ], className="mt-2"),
+                ])
+            ]),
 
         ], width=4), # Fin Columna Izquierda
         
@@ -102,6 +132,22 @@ layout = dbc.Container([
                                 html.Div([
                                     dbc.Label("Mes a Planificar:", className="mt-2"),
                                     dbc.Input(id="ia-mes-plan", placeholder="Ej: Mayo, Junio"),
+
+                                    # Generar varios meses de una vez (en paralelo)
+                                    dbc.Label("¿O planificar varios meses de una vez? (Desde / Hasta)", className="mt-3"),
+                                    dbc.Row([
+                                        dbc.Col(dcc.Dropdown(id="ia-mes-desde", options=lote.MESES_ESCOLARES,
+                                                             value=lote.MESES_ESCOLARES[0], clearable=False), width=6),
+                                        dbc.Col(dcc.Dropdown(id="ia-mes-hasta", options=lote.MESES_ESCOLARES,
+                                                             value=lote.MESES_ESCOLARES[-1], clearable=False), width=6),
+                                    ]),
+                                    dbc.Row([
+                                        dbc.Col(dbc.Button("Generar Meses en Lote", id="ia-generar-lote-btn", color="primary",
+                                                           outline=True, className="w-100 mt-2", n_clicks=0), width=7),
+                                        dbc.Col(dbc.Button("Descargar ZIP", id="btn-download-zip", color="secondary",
+                                                           outline=True, className="w-100 mt-2", n_clicks=0), width=5),
+                                    ]),
+                                    html.Div(id="ia-lote-progreso", className="mt-2"),
                                 ], id="ia-mes-container", style={'display': 'none'}),
 
                                 dbc.Label("Cantidad de Alumnos (aprox):", className="mt-2"),
@@ -109,8 +155,24 @@ layout = dbc.Container([
                             ]),
                             
                             dbc.AccordionItem(title="Detalles Específicos del Plan", children=[
-                                # Este Div se rellena dinámicamente (Primaria vs Secundaria)
-                                html.Div(id="ia-contexto-nivel-crear"),
+                                # Se muestra solo el campo del nivel elegido (Primaria vs Secundaria).
+                                # Están siempre en el layout: el callback principal siempre los encuentra.
+                                html.Div([
+                                    html.Div([
+                                        dbc.Label("Eventos Especiales / Días Patrios (Opcional):"),
+                                        dbc.Textarea(id="ia-dias-patios", placeholder="Ej: 25 de Mayo, Día de la Bandera...", rows=2),
+                                    ], id="ia-contexto-primario", style={'display': 'none'}),
+
+                                    html.Div([
+                                        dbc.Label("Libro Matriz / Temario General (Opcional):"),
+                                        dbc.Textarea(id="ia-libro-matriz", placeholder="Ej: 'Capítulos 1-4 del libro Santillana...'", rows=2),
+                                    ], id="ia-contexto-secundario", style={'display': 'none'}),
+
+                                    html.Div([
+                                        dbc.Label("Contexto General:"),
+                                        dbc.Textarea(id="ia-contexto-general", rows=2)
+                                    ], id="ia-contexto-otro", style={'display': 'block'}),
+                                ], id="ia-contexto-nivel-crear"),
                                 
                                 dbc.Label("Cantidad de Días de Clase (aprox):", className="mt-2"),
                                 dbc.Input(id="ia-dias-clase-crear", type="number", value=20, min=1, step=1),
@@ -142,7 +204,7 @@ layout = dbc.Container([
                                             ),
                                             width=4
                                         ),
-                                    ], className="mb-1 align-items-center") for desafio in DESAFIOS_INCLUSION
+                                    ], className="mb-1 align-items-center") for desafio in prompts.DESAFIOS_INCLUSION
                                 ], className="control-group")
                             ]),
                         ],
@@ -154,6 +216,9 @@ layout = dbc.Container([
                     dbc.Label("Input Base (Pega los temas, parrilla anterior, libro matriz, etc.):"),
                     dbc.Textarea(id="ia-plan-base-crear", rows=8,
                                  placeholder="Si dejas esto vacío, la IA crea de cero. Si pegas texto (ej. temas del libro), la IA lo usa como base."),
+                    # Unidades, actividades y rúbricas por desafío (reutilizadas entre planes), ver utils/estructurado.py
+                    dbc.Checkbox(id="ia-estructurado", value=False, className="mt-2",
+                                 label="Plan estructurado (unidades, actividades y una rúbrica por desafío de inclusión)"),
                 ])
             ], style={'display': 'block'}), # Visible por defecto
 
@@ -201,13 +266,21 @@ layout = dbc.Container([
                 ])
             ], style={'display': 'none'}), # Oculto por defecto
             
-            # --- Botones de Acción (Sin cambios) ---
+            # --- Botones de Acción ---
             dbc.Row([
                 dbc.Col(dbc.Button("Generar Respuesta IA", 
                                  id="ia-generar-btn-unificado", 
                                  color="primary", 
                                  className="w-100", 
-                                 n_clicks=0), width=8),
+                                 n_clicks=0), width=6),
+
+                dbc.Col(dbc.Button("Cancelar",
+                                 id="ia-cancelar-btn",
+                                 color="danger",
+                                 outline=True,
+                                 className="w-100",
+                                 disabled=True,
+                                 n_clicks=0), width=2),
                 
                 dbc.Col(dbc.Button("Descargar PDF",
                                  id="btn-download-pdf",
@@ -216,14 +289,22 @@ layout = dbc.Container([
                                  className="w-100",
                                  n_clicks=0), width=4),
             ], className="mt-3"),
+            dbc.Checkbox(id="ia-regenerar", value=False, className="mt-2",
+                         label="Regenerar (no reutilizar una respuesta guardada para este mismo pedido)"),
             
-            # --- Output (Unificado) (Sin cambios) ---
+            # --- Output (Unificado) ---
             html.Hr(),
             dbc.Label("Resultados Generados por la IA:"),
-            dcc.Loading(
-                dcc.Markdown(id="ia-output-div-unificado", 
-                             style={'border': '1px solid #ddd', 'padding': '10px', 'min-height': '200px', 'background-color': '#fff'})
-            )
+            # Estado del trabajo en curso (en cola / generando), con su ID
+            html.Div([dbc.Spinner(size="sm"), html.Span(id="ia-estado-trabajo", className="ms-2")],
+                     id="ia-generando-indicador", className="text-muted mb-2", style={'display': 'none'}),
+            # Vista en vivo: se llena a medida que Gemini va respondiendo (streaming)
+            dcc.Markdown(id="ia-output-stream", style=ESTILO_OUTPUT_OCULTO),
+            # Resultado final (el que se exporta a PDF), dividido en partes que se
+            # pueden regenerar por separado (ver _vista_plan)
+            html.Div(id="ia-output-div-unificado", style=ESTILO_OUTPUT),
+            dbc.Input(id="ia-seccion-indicaciones", size="sm", className="mt-2",
+                      placeholder="Indicaciones para \"Regenerar esta parte\" (opcional). Ej: más corta, con más ejemplos..."),
             
         ], width=8) # Fin Columna Derecha
     ]) # Fin Fila
@@ -237,138 +318,91 @@ layout = dbc.Container([
     Output('ia-select-escuela', 'options'),
     Input('session-storage', 'data')
 )
-def cargar_perfil_y_escuelas(data_json):
-    if not data_json:
-        return dbc.Alert("Perfil no encontrado. Por favor, ve a 'Perfil' y guarda tus datos.", color="danger"), []
+def cargar_perfil_y_escuelas(datos_perfil):
     try:
-        data = json.loads(data_json)
-        perfil = data.get('perfil', data)
-        nombre_docente = perfil.get('nombre_docente', 'Docente')
-        instituciones = perfil.get('instituciones', [])
-        if not instituciones:
-            return dbc.Alert("Tu perfil no tiene instituciones. Por favor, añade al menos una.", color="warning"), []
-        # Guardar el objeto entero como un string json
-        opciones_escuela = [{'label': esc['nombre'], 'value': json.dumps(esc)} for esc in instituciones]
-        mensaje_bienvenida = dbc.Alert(f"¡Hola {nombre_docente}! Selecciona tu contexto para comenzar.", color="success")
-        return mensaje_bienvenida, opciones_escuela
-    except Exception as e:
+        perfil_docente = perfil.cargar(datos_perfil)
+    except ValueError as e:
         return dbc.Alert(f"Error al cargar tu perfil: {e}", color="danger"), []
+    if perfil_docente is None:
+        return dbc.Alert("Perfil no encontrado. Por favor, ve a 'Perfil' y guarda tus datos.", color="danger"), []
+    if not perfil_docente.instituciones:
+        return dbc.Alert("Tu perfil no tiene instituciones. Por favor, añade al menos una.", color="warning"), []
+    # Cada opción apunta a la escuela por su id (el resto se busca en el perfil)
+    opciones_escuela = [{'label': esc.nombre, 'value': esc.id} for esc in perfil_docente.instituciones]
+    mensaje_bienvenida = dbc.Alert(f"¡Hola {perfil_docente.nombre_docente}! Selecciona tu contexto para comenzar.", color="success")
+    return mensaje_bienvenida, opciones_escuela
 
-@callback(
+# --- Callbacks de la interfaz (en el navegador) ---
+# Mostrar/ocultar tarjetas y armar opciones no necesita al servidor: estas
+# funciones están en assets/asistente.js y corren en el navegador, así el
+# formulario responde al instante aunque los workers estén ocupados con Gemini.
+clientside_callback(
+    ClientsideFunction(namespace='asistente', function_name='actualizarNivelesYContexto'),
     Output('ia-select-nivel', 'options'),
     Output('ia-select-nivel', 'value'),
     Output('ia-contexto-escuela', 'value'),
-    Input('ia-select-escuela', 'value') # Se dispara cuando cambia la escuela
+    Input('ia-select-escuela', 'value'), # Se dispara cuando cambia la escuela
+    State('session-storage', 'data')
 )
-def actualizar_niveles_y_contexto(escuela_json):
-    if not escuela_json:
-        return [], None, ""
-    
-    escuela = json.loads(escuela_json) # Convertir el string JSON de vuelta a objeto
-    niveles_de_la_escuela = escuela.get('niveles', [])
-    contexto_de_la_escuela = escuela.get('contexto', 'Urbana')
-    
-    opciones_nivel = [{'label': nivel, 'value': nivel} for nivel in niveles_de_la_escuela]
-    # Seleccionar automáticamente el primer nivel si existe
-    valor_nivel = opciones_nivel[0]['value'] if opciones_nivel else None
-    
-    return opciones_nivel, valor_nivel, contexto_de_la_escuela
 
-@callback(
-    Output('ia-contexto-nivel-crear', 'children'),
+clientside_callback(
+    ClientsideFunction(namespace='asistente', function_name='mostrarContextoEspecificoCrear'),
+    Output('ia-contexto-primario', 'style'),
+    Output('ia-contexto-secundario', 'style'),
+    Output('ia-contexto-otro', 'style'),
+    Output('ia-dias-patios', 'value'),
+    Output('ia-libro-matriz', 'value'),
+    Output('ia-contexto-general', 'value'),
     Output('ia-select-tipo-plan-crear', 'options'),
     Input('ia-select-nivel', 'value')
 )
-def mostrar_contexto_especifico_crear(nivel_seleccionado):
-    opciones_plan_crear = []
-    
-    # Definir estilos para mostrar/ocultar los inputs
-    style_primario = {'display': 'none'}
-    style_secundario = {'display': 'none'}
-    style_otro = {'display': 'none'}
-
-    if nivel_seleccionado == 'Primario':
-        opciones_plan_crear = [
-            {'label': 'Plan Anual (Parrilla)', 'value': 'Anual-Primaria'},
-            {'label': 'Plan Mensual (Actividades y Rúbricas)', 'value': 'Mensual-Primaria'},
-        ]
-        style_primario = {'display': 'block'}
-    elif nivel_seleccionado == 'Secundario':
-        opciones_plan_crear = [
-            {'label': 'Plan Anual (desde Libro Matriz)', 'value': 'Anual-Secundaria'},
-            {'label': 'Plan Mensual (desde Anual)', 'value': 'Mensual-Secundaria'},
-        ]
-        style_secundario = {'display': 'block'}
-    else:
-        # Default o Nivel Inicial
-        opciones_plan_crear = [{'label': 'Planificación de Actividades', 'value': 'Actividades'}]
-        style_otro = {'display': 'block'}
-
-    # Crear siempre todos los componentes, pero controlar su visibilidad.
-    # Así, el callback principal siempre los encontrará en el layout.
-    inputs_especificos = [
-        html.Div([
-            dbc.Label("Eventos Especiales / Días Patrios (Opcional):"),
-            dbc.Textarea(id="ia-dias-patios", placeholder="Ej: 25 de Mayo, Día de la Bandera...", rows=2),
-        ], style=style_primario),
-        
-        html.Div([
-            dbc.Label("Libro Matriz / Temario General (Opcional):"),
-            dbc.Textarea(id="ia-libro-matriz", placeholder="Ej: 'Capítulos 1-4 del libro Santillana...'", rows=2),
-        ], style=style_secundario),
-
-        html.Div([
-            dbc.Label("Contexto General:"), 
-            dbc.Textarea(id="ia-contexto-general", rows=2)
-        ], style=style_otro)
-    ]
-
-    return inputs_especificos, opciones_plan_crear
 
-@callback(
+clientside_callback(
+    ClientsideFunction(namespace='asistente', function_name='mostrarFormularioPrincipal'),
     Output('card-crear-plan', 'style'),
     Output('card-analizar-doc', 'style'),
     Output('card-adaptar-diaria', 'style'),
     Input('selector-accion-principal', 'value') # Se dispara con el RadioItems principal
 )
-def mostrar_formulario_principal(accion_seleccionada):
-    style_crear = {'display': 'none'}
-    style_analizar = {'display': 'none'}
-    style_adaptar = {'display': 'none'}
-    
-    if accion_seleccionada == 'crear':
-        style_crear = {'display': 'block'}
-    elif accion_seleccionada == 'analizar':
-        style_analizar = {'display': 'block'}
-    elif accion_seleccionada == 'adaptar':
-        style_adaptar = {'display': 'block'}
-        
-    return style_crear, style_analizar, style_adaptar
-
 
-# --- Callback para mostrar/ocultar el campo de mes ---
-@callback(
+# Mostrar/ocultar el campo de mes
+clientside_callback(
+    ClientsideFunction(namespace='asistente', function_name='toggleMesContainer'),
     Output('ia-mes-container', 'style'),
     Input('ia-select-tipo-plan-crear', 'value')
 )
-def toggle_mes_container(plan_type):
-    if plan_type in ['Mensual-Primaria', 'Mensual-Secundaria']:
-        return {'display': 'block'}
-    return {'display': 'none'}
 
 
+# --- Docente y escuela elegida, desde el perfil de la sesión ---
+def _docente_y_escuela(datos_perfil, escuela_id):
+    """(nombre del docente, nombre de la escuela), o None si no hay perfil válido."""
+    try:
+        perfil_docente = perfil.cargar(datos_perfil)
+    except ValueError:
+        return None
+    if perfil_docente is None:
+        return None
+    escuela = perfil_docente.escuela(escuela_id)
+    return perfil_docente.nombre_docente, escuela.nombre if escuela else 'N/A'
+
 
 # --- Callback 5: Generar la respuesta de la IA (ACTUALIZADO CON TUS IDEAS) ---
-@callback(
-    Output('ia-output-div-unificado', 'children'),
+# El clic arma el pedido en el navegador (solo los campos de la acción elegida,
+# ver assets/asistente.js) y el servidor lo guarda bajo un ID corto
+# (utils/resultados.py). El callback en segundo plano recibe solo ese ID: su
+# consulta de estado, que se repite cada medio segundo, no vuelve a subir los
+# textos pegados. El plan generado también se guarda y 'ia-resultado-id'
+# apunta a él, para el PDF y lo que venga después.
+clientside_callback(
+    ClientsideFunction(namespace='asistente', function_name='empaquetarSolicitud'),
+    Output('ia-solicitud', 'data'),
     Input('ia-generar-btn-unificado', 'n_clicks'),
     # Estados de Contexto General
-    State('session-storage', 'data'),
     State('selector-accion-principal', 'value'),
     State('ia-select-escuela', 'value'),
     State('ia-select-nivel', 'value'),
     State('ia-contexto-escuela', 'value'),
-    
+
     # Estados de "Crear Planificación" (SECCIÓN ACTUALIZADA)
     State('ia-select-tipo-plan-crear', 'value'),
     State('ia-materia', 'value'),
@@ -383,186 +417,622 @@ def toggle_mes_container(plan_type):
     State('ia-dias-patios', 'value'),
     State('ia-libro-matriz', 'value'),
     State('ia-contexto-general', 'value'),
-    
+
     # Estados de "Analizar Documento"
     State('ia-accion-analizar', 'value'),
     State('ia-plan-base-analizar', 'value'),
-    
+
     # Estados de "Adaptación Rápida"
     State('ia-inclusion-adaptar', 'value'),
     State('ia-plan-base-adaptar', 'value'),
+    State('ia-regenerar', 'value'),
+    State('ia-estructurado', 'value'),
     prevent_initial_call=True
 )
-def generar_respuesta_ia_unificada(n_clicks, data_json, accion,
-                                   esc_json, nivel, contexto,
-                                   # Argumentos de "Crear"
-                                   tipo_plan_crear, materia, ano_grado, mes_plan, cant_alumnos, 
-                                   dias_clase, cant_eval, cant_tps, inclusion_cant, 
-                                   plan_base_crear, dias_patios, libro_matriz, contexto_general,
-                                   # Argumentos de "Analizar"
-                                   accion_analizar, plan_base_analizar,
-                                   # Argumentos de "Adaptar"
-                                   inclusion_adaptar, plan_base_adaptar):
-    
-    if not API_CONFIGURADA: return "Error: API de IA no configurada."
-    if not data_json: return "Error: Perfil no cargado."
-    
+
+
+@callback(
+    Output('ia-solicitud-id', 'data'),
+    Input('ia-solicitud', 'data'),
+    prevent_initial_call=True
+)
+def registrar_solicitud(solicitud):
+    return resultados.guardar(solicitud)
+
+
+@callback(
+    Output('ia-output-div-unificado', 'children'),
+    Output('ia-resultado-id', 'data'),
+    Input('ia-solicitud-id', 'data'),
+    State('session-storage', 'data'),
+    State('historial-docente', 'data'),
+    background=True,
+    progress=[Output('ia-output-stream', 'children'), Output('ia-estado-trabajo', 'children')],
+    progress_default=["", ""],
+    interval=500,
+    cancel=[Input('ia-cancelar-btn', 'n_clicks')],
+    running=[
+        (Output('ia-generar-btn-unificado', 'disabled'), True, False),
+        (Output('ia-cancelar-btn', 'disabled'), False, True),
+        (Output('ia-generando-indicador', 'style'), {'display': 'block'}, {'display': 'none'}),
+        (Output('ia-output-stream', 'style'), ESTILO_OUTPUT, ESTILO_OUTPUT_OCULTO),
+        (Output('ia-output-div-unificado', 'style'), ESTILO_OUTPUT_OCULTO, ESTILO_OUTPUT),
+    ],
+    prevent_initial_call=True
+)
+def generar_respuesta_ia_unificada(set_progress, solicitud_id, datos_perfil, docente_historial):
+    solicitud = resultados.obtener(solicitud_id)
+    if solicitud is None:
+        return "Error: El pedido expiró. Por favor, vuelve a generar.", None
+    texto, plan = _generar_respuesta(set_progress, datos_perfil, **solicitud)
+    if plan:
+        _guardar_en_historial(docente_historial, datos_perfil, solicitud, plan)
+    # Solo los planes (no los mensajes de error ni avisos) quedan disponibles para el PDF
+    return _vista_plan(texto, plan), resultados.guardar(plan) if plan else None
+
+
+def _vista_seccion(i, seccion):
+    if not secciones.regenerable(seccion):
+        return dcc.Markdown(seccion)
+    return html.Div([
+        dbc.Button("↻ Regenerar esta parte", id={'type': 'seccion-regenerar', 'index': secciones.clave(i, seccion)},
+                   color="link", size="sm", className="btn-seccion float-end p-0"),
+        dcc.Markdown(seccion),
+    ], className="seccion-plan")
+
+
+def _vista_plan(texto, plan=None):
+    """El resultado a mostrar: [aviso o mensaje, partes del plan, errores al regenerar una parte].
+
+    La forma es siempre la misma para que regenerar_seccion pueda reemplazar
+    una parte con Patch sin reenviar el resto.
+    """
+    if not plan:
+        return [dcc.Markdown(texto), html.Div(), html.Div()]
+    aviso = texto[:-len(plan)] if texto.endswith(plan) else ""  # Ej. AVISO_SIMILAR
+    partes = [_vista_seccion(i, s) for i, s in enumerate(secciones.dividir(plan))]
+    return [dcc.Markdown(aviso), html.Div(partes), html.Div()]
+
+
+def _guardar_en_historial(docente, datos_perfil, solicitud, plan):
+    """Guarda el plan con su contexto en el historial del navegador que lo pidió."""
+    accion = solicitud.get('accion', 'crear')  # Los pedidos en lote son siempre 'crear'
+    if accion == 'crear':
+        meses = (solicitud.get('mes_plan') or
+                 ' a '.join(m for m in (solicitud.get('mes_desde'), solicitud.get('mes_hasta')) if m))
+        titulo = f"{solicitud.get('tipo_plan_crear')}: {solicitud.get('materia')} {solicitud.get('ano_grado')}"
+        titulo += f" ({meses})" if meses else ""
+    elif accion == 'analizar':
+        titulo = "Análisis: " + ", ".join(solicitud.get('accion_analizar') or [])
+    else:
+        titulo = "Adaptación: " + ", ".join(solicitud.get('inclusion_adaptar') or ["sin desafíos"])
+    nombres = _docente_y_escuela(datos_perfil, solicitud.get('escuela_id'))
+    try:
+        historial.guardar(docente, plan, accion, titulo, escuela=nombres[1] if nombres else None,
+                          nivel=solicitud.get('nivel'), materia=solicitud.get('materia'),
+                          grado=solicitud.get('ano_grado'))
+    except Exception as e:  # El plan ya está generado: que el historial no lo haga fallar
+        print(f"Error al guardar el plan en el historial: {e}")
+
+
+def _generar_respuesta(set_progress, datos_perfil, accion=None, n_clicks=None,
+                       escuela_id=None, nivel=None, contexto=None,
+                       # Argumentos de "Crear"
+                       tipo_plan_crear=None, materia=None, ano_grado=None, mes_plan=None, cant_alumnos=None,
+                       dias_clase=None, cant_eval=None, cant_tps=None, inclusion_cant=(),
+                       plan_base_crear=None, dias_patios=None, libro_matriz=None, contexto_general=None,
+                       # Argumentos de "Analizar"
+                       accion_analizar=(), plan_base_analizar=None,
+                       # Argumentos de "Adaptar"
+                       inclusion_adaptar=None, plan_base_adaptar=None,
+                       regenerar=None, plan_estructurado=None):
+    """Devuelve (texto a mostrar, plan): el plan es None si hubo un error."""
+
+    if not API_CONFIGURADA: return "Error: API de IA no configurada.", None
+
     # --- Cargar Perfil ---
-    data = json.loads(data_json)
-    perfil = data.get('perfil', data)
-    nombre_docente = perfil.get('nombre_docente', 'Docente')
-    escuela = json.loads(esc_json) if esc_json else {}
-    escuela_nombre = escuela.get('nombre', 'N/A')
+    nombres = _docente_y_escuela(datos_perfil, escuela_id)
+    if nombres is None: return "Error: Perfil no cargado.", None
+    nombre_docente, escuela_nombre = nombres
+
+    # Los prompts se arman en utils/prompts.py (limpieza + presupuesto de tokens)
+    documento_por_partes = None # Solo para 'analizar' con documentos muy largos
 
-    prompt_final = ""
-    
     # --- 1. Lógica para "CREAR PLANIFICACIÓN" ---
+    plan_estructurado = bool(plan_estructurado) and accion == 'crear'
     if accion == 'crear':
         if not all([materia, ano_grado, tipo_plan_crear]):
-             return "Error: Faltan datos clave. Por favor, completa 'Materia', 'Año/Grado' y 'Tipo de Plan' en el acordeón."
+             return "Error: Faltan datos clave. Por favor, completa 'Materia', 'Año/Grado' y 'Tipo de Plan' en el acordeón.", None
         
-        # Añadir el mes al tipo de plan si está definido
-        plan_str = f"{tipo_plan_crear} para el mes de {mes_plan}" if mes_plan and 'Mensual' in tipo_plan_crear else tipo_plan_crear
-
-        # Procesar los desafíos de inclusión
-        desafios_con_cantidad = []
-        for i, cant in enumerate(inclusion_cant):
-            if cant and cant > 0:
-                desafio_nombre = DESAFIOS_INCLUSION[i].split(' (')[0] # Tomar nombre corto
-                desafios_con_cantidad.append(f"{desafio_nombre} ({cant} alumno/s)")
-        
-        inclusion_str = ", ".join(desafios_con_cantidad) if desafios_con_cantidad else "ninguno especificado"
-
-        contexto_nivel_str = ""
-        if nivel == 'Primario' and dias_patios:
-            contexto_nivel_str = f"Eventos especiales a considerar (días patrios): {dias_patios}"
-        elif nivel == 'Secundario' and libro_matriz:
-            contexto_nivel_str = f"Temario / Libro Matriz de referencia: {libro_matriz}"
-        elif contexto_general:
-            contexto_nivel_str = f"Contexto general provisto: {contexto_general}"
-
-        prompt_final = f"""
-        **Rol:** Eres Guidia, un Asesor Pedagógico experto en Nivel {nivel} en una escuela {contexto} de Mendoza.
-        **Cliente:** {nombre_docente} (Escuela: {escuela_nombre}).
-        **Tarea:** CREAR una "{plan_str}" para la materia {materia}, en el año/grado {ano_grado}.
-        
-        **Contexto del Aula y Plan:**
-        * Días de clase: {dias_clase}
-        * Cantidad de Alumnos: {cant_alumnos}
-        * Carga evaluativa: {cant_eval} evaluaciones y {cant_tps} trabajos prácticos.
-        * Contexto del Nivel: {contexto_nivel_str}
-        * Desafíos de Inclusión y cantidad de alumnos a considerar: {inclusion_str}
-        
-        **Input Base del Docente (Temas, Parrilla Anual, etc.):**
-        ---
-        {plan_base_crear}
-        ---
-        **Output Requerido:** Genera el plan detallado, actividades, y las RÚBRICAS de evaluación adaptadas 
-        a los desafíos de inclusión mencionados. Si el Input Base está vacío, crea la planificación desde cero 
-        basándote en el currículo estándar para {materia} en {ano_grado}.
-        """
+        def armar_prompt(plan_base, accion_prompt='crear'):
+            return prompts.prompt_crear(nombre_docente, escuela_nombre, nivel, contexto,
+                                        tipo_plan_crear, materia, ano_grado, mes_plan, cant_alumnos,
+                                        dias_clase, cant_eval, cant_tps, inclusion_cant,
+                                        plan_base, dias_patios, libro_matriz, contexto_general,
+                                        accion=accion_prompt)
+        prompt = armar_prompt(plan_base_crear, 'crear_estructurado' if plan_estructurado else 'crear')
+        campos_similar = dict(nivel=nivel, contexto=contexto, tipo_plan=tipo_plan_crear, materia=materia,
+                              ano_grado=ano_grado, mes=mes_plan, alumnos=cant_alumnos, dias=dias_clase,
+                              evaluaciones=cant_eval, tps=cant_tps, inclusion=inclusion_cant)
+        texto_similar = "\n".join(t for t in (plan_base_crear, dias_patios, libro_matriz, contexto_general) if t)
 
     # --- 2. Lógica para "ANALIZAR DOCUMENTO" ---
     elif accion == 'analizar':
         if not plan_base_analizar:
-             return "Error: Por favor, pega el documento que quieres analizar."
+             return "Error: Por favor, pega el documento que quieres analizar.", None
         
         accion_str = ", ".join(accion_analizar)
-        prompt_final = f"""
-        **Rol:** Eres Guidia, un Asesor Pedagógico experto (para {nombre_docente} de {escuela_nombre}).
-        **Tarea:** ANALIZAR el siguiente documento.
-        **Acciones Requeridas:** {accion_str} (Ej. Generar Rúbricas, Resumir para suplente, Sugerir adaptaciones).
-        **Input Base (Documento Pegado):**
-        ---
-        {plan_base_analizar}
-        ---
-        **Output Requerido:** Entrega un informe claro en Markdown que cumpla con las acciones pedidas. 
-        Si se piden Rúbricas, genéralas. Si se pide Resumen, que sea claro y conciso.
-        """
+        campos_similar, texto_similar = dict(acciones=accion_str), plan_base_analizar
+        if analisis.es_documento_largo(plan_base_analizar):
+            # Documento muy largo: se analiza por partes en paralelo (utils/analisis.py)
+            documento_por_partes = plan_base_analizar
+        else:
+            prompt = prompts.construir_prompt(
+                'analizar', plan_base=plan_base_analizar,
+                nombre_docente=nombre_docente, escuela_nombre=escuela_nombre, accion_str=accion_str,
+            )
 
     # --- 3. Lógica para "ADAPTACIÓN RÁPIDA" ---
     elif accion == 'adaptar':
         if not plan_base_adaptar:
-             return "Error: Por favor, pega la actividad que quieres adaptar."
+             return "Error: Por favor, pega la actividad que quieres adaptar.", None
              
         inclusion_str = ", ".join(inclusion_adaptar) if inclusion_adaptar else "ninguno"
-        prompt_final = f"""
-        **Rol:** Eres Guidia, un Asesor Pedagógico experto en adaptaciones rápidas.
-        **Tarea:** ADAPTAR una actividad diaria para {nombre_docente} (Escuela: {escuela_nombre}).
-        **Desafíos de Inclusión:** {inclusion_str}
-        **Input Base (Actividad Diaria):**
-        ---
-        {plan_base_adaptar}
-        ---
-        **Output Requerido:** Genera 2-3 sugerencias de adaptación concretas y el párrafo para el informe de GEI.
-        """
+        campos_similar, texto_similar = dict(inclusion=inclusion_str), plan_base_adaptar
+        prompt = prompts.construir_prompt(
+            'adaptar', plan_base=plan_base_adaptar,
+            nombre_docente=nombre_docente, escuela_nombre=escuela_nombre, inclusion_str=inclusion_str,
+        )
+    else:
+        return "Error: Acción no reconocida.", None
+
+    if documento_por_partes:
+        prompt_final = analisis.clave_documento(documento_por_partes, accion_str)
+    else:
+        prompt_final = prompt.texto
+    # Lo que realmente se manda a Gemini: puede partir de un plan ya hecho,
+    # pero el caché se guarda siempre bajo el prompt del pedido (prompt_final)
+    prompt_ia, modelo_ia = prompt_final, MODELO_IA
+
+    # --- Reutilizar la respuesta si este mismo pedido ya se hizo ---
+    if regenerar:
+        cache_respuestas.registrar_bypass()
     else:
-        return "Error: Acción no reconocida."
+        respuesta_guardada = cache_respuestas.obtener(prompt_final, MODELO_IA)
+        if respuesta_guardada is not None:
+            return respuesta_guardada, respuesta_guardada
+
+    # Los planes estructurados salen siempre de su JSON: no parten de uno en Markdown
+    if not regenerar and not plan_estructurado:
+        # --- ¿Está en la biblioteca pregenerada? (utils/biblioteca.py) ---
+        plan_biblioteca = None
+        if accion == 'crear' and not plan_base_crear:
+            plan_biblioteca = biblioteca.buscar(nivel, tipo_plan_crear, materia, ano_grado)
+            if plan_biblioteca is not None and biblioteca.es_pedido_base(
+                    contexto, mes_plan, cant_alumnos, dias_clase, cant_eval, cant_tps, inclusion_cant,
+                    dias_patios, libro_matriz, contexto_general):
+                return plan_biblioteca, plan_biblioteca
+
+        # --- ¿Otro docente ya pidió algo casi igual? (utils/similares.py) ---
+        parecido = similares.buscar(accion, campos_similar, texto_similar, (nombre_docente, escuela_nombre))
+        if parecido and similares.MODO == 'ofrecer':
+            aviso = AVISO_SIMILAR.format(porcentaje=round(parecido.similitud * 100))
+            return aviso + parecido.texto, parecido.texto
+        if plan_biblioteca is not None and biblioteca.PERSONALIZAR:
+            # Un modelo más barato ajusta el plan de la biblioteca a este curso
+            prompt_ia = armar_prompt(plan_biblioteca, 'personalizar').texto
+            modelo_ia = biblioteca.MODELO_PERSONALIZAR
+        elif parecido and similares.MODO == 'semilla' and accion == 'crear' and not plan_base_crear:
+            # Partir del plan parecido como plan base: Gemini lo ajusta en vez de empezar de cero
+            prompt_ia = armar_prompt(parecido.texto).texto
+
+    # --- Elegir el modelo según la acción y el tamaño del pedido (utils/rutas.py) ---
+    # El análisis por partes y el plan ajustado de la biblioteca ya tienen el suyo
+    ruta = None
+    if modelo_ia == MODELO_IA and not documento_por_partes:
+        es_anual = accion == 'crear' and 'Anual' in (tipo_plan_crear or '')
+        ruta = rutas.elegir('crear_anual' if es_anual else accion, prompt_ia)
+        modelo_ia = ruta.modelo
+
+    # --- Llamar a la IA (en modo streaming) ---
+    # Se espera un turno libre: si hay muchos pedidos a la vez, este queda en cola
+    def avisar_en_cola(trabajo_id, posicion):
+        set_progress(("", f"Trabajo {trabajo_id}: en cola (posición {posicion})..."))
+
+    estado = ""
+
+    # Mostrar lo que va llegando, con el mismo formato que el resultado final
+    def mostrar_parcial(parcial):
+        set_progress((parcial.replace('•', '  * '), estado))
+
+    # Devuelve (texto, si lo escribió el modelo de respaldo): los que comparten el
+    # resultado reciben las dos cosas
+    def generar(al_recibir):
+        nonlocal estado
+        with trabajos.turno('ia', al_esperar=avisar_en_cola) as trabajo_id:
+            estado = f"Trabajo {trabajo_id}: generando..."
+            set_progress(("", estado))
+            if documento_por_partes:
+                return analisis.analizar_por_partes(
+                    documento_por_partes, accion_str, nombre_docente, escuela_nombre,
+                    al_avanzar=lambda mensaje: set_progress(("", f"Trabajo {trabajo_id}: {mensaje}")),
+                    al_recibir=al_recibir,
+                ), False
+            if plan_estructurado:
+                # JSON validado + rúbricas guardadas; el Markdown se arma desde el plan
+                return estructurado.registrar(estructurado.generar(
+                    prompt_ia, nivel, materia, ano_grado, inclusion_cant, modelo=modelo_ia, regenerar=regenerar,
+                    al_avanzar=lambda mensaje: set_progress(("", f"Trabajo {trabajo_id}: {mensaje}")),
+                )), False
+            if ruta is not None:
+                texto, modelo_respuesta = rutas.generar(ruta, prompt_ia, al_recibir=al_recibir)
+                return texto, modelo_respuesta != ruta.modelo
+            return llm.generar(prompt_ia, al_recibir=al_recibir, modelo=modelo_ia), False
+
+    def avisar_compartido():
+        nonlocal estado
+        estado = "Un pedido idéntico ya se está generando: se comparte su resultado..."
+        set_progress(("", estado))
 
-    # --- Llamar a la IA ---
     try:
-        response = model.generate_content(prompt_final)
-        # Reemplazar para que Markdown se vea mejor
-        return response.text.replace('•', '  * ')
+        # Si el mismo pedido ya está en curso (doble clic, recarga, varios docentes
+        # a la vez), se espera ese resultado en vez de llamar otra vez a Gemini
+        texto, de_respaldo = vuelo_unico.compartir(cache_respuestas.clave_prompt(prompt_ia, modelo_ia), generar,
+                                                    al_recibir=mostrar_parcial, al_unirse=avisar_compartido)
+        # Reemplazar para que Markdown se vea mejor (el de un plan estructurado ya sale armado)
+        resultado = texto if plan_estructurado else texto.replace('•', '  * ')
+        # Lo que respondió el modelo de respaldo no se reutiliza: el próximo pedido vuelve a probar el principal
+        if not de_respaldo:
+            cache_respuestas.guardar(prompt_final, MODELO_IA, resultado)
+            similares.registrar(accion, campos_similar, texto_similar, resultado, (nombre_docente, escuela_nombre))
+        return resultado, resultado
     except Exception as e:
-        return f"Error al contactar la IA: {e}"
+        return f"Error al contactar la IA: {e}", None
+
+
+# --- Callback 5b: Generar varios meses en lote ---
+# Un plan mensual por mes del rango, en paralelo (acotado por utils/llm.py) y
+# compartiendo el mismo contexto. El resultado es un único documento.
+COLOR_ESTADO_MES = {'pendiente': 'secondary', 'listo': 'success', 'error': 'danger'}
+
+
+def _estado_meses(meses, estados):
+    return html.Div([dbc.Badge(mes, color=COLOR_ESTADO_MES[estado], className="me-1")
+                     for mes, estado in zip(meses, estados)])
+
+
+clientside_callback(
+    ClientsideFunction(namespace='asistente', function_name='empaquetarLote'),
+    Output('ia-lote-solicitud', 'data'),
+    Input('ia-generar-lote-btn', 'n_clicks'),
+    State('ia-select-escuela', 'value'),
+    State('ia-select-nivel', 'value'),
+    State('ia-contexto-escuela', 'value'),
+    State('ia-select-tipo-plan-crear', 'value'),
+    State('ia-materia', 'value'),
+    State('ia-ano-grado', 'value'),
+    State('ia-cant-alumnos', 'value'),
+    State('ia-dias-clase-crear', 'value'),
+    State('ia-cant-eval-crear', 'value'),
+    State('ia-cant-tps-crear', 'value'),
+    State({'type': 'inclusion-cant', 'index': ALL}, 'value'),
+    State('ia-plan-base-crear', 'value'),
+    State('ia-dias-patios', 'value'),
+    State('ia-libro-matriz', 'value'),
+    State('ia-contexto-general', 'value'),
+    State('ia-mes-desde', 'value'),
+    State('ia-mes-hasta', 'value'),
+    State('ia-regenerar', 'value'),
+    prevent_initial_call=True
+)
+
+
+@callback(
+    Output('ia-lote-solicitud-id', 'data'),
+    Input('ia-lote-solicitud', 'data'),
+    prevent_initial_call=True
+)
+def registrar_lote(solicitud):
+    return resultados.guardar(solicitud)
+
+
+@callback(
+    Output('ia-output-div-unificado', 'children', allow_duplicate=True),
+    Output('ia-resultado-id', 'data', allow_duplicate=True),
+    Input('ia-lote-solicitud-id', 'data'),
+    State('session-storage', 'data'),
+    State('historial-docente', 'data'),
+    background=True,
+    progress=[Output('ia-lote-progreso', 'children'), Output('ia-estado-trabajo', 'children')],
+    progress_default=[None, ""],
+    interval=1000,
+    cancel=[Input('ia-cancelar-btn', 'n_clicks')],
+    running=[
+        (Output('ia-generar-btn-unificado', 'disabled'), True, False),
+        (Output('ia-generar-lote-btn', 'disabled'), True, False),
+        (Output('ia-cancelar-btn', 'disabled'), False, True),
+        (Output('ia-generando-indicador', 'style'), {'display': 'block'}, {'display': 'none'}),
+    ],
+    prevent_initial_call=True
+)
+def generar_lote_meses(set_progress, solicitud_id, datos_perfil, docente_historial):
+    solicitud = resultados.obtener(solicitud_id)
+    if solicitud is None:
+        return "Error: El pedido expiró. Por favor, vuelve a generar.", None
+    texto, plan = _generar_lote(set_progress, datos_perfil, **solicitud)
+    if plan:
+        _guardar_en_historial(docente_historial, datos_perfil, solicitud, plan)
+    return _vista_plan(texto, plan), resultados.guardar(plan) if plan else None
+
+
+def _generar_lote(set_progress, datos_perfil, n_clicks=None, escuela_id=None, nivel=None, contexto=None,
+                  tipo_plan_crear=None, materia=None, ano_grado=None, cant_alumnos=None,
+                  dias_clase=None, cant_eval=None, cant_tps=None, inclusion_cant=(),
+                  plan_base_crear=None, dias_patios=None, libro_matriz=None, contexto_general=None,
+                  mes_desde=None, mes_hasta=None, regenerar=None):
+    """Devuelve (texto a mostrar, documento con todos los meses); el documento es None si hubo un error."""
+
+    if not API_CONFIGURADA: return "Error: API de IA no configurada.", None
+    nombres = _docente_y_escuela(datos_perfil, escuela_id)
+    if nombres is None: return "Error: Perfil no cargado.", None
+    nombre_docente, escuela_nombre = nombres
+    if not all([materia, ano_grado, tipo_plan_crear]):
+        return "Error: Faltan datos clave. Por favor, completa 'Materia', 'Año/Grado' y 'Tipo de Plan' en el acordeón.", None
+    if 'Mensual' not in tipo_plan_crear:
+        return "Error: La generación en lote es solo para planes mensuales.", None
+    meses = lote.rango_meses(mes_desde, mes_hasta)
+    if not meses:
+        return "Error: El mes 'Desde' debe ser anterior (o igual) al mes 'Hasta'.", None
+
+    # Un prompt por mes, idéntico al de generar ese mes solo (así comparten caché)
+    prompts_mes = [
+        prompts.prompt_crear(nombre_docente, escuela_nombre, nivel, contexto,
+                             tipo_plan_crear, materia, ano_grado, mes, cant_alumnos,
+                             dias_clase, cant_eval, cant_tps, inclusion_cant,
+                             plan_base_crear, dias_patios, libro_matriz, contexto_general).texto
+        for mes in meses
+    ]
+    if regenerar:
+        # Uno por mes, como los hits y misses: cada mes es una consulta que no se hizo
+        for _ in prompts_mes:
+            cache_respuestas.registrar_bypass()
+        textos = [None] * len(prompts_mes)
+    else:
+        textos = [cache_respuestas.obtener(p, MODELO_IA) for p in prompts_mes]
+    estados = ['listo' if texto is not None else 'pendiente' for texto in textos]
+    pendientes = [i for i, texto in enumerate(textos) if texto is None]
+
+    def avisar_en_cola(trabajo_id, posicion):
+        set_progress((_estado_meses(meses, estados), f"Trabajo {trabajo_id}: en cola (posición {posicion})..."))
+
+    if pendientes:
+        with trabajos.turno('ia', al_esperar=avisar_en_cola) as trabajo_id:
+            def al_completar(hechas, total, indice):
+                estados[pendientes[indice]] = 'listo'
+                set_progress((_estado_meses(meses, estados),
+                              f"Trabajo {trabajo_id}: {estados.count('listo')}/{len(meses)} meses listos..."))
+
+            set_progress((_estado_meses(meses, estados), f"Trabajo {trabajo_id}: generando {len(pendientes)} meses..."))
+            respuestas = llm.generar_varios([prompts_mes[i] for i in pendientes],
+                                            al_completar=al_completar, tolerar_errores=True)
+
+        for i, resultado in zip(pendientes, respuestas):
+            if isinstance(resultado, llm.ErrorIA):
+                textos[i] = f"*Error al generar este mes: {resultado}*"
+            else:
+                textos[i] = resultado.replace('•', '  * ')
+                cache_respuestas.guardar(prompts_mes[i], MODELO_IA, textos[i])
+
+    documento = lote.combinar(zip(meses, textos))
+    return documento, documento
+
+
+# --- Callback 5c: Historial de planes (buscar, listar y volver a abrir) ---
+# El listado y la búsqueda leen solo título y resumen (índice FTS5 en
+# utils/historial.py); el documento completo se trae al elegir un plan.
+clientside_callback(
+    ClientsideFunction(namespace='asistente', function_name='asegurarIdHistorial'),
+    Output('historial-docente', 'data'),
+    Input('historial-docente', 'modified_timestamp'),
+    State('historial-docente', 'data'),
+)
+
+
+def _item_historial(plan):
+    fecha = datetime.datetime.fromtimestamp(plan['fecha']).strftime('%d/%m/%Y')
+    return dbc.ListGroupItem([
+        html.Div(plan['titulo'], className="fw-bold small"),
+        html.Small(" · ".join(t for t in (fecha, plan['escuela']) if t), className="text-muted d-block"),
+        html.Small(plan['resumen'], className="text-muted"),
+    ], id={'type': 'historial-item', 'index': plan['id']}, action=True, n_clicks=0)
+
+
+@callback(
+    Output('historial-lista', 'children'),
+    Output('historial-cursores', 'data'),
+    Output('historial-anteriores-btn', 'disabled'),
+    Output('historial-siguientes-btn', 'disabled'),
+    Input('historial-docente', 'data'),
+    Input('historial-busqueda', 'value'),
+    Input('historial-anteriores-btn', 'n_clicks'),
+    Input('historial-siguientes-btn', 'n_clicks'),
+    Input('ia-resultado-id', 'data'), # Para que un plan nuevo aparezca en la lista
+    State('historial-cursores', 'data'),
+)
+def listar_historial(docente, busqueda, _anteriores, _siguientes, _resultado_id, cursores):
+    # Paginación por cursor (el id del último plan mostrado), como en las estadísticas de feedback
+    cursores = cursores or {'pila': [None], 'siguiente': None}
+    pila = cursores['pila']
+    if dash.ctx.triggered_id == 'historial-siguientes-btn' and cursores['siguiente'] is not None:
+        pila = pila + [cursores['siguiente']]
+    elif dash.ctx.triggered_id == 'historial-anteriores-btn' and len(pila) > 1:
+        pila = pila[:-1]
+    elif dash.ctx.triggered_id in (None, 'historial-docente', 'historial-busqueda'):
+        pila = [None]
+    # Con un resultado nuevo (o un plan reabierto) se vuelve a leer la misma página
+
+    planes, siguiente = historial.listar(docente, busqueda, pila[-1], PLANES_POR_PAGINA_HISTORIAL)
+    if planes:
+        contenido = dbc.ListGroup([_item_historial(plan) for plan in planes])
+    else:
+        contenido = html.Small("No se encontraron planes." if busqueda else
+                               "Los planes que generes quedarán guardados acá.", className="text-muted")
+    return contenido, {'pila': pila, 'siguiente': siguiente}, len(pila) == 1, siguiente is None
+
+
+@callback(
+    Output('ia-output-div-unificado', 'children', allow_duplicate=True),
+    Output('ia-resultado-id', 'data', allow_duplicate=True),
+    Input({'type': 'historial-item', 'index': ALL}, 'n_clicks'),
+    State('historial-docente', 'data'),
+    prevent_initial_call=True
+)
+def abrir_del_historial(clics, docente):
+    # Al redibujar la lista los clics vuelven a 0: solo cuenta un clic real
+    if not dash.ctx.triggered_id or not dash.ctx.triggered[0]['value']:
+        return no_update, no_update
+    plan = historial.obtener(docente, dash.ctx.triggered_id['index'])
+    if plan is None:
+        return no_update, no_update
+    # Igual que un plan recién generado: queda disponible para el PDF
+    return _vista_plan(plan, plan), resultados.guardar(plan)
+
+
+# --- Callback 5d: Regenerar una sola parte del plan ---
+# Se manda a Gemini solo esa parte y un resumen del resto (utils/secciones.py):
+# la respuesta (y la espera) es proporcional a la parte, no al plan entero.
+# El resultado reemplaza la parte en pantalla con un Patch, y el plan guardado
+# (PDF, ZIP e historial) bajo el mismo ID.
+clientside_callback(
+    ClientsideFunction(namespace='asistente', function_name='pedirSeccion'),
+    Output('ia-seccion-pedido', 'data'),
+    Input({'type': 'seccion-regenerar', 'index': ALL}, 'n_clicks'),
+    State('ia-resultado-id', 'data'),
+    State('ia-seccion-indicaciones', 'value'),
+    prevent_initial_call=True
+)
+
+
+@callback(
+    Output('ia-output-div-unificado', 'children', allow_duplicate=True),
+    Output('ia-resultado-id', 'data', allow_duplicate=True),
+    Input('ia-seccion-pedido', 'data'),
+    State('historial-docente', 'data'),
+    background=True,
+    progress=[Output('ia-estado-trabajo', 'children')],
+    progress_default=[""],
+    interval=500,
+    cancel=[Input('ia-cancelar-btn', 'n_clicks')],
+    running=[
+        (Output('ia-generar-btn-unificado', 'disabled'), True, False),
+        (Output('ia-cancelar-btn', 'disabled'), False, True),
+        (Output('ia-generando-indicador', 'style'), {'display': 'block'}, {'display': 'none'}),
+        # Mientras tanto no se puede pedir otra parte (assets/style.css)
+        (Output('ia-output-div-unificado', 'className'), 'regenerando-seccion', ''),
+    ],
+    prevent_initial_call=True
+)
+def _error_seccion(mensaje):
+    # En su propio lugar de la vista: no tapa el aviso de plan similar
+    vista = Patch()
+    vista[2] = dbc.Alert(mensaje, color="danger", className="mt-2")
+    return vista, no_update
+
+
+def regenerar_seccion(set_progress, pedido, docente):
+    resultado_id = (pedido or {}).get('resultado_id')
+    plan = resultados.obtener(resultado_id)
+    partes = secciones.dividir(plan) if plan else []
+    i = secciones.buscar(partes, pedido['clave']) if partes else None
+    if i is None:
+        return no_update, no_update
+    if not API_CONFIGURADA:
+        return _error_seccion("Error: API de IA no configurada.")
+
+    nombre_parte = secciones.titulo(partes, i)
+    prompt = prompts.construir_prompt('seccion', plan_base=partes[i], contexto_plan=secciones.contexto(partes, i),
+                                      indicaciones=pedido.get('indicaciones') or "ninguna (proponer otra versión)")
+
+    def avisar_en_cola(trabajo_id, posicion):
+        set_progress((f"Trabajo {trabajo_id}: en cola (posición {posicion})...",))
+
+    try:
+        with trabajos.turno('ia', al_esperar=avisar_en_cola) as trabajo_id:
+            set_progress((f"Trabajo {trabajo_id}: regenerando «{nombre_parte}»...",))
+            texto, _modelo = rutas.generar(rutas.elegir('seccion', prompt.texto), prompt.texto)
+    except Exception as e:
+        return _error_seccion(f"Error al regenerar «{nombre_parte}»: {e}")
+
+    # Mismo formato que el resto del plan, y con el espacio que tenía la parte original
+    texto = re.sub(r'^```(?:markdown)?\s*\n|\n```\s*$', '', texto.strip()).replace('•', '  * ')
+    final = partes[i][len(partes[i].rstrip()):] or '\n'
+    nueva = texto.strip('\n') + final
+    propuestas = partes[:i] + [nueva] + partes[i + 1:]
+    plan_nuevo = secciones.unir(propuestas)
+    # La pantalla tiene que quedar con las mismas partes que el servidor va a
+    # encontrar al dividir el plan guardado (las claves de los botones dependen de eso)
+    partes_nuevas = secciones.dividir(plan_nuevo)
+
+    vista = Patch()
+    vista[2] = html.Div()  # Borra un error anterior, si lo había
+    if partes_nuevas == propuestas:
+        # Solo viaja la parte nueva: el resto de la vista queda como está
+        vista[1]['props']['children'][i] = _vista_seccion(i, nueva)
+    else:
+        # La parte nueva trae otros títulos o tablas (o perdió el suyo) y las partes
+        # cambian de lugar: se redibujan todas
+        vista[1]['props']['children'] = [_vista_seccion(k, s) for k, s in enumerate(partes_nuevas)]
+
+    resultados.guardar(plan_nuevo, resultado_id)  # El PDF y el ZIP salen del plan nuevo
+    try:
+        historial.reemplazar(docente, plan, plan_nuevo)
+    except Exception as e:  # La parte ya está regenerada: que el historial no lo haga fallar
+        print(f"Error al actualizar el plan en el historial: {e}")
+    return vista, resultado_id
 
 
 # --- Callback 6: Descargar el PDF (Corregido) ---
+# También corre en segundo plano, con su propio cupo de turnos. El render y el
+# caché de PDFs están en utils/pdf.py.
 @callback(
     Output('download-pdf', 'data'), # El output es el componente de descarga
     Input('btn-download-pdf', 'n_clicks'),
-    State('ia-output-div-unificado', 'children'), # El input es el texto de Markdown
+    State('ia-resultado-id', 'data'), # Solo el ID: el Markdown ya está en el servidor
+    background=True,
+    running=[(Output('btn-download-pdf', 'disabled'), True, False)],
     prevent_initial_call=True
 )
-def download_pdf(n_clicks, markdown_text):
+def download_pdf(n_clicks, resultado_id):
+    markdown_text = resultados.obtener(resultado_id)
     if not markdown_text or n_clicks == 0:
         return dash.no_update
 
-    # --- Intento 1: Usar write_html para texto con formato ---
-    try:
-        pdf = FPDF()
-        pdf.add_page()
-        # Añadir soporte para UTF-8, buscando la fuente en la carpeta assets
-        pdf.add_font('Arial', '', 'assets/arial.ttf', uni=True)
-        pdf.set_font("Arial", size=12)
-
-        # Reemplazar saltos de línea de Markdown por <br> para que write_html los interprete
-        html_text = markdown_text.replace('\n', '<br>')
-        pdf.write_html(html_text)
-        
-        pdf_output = pdf.output()
-        if isinstance(pdf_output, str):
-            pdf_bytes = pdf_output.encode('latin-1')
-        else:
-            pdf_bytes = pdf_output
-            
-        # SOLUCIÓN: Convertir explícitamente a bytes() para dcc.send_bytes
-        return dcc.send_bytes(bytes(pdf_bytes), "Guidia_Planificacion.pdf")
+    # Si este mismo plan ya se exportó, no hace falta esperar turno
+    resultado = pdf.pdf_en_cache(markdown_text)
+    if resultado is None:
+        with trabajos.turno('pdf'):
+            resultado = pdf.generar_pdf(markdown_text)
+    if resultado is None:
+        return dash.no_update
 
-    except Exception as e1:
-        print(f"Error con write_html, usando fallback a texto plano. Error: {e1}")
-        
-        # --- Intento 2: Fallback a texto plano si write_html falla ---
-        try:
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.add_font('Arial', '', 'assets/arial.ttf', uni=True)
-            pdf.set_font("Arial", size=12)
-            
-            pdf.multi_cell(0, 10, markdown_text)
-            
-            pdf_output = pdf.output()
-            if isinstance(pdf_output, str):
-                pdf_bytes = pdf_output.encode('latin-1')
-            else:
-                pdf_bytes = pdf_output
+    pdf_bytes, nombre_archivo = resultado
+    return dcc.send_bytes(pdf_bytes, nombre_archivo)
 
-            # SOLUCIÓN: Convertir explícitamente a bytes() para dcc.send_bytes
-            return dcc.send_bytes(bytes(pdf_bytes), "Guidia_Planificacion_TextoPlano.pdf")
-            
-        except Exception as e2:
-            print(f"Error crítico al generar PDF de fallback: {e2}")
-            import traceback
-            traceback.print_exc()
-            return dash.no_update
\ No newline at end of file
+
+# --- Callback 7: Descargar un ZIP con un PDF por mes (generación en lote) ---
+@callback(
+    Output('download-zip', 'data'),
+    Input('btn-download-zip', 'n_clicks'),
+    State('ia-resultado-id', 'data'),
+    background=True,
+    running=[(Output('btn-download-zip', 'disabled'), True, False)],
+    prevent_initial_call=True
+)
+def download_zip(n_clicks, resultado_id):
+    markdown_text = resultados.obtener(resultado_id)
+    if not markdown_text or n_clicks == 0:
+        return dash.no_update
+
+    with trabajos.turno('pdf'):
+        datos_zip = lote.zip_por_mes(markdown_text)
+    return dcc.send_bytes(datos_zip, "Guidia_Planificaciones_por_Mes.zip")
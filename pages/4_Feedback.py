@@ -1,7 +1,9 @@
 import dash
-from dash import html, dcc, Input, Output
+from dash import html, dcc, Input, Output, State
 import dash_bootstrap_components as dbc
 
+from utils import feedback
+
 # Registramos la página con order=3 para que aparezca en tercera posición
 dash.register_page(__name__, path='/feedback', name='Feedback', order=3)
 
@@ -51,10 +53,18 @@ layout = dbc.Container([
 
 @dash.callback(
     Output("feedback-output", "children"),
+    Output("feedback-textarea", "value"),
     Input("submit-feedback-btn", "n_clicks"),
+    State("feedback-textarea", "value"),
+    State("feedback-rating", "value"),
     prevent_initial_call=True
 )
-def handle_feedback_submission(n_clicks):
+def handle_feedback_submission(n_clicks, mensaje, calificacion):
     if n_clicks > 0:
-        return dbc.Alert("¡Gracias por tu feedback! Lo tendremos en cuenta.", color="success", duration=4000)
-    return ""
+        # Solo se encola: un hilo lo guarda en disco por lotes (ver utils/feedback.py)
+        try:
+            feedback.registrar(mensaje, calificacion)
+        except ValueError as e:
+            return dbc.Alert(f"No se pudo enviar el feedback: {e}", color="danger", duration=4000), dash.no_update
+        return dbc.Alert("¡Gracias por tu feedback! Lo tendremos en cuenta.", color="success", duration=4000), ""
+    return "", dash.no_update
@@ -21,6 +21,7 @@ layout = dbc.Container([
 
     html.H4("3. Almacenamiento y Seguridad de los Datos"),
     html.P("Como se mencionó, todos los datos de su perfil se guardan en el almacenamiento de sesión de su navegador. Esto significa que los datos se eliminan cuando cierra la pestaña o el navegador. No tenemos acceso a esta información. La seguridad de estos datos depende de la seguridad de su propio dispositivo y navegador."),
+    html.P("Las planificaciones que genera quedan guardadas en nuestro servidor, junto con su contexto (escuela, nivel, materia y grado), para que pueda buscarlas y volver a abrirlas desde \"Mis planes anteriores\". Se asocian a un identificador al azar guardado en su navegador, no a su nombre ni a su correo; solo ese navegador puede verlas."),
 
     html.H4("4. Intercambio de Información con Terceros"),
     html.P("No vendemos, intercambiamos ni transferimos de ningún otro modo su información de identificación personal a terceros. La única información que se comparte es el contenido no personal y contextual de los prompts enviados a la API de Google Generative AI para el procesamiento del lenguaje natural. Le recomendamos revisar la política de privacidad de Google."),
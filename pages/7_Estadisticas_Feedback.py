@@ -0,0 +1,131 @@
+import datetime
+import hmac
+import os
+
+import dash
+from dash import html, dcc, Input, Output, State, no_update
+import dash_bootstrap_components as dbc
+import plotly.graph_objects as go
+
+from utils import feedback
+
+# Página interna del equipo: no aparece en el menú (ver app.py)
+dash.register_page(__name__, path='/feedback/estadisticas', name='Estadísticas de Feedback', order=7)
+
+COMENTARIOS_POR_PAGINA = 20
+
+# La página muestra los comentarios tal cual los escribieron los docentes: solo
+# se ve con /feedback/estadisticas?token=<GUIDIA_FEEDBACK_TOKEN>. Sin esa
+# variable la página no muestra nada.
+TOKEN = os.environ.get('GUIDIA_FEEDBACK_TOKEN', '')
+
+
+def _autorizado(token):
+    return bool(TOKEN) and hmac.compare_digest(str(token or ''), TOKEN)
+
+
+def _tarjeta(titulo, valor):
+    return dbc.Col(dbc.Card(dbc.CardBody([
+        html.H6(titulo, className="text-muted"),
+        html.H3(valor, className="mb-0"),
+    ]), className="text-center h-100"), md=4, className="mb-3")
+
+
+def _grafico_calificaciones(calificaciones):
+    figura = go.Figure(go.Bar(x=[str(c) for c in calificaciones], y=list(calificaciones.values())))
+    figura.update_layout(title="Calificaciones", xaxis_title="Calificación", yaxis_title="Envíos",
+                         margin=dict(l=40, r=20, t=50, b=40), height=320)
+    return figura
+
+
+def _grafico_semanas(semanas):
+    fechas = [s['semana'] for s in semanas]
+    figura = go.Figure([
+        go.Bar(x=fechas, y=[s['envios'] for s in semanas], name="Envíos", yaxis='y2', opacity=0.3),
+        go.Scatter(x=fechas, y=[s['promedio'] for s in semanas], name="Promedio semanal", mode='markers'),
+        go.Scatter(x=fechas, y=[s['promedio_movil'] for s in semanas], name="Promedio móvil (4 semanas)"),
+    ])
+    figura.update_layout(title="Evolución semanal", yaxis=dict(title="Calificación", range=[1, 5]),
+                         yaxis2=dict(title="Envíos", overlaying='y', side='right', showgrid=False),
+                         legend=dict(orientation='h'), margin=dict(l=40, r=40, t=50, b=40), height=320)
+    return figura
+
+
+def layout(token=None, **kwargs):
+    if not _autorizado(token):
+        return dbc.Container(dbc.Alert("Esta página no está disponible.", color="secondary"), className="p-5")
+    # Se arma en cada visita, leyendo solo los agregados (no los envíos)
+    resumen = feedback.agregados()
+    promedio = f"{resumen['promedio']:.2f}" if resumen['promedio'] is not None else "-"
+    return dbc.Container([
+        html.H1("Estadísticas de Feedback", className="my-4 text-center"),
+        dbc.Row([
+            _tarjeta("Envíos", resumen['envios']),
+            _tarjeta("Calificación promedio", promedio),
+            _tarjeta("Calificaciones", sum(resumen['calificaciones'].values())),
+        ]),
+        dbc.Row([
+            dbc.Col(dcc.Graph(figure=_grafico_calificaciones(resumen['calificaciones'])), md=5),
+            dbc.Col(dcc.Graph(figure=_grafico_semanas(resumen['semanas'])), md=7),
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col([
+                html.H4("Términos más mencionados"),
+                html.P("Cantidad aproximada de mensajes que mencionan cada término.", className="text-muted small"),
+                dbc.ListGroup([
+                    dbc.ListGroupItem([t['termino'], dbc.Badge(t['cantidad'], className="ms-2 float-end")])
+                    for t in resumen['terminos']
+                ] or [dbc.ListGroupItem("Todavía no hay comentarios.")]),
+            ], md=4, className="mb-4"),
+            dbc.Col([
+                html.H4("Comentarios recientes"),
+                html.Div(id="estadisticas-comentarios"),
+                dbc.ButtonGroup([
+                    dbc.Button("« Más recientes", id="estadisticas-anteriores-btn", color="secondary", outline=True),
+                    dbc.Button("Más antiguos »", id="estadisticas-siguientes-btn", color="secondary", outline=True),
+                ], className="mt-2"),
+                # Cursores de las páginas recorridas (None es la más reciente) y de la siguiente
+                dcc.Store(id="estadisticas-cursores", data={'pila': [None], 'siguiente': None}),
+                # El callback de los comentarios es una ruta propia: también pide el token
+                dcc.Store(id="estadisticas-token", data=token),
+            ], md=8),
+        ]),
+    ], fluid=True, className="p-5")
+
+
+def _comentario(fila):
+    fecha = datetime.datetime.fromtimestamp(fila['fecha']).strftime('%d/%m/%Y %H:%M')
+    calificacion = f" · {'★' * fila['calificacion']}" if fila['calificacion'] else ""
+    return dbc.ListGroupItem([
+        html.Small(f"{fecha}{calificacion}", className="text-muted"),
+        html.P(fila['mensaje'], className="mb-0", style={'whiteSpace': 'pre-wrap'}),
+    ])
+
+
+@dash.callback(
+    Output("estadisticas-comentarios", "children"),
+    Output("estadisticas-cursores", "data"),
+    Output("estadisticas-anteriores-btn", "disabled"),
+    Output("estadisticas-siguientes-btn", "disabled"),
+    Input("estadisticas-anteriores-btn", "n_clicks"),
+    Input("estadisticas-siguientes-btn", "n_clicks"),
+    State("estadisticas-cursores", "data"),
+    State("estadisticas-token", "data"),
+)
+def paginar_comentarios(_anteriores, _siguientes, cursores, token):
+    if not _autorizado(token):
+        return no_update, no_update, no_update, no_update
+    # Paginación por cursor (el id del último comentario mostrado): cada página
+    # es una lectura por índice, sin importar cuántos comentarios haya detrás
+    cursores = cursores or {'pila': [None], 'siguiente': None}
+    pila = cursores['pila']
+    if dash.ctx.triggered_id == "estadisticas-siguientes-btn" and cursores['siguiente'] is not None:
+        pila = pila + [cursores['siguiente']]
+    elif dash.ctx.triggered_id == "estadisticas-anteriores-btn" and len(pila) > 1:
+        pila = pila[:-1]
+    elif dash.ctx.triggered_id is None:
+        pila = [None]
+
+    filas, siguiente = feedback.comentarios(pila[-1], COMENTARIOS_POR_PAGINA)
+    contenido = dbc.ListGroup([_comentario(f) for f in filas]) if filas else html.P("Todavía no hay comentarios.")
+    return contenido, {'pila': pila, 'siguiente': siguiente}, len(pila) == 1, siguiente is None
@@ -0,0 +1,85 @@
+"""Genera las variantes livianas de las imágenes de assets/.
+
+Por cada imagen de VARIANTES crea versiones AVIF y WebP redimensionadas a los
+anchos indicados, con el hash del contenido en el nombre
+(ej. Guidia_Texto.254.3f9a1c0b2e.webp), y escribe assets/dist/manifest.json.
+utils/assets.imagen() lee ese manifiesto para armar el <picture>; como el
+nombre cambia cuando cambia el archivo, se pueden servir con caché "immutable".
+
+Los PNG originales quedan como están (los usa el README y son el fallback).
+
+Uso (desde la raíz del repo, después de cambiar alguna imagen):
+    python -m scripts.build_assets
+"""
+import hashlib
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, features  # noqa: E402
+
+from utils.assets import CARPETA_ASSETS, CARPETA_DIST, MANIFIESTO  # noqa: E402
+
+# Anchos (px) a generar por imagen: 1x/2x/3x de lo que realmente se muestra.
+# Solo las imágenes que la app muestra con assets.imagen(); las demás (logos y
+# gráficos del README) no se sirven desde la app y no necesitan variantes.
+VARIANTES = {
+    'Guidia_Texto.png': (127, 254, 381),  # Navbar: 30 px de alto
+}
+
+# Formato -> opciones de Pillow. El orden es el de preferencia en el <picture>.
+FORMATOS = {
+    'avif': {'quality': 60},
+    'webp': {'quality': 82, 'method': 6},
+}
+
+
+def _codificar(imagen, formato):
+    buffer = io.BytesIO()
+    imagen.save(buffer, format=formato.upper(), **FORMATOS[formato])
+    return buffer.getvalue()
+
+
+def construir():
+    os.makedirs(CARPETA_DIST, exist_ok=True)
+    formatos = [f for f in FORMATOS if features.check(f)]
+    manifiesto = {}
+    generados = {MANIFIESTO}
+
+    for nombre, anchos in VARIANTES.items():
+        with Image.open(os.path.join(CARPETA_ASSETS, nombre)) as original:
+            original.load()
+        base = os.path.splitext(nombre)[0]
+        entrada = {'ancho': original.width, 'alto': original.height, 'variantes': {}}
+
+        for formato in formatos:
+            variantes = []
+            for ancho in anchos:
+                ancho = min(ancho, original.width)  # Nunca agrandar
+                alto = round(original.height * ancho / original.width)
+                datos = _codificar(original.resize((ancho, alto), Image.LANCZOS), formato)
+                huella = hashlib.sha256(datos).hexdigest()[:10]
+                archivo = f'{base}.{ancho}.{huella}.{formato}'
+                with open(os.path.join(CARPETA_DIST, archivo), 'wb') as f:
+                    f.write(datos)
+                generados.add(archivo)
+                variantes.append([ancho, archivo])
+                print(f'{archivo:<48} {len(datos) / 1024:>7.1f} KB')
+            entrada['variantes'][formato] = variantes
+        manifiesto[nombre] = entrada
+        print(f'{nombre:<48} {os.path.getsize(os.path.join(CARPETA_ASSETS, nombre)) / 1024:>7.1f} KB (original)')
+
+    with open(os.path.join(CARPETA_DIST, MANIFIESTO), 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+
+    # Borrar las variantes de builds anteriores
+    for archivo in os.listdir(CARPETA_DIST):
+        if archivo not in generados:
+            os.remove(os.path.join(CARPETA_DIST, archivo))
+
+
+if __name__ == '__main__':
+    construir()
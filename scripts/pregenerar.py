@@ -0,0 +1,115 @@
+"""Pregenera la biblioteca de planes (ver utils/biblioteca.py).
+
+Recorre la grilla nivel x tipo de plan x materia x año/grado y genera con
+Gemini el plan de cada combinación que todavía no está en la biblioteca, con
+los datos por defecto del formulario. Las llamadas corren en paralelo (hasta
+--concurrencia a la vez) y espaciadas para no pasar de --por-minuto pedidos
+por minuto. Cada plan se guarda apenas llega: si el script se corta, al
+volver a correrlo sigue desde donde quedó.
+
+Uso (desde la raíz del repo, con GOOGLE_API_KEY configurada):
+    python -m scripts.pregenerar
+    python -m scripts.pregenerar --niveles Primario --materias Matemática Lengua
+    python -m scripts.pregenerar --listar
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+# Como en app.py: va antes de importar utils/, que lee su configuración del
+# entorno al importarse (GUIDIA_BIBLIOTECA_DIR, GUIDIA_MODELO_IA, ...)
+load_dotenv()
+
+from utils import biblioteca, llm, prompts  # noqa: E402
+from utils.config import MODELO_IA  # noqa: E402
+
+
+class LimiteDeRitmo:
+    """Deja pasar como máximo `por_minuto` llamadas por minuto, parejas en el tiempo."""
+
+    def __init__(self, por_minuto):
+        self.intervalo = 60.0 / por_minuto
+        self.proxima = time.monotonic()
+        self.lock = threading.Lock()
+
+    def esperar(self):
+        with self.lock:
+            ahora = time.monotonic()
+            turno = max(self.proxima, ahora)
+            self.proxima = turno + self.intervalo
+        time.sleep(max(0.0, turno - ahora))
+
+
+def _generar(combinacion, limite):
+    datos = biblioteca.DATOS_BASE
+    prompt = prompts.prompt_crear(
+        datos['nombre_docente'], datos['escuela_nombre'], combinacion.nivel, datos['contexto'],
+        combinacion.tipo_plan, combinacion.materia, combinacion.ano_grado, datos['mes_plan'],
+        datos['cant_alumnos'], datos['dias_clase'], datos['cant_eval'], datos['cant_tps'],
+        datos['inclusion_cant'], datos['plan_base_crear'], datos['dias_patios'],
+        datos['libro_matriz'], datos['contexto_general'],
+    )
+    limite.esperar()
+    texto = llm.generar(prompt.texto).replace('•', '  * ')  # Igual que en la página
+    biblioteca.guardar(combinacion, texto, MODELO_IA)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--niveles', nargs='+', choices=list(biblioteca.TIPOS_PLAN))
+    parser.add_argument('--materias', nargs='+', help='solo estas materias (ej. Matemática Lengua)')
+    parser.add_argument('--concurrencia', type=int, default=llm.CONCURRENCIA_MAXIMA)
+    parser.add_argument('--por-minuto', type=float, default=10, help='pedidos a Gemini por minuto')
+    parser.add_argument('--forzar', action='store_true', help='regenerar también los que ya están')
+    parser.add_argument('--listar', action='store_true', help='solo mostrar la grilla y qué falta')
+    args = parser.parse_args(argv)
+
+    combinaciones = biblioteca.grilla(args.niveles, args.materias)
+    pendientes = [c for c in combinaciones if args.forzar or not biblioteca.contiene(c)]
+    print(f"{len(combinaciones)} combinaciones, {len(pendientes)} por generar.")
+    if args.listar:
+        for combinacion in combinaciones:
+            marca = ' ' if combinacion in pendientes else 'x'
+            print(f"  [{marca}] {' / '.join(combinacion)}")
+        return 0
+    if not pendientes:
+        return 0
+
+    if not llm.configurada():
+        print("Falta GOOGLE_API_KEY (en el entorno o en .env).", file=sys.stderr)
+        return 1
+
+    limite = LimiteDeRitmo(args.por_minuto)
+    errores = 0
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as executor:
+        futuros = {executor.submit(_generar, c, limite): c for c in pendientes}
+        for hechas, futuro in enumerate(as_completed(futuros), start=1):
+            combinacion = futuros[futuro]
+            try:
+                futuro.result()
+                estado = 'ok'
+            except llm.ErrorIA as e:
+                errores += 1
+                estado = f'ERROR: {e}'
+            except Exception as e:  # Ej. un prompt que no se pudo armar o la biblioteca sin lugar: sigue con el resto
+                errores += 1
+                estado = f'ERROR ({type(e).__name__}): {e}'
+                traceback.print_exception(e, file=sys.stderr)
+            print(f"[{hechas}/{len(pendientes)}] {' / '.join(combinacion)}: {estado}", flush=True)
+
+    print(f"Listo en {time.perf_counter() - inicio:.0f} s: {len(pendientes) - errores} generados, "
+          f"{errores} con error. La biblioteca tiene {biblioteca.resumen()['planes']} planes.")
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# Los módulos de utils/ leen su configuración al importarse: los cachés de
+# las pruebas van a una carpeta temporal, no a .cache/ del repo
+os.environ.setdefault('GUIDIA_CACHE_DIR', tempfile.mkdtemp(prefix='guidia-pruebas-'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,173 @@
+import ast
+import json
+import os
+import shutil
+import subprocess
+
+import dash_bootstrap_components as dbc
+import pytest
+from dash import html
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASISTENTE_JS = os.path.join(RAIZ, 'assets', 'asistente.js')
+
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason="hace falta node para correr assets/asistente.js")
+
+# Carga asistente.js como lo haría el navegador y corre las llamadas que
+# recibe por stdin: [[función, [argumentos]], ...] -> [resultado, ...]
+EJECUTOR = """
+const fs = require('fs');
+global.window = {dash_clientside: {no_update: '__no_update__'}, crypto: require('crypto').webcrypto};
+eval(fs.readFileSync(process.argv[1], 'utf8'));
+const llamadas = JSON.parse(fs.readFileSync(0, 'utf8'));
+const funciones = window.dash_clientside.asistente;
+process.stdout.write(JSON.stringify(llamadas.map(([nombre, args]) => funciones[nombre](...args))));
+"""
+
+
+def _js(*llamadas):
+    salida = subprocess.run(['node', '-e', EJECUTOR, ASISTENTE_JS], input=json.dumps(llamadas),
+                            capture_output=True, text=True, check=True, timeout=30)
+    return json.loads(salida.stdout)
+
+
+# --- Callbacks de Python anteriores (pages/2_Asistente_IA.py antes de pasarlos a asistente.js) ---
+
+def _viejo_actualizar_niveles_y_contexto(escuela_json):
+    if not escuela_json:
+        return [], None, ""
+
+    escuela = json.loads(escuela_json) # Convertir el string JSON de vuelta a objeto
+    niveles_de_la_escuela = escuela.get('niveles', [])
+    contexto_de_la_escuela = escuela.get('contexto', 'Urbana')
+
+    opciones_nivel = [{'label': nivel, 'value': nivel} for nivel in niveles_de_la_escuela]
+    # Seleccionar automáticamente el primer nivel si existe
+    valor_nivel = opciones_nivel[0]['value'] if opciones_nivel else None
+
+    return opciones_nivel, valor_nivel, contexto_de_la_escuela
+
+
+def _viejo_mostrar_contexto_especifico_crear(nivel_seleccionado):
+    opciones_plan_crear = []
+
+    # Definir estilos para mostrar/ocultar los inputs
+    style_primario = {'display': 'none'}
+    style_secundario = {'display': 'none'}
+    style_otro = {'display': 'none'}
+
+    if nivel_seleccionado == 'Primario':
+        opciones_plan_crear = [
+            {'label': 'Plan Anual (Parrilla)', 'value': 'Anual-Primaria'},
+            {'label': 'Plan Mensual (Actividades y Rúbricas)', 'value': 'Mensual-Primaria'},
+        ]
+        style_primario = {'display': 'block'}
+    elif nivel_seleccionado == 'Secundario':
+        opciones_plan_crear = [
+            {'label': 'Plan Anual (desde Libro Matriz)', 'value': 'Anual-Secundaria'},
+            {'label': 'Plan Mensual (desde Anual)', 'value': 'Mensual-Secundaria'},
+        ]
+        style_secundario = {'display': 'block'}
+    else:
+        # Default o Nivel Inicial
+        opciones_plan_crear = [{'label': 'Planificación de Actividades', 'value': 'Actividades'}]
+        style_otro = {'display': 'block'}
+
+    inputs_especificos = [
+        html.Div([
+            dbc.Label("Eventos Especiales / Días Patrios (Opcional):"),
+            dbc.Textarea(id="ia-dias-patios", placeholder="Ej: 25 de Mayo, Día de la Bandera...", rows=2),
+        ], style=style_primario),
+
+        html.Div([
+            dbc.Label("Libro Matriz / Temario General (Opcional):"),
+            dbc.Textarea(id="ia-libro-matriz", placeholder="Ej: 'Capítulos 1-4 del libro Santillana...'", rows=2),
+        ], style=style_secundario),
+
+        html.Div([
+            dbc.Label("Contexto General:"),
+            dbc.Textarea(id="ia-contexto-general", rows=2)
+        ], style=style_otro)
+    ]
+
+    return inputs_especificos, opciones_plan_crear
+
+
+def _viejo_mostrar_formulario_principal(accion_seleccionada):
+    style_crear = {'display': 'none'}
+    style_analizar = {'display': 'none'}
+    style_adaptar = {'display': 'none'}
+
+    if accion_seleccionada == 'crear':
+        style_crear = {'display': 'block'}
+    elif accion_seleccionada == 'analizar':
+        style_analizar = {'display': 'block'}
+    elif accion_seleccionada == 'adaptar':
+        style_adaptar = {'display': 'block'}
+
+    return style_crear, style_analizar, style_adaptar
+
+
+def _viejo_toggle_mes_container(plan_type):
+    if plan_type in ['Mensual-Primaria', 'Mensual-Secundaria']:
+        return {'display': 'block'}
+    return {'display': 'none'}
+
+
+# --- Paridad ---
+
+ACCIONES = ['crear', 'analizar', 'adaptar', None, 'otra']
+NIVELES = ['Primario', 'Secundario', 'Inicial', None, '']
+TIPOS_PLAN = ['Anual-Primaria', 'Mensual-Primaria', 'Anual-Secundaria', 'Mensual-Secundaria', 'Actividades', None]
+
+ESCUELAS = [
+    {'id': 1, 'nombre': 'N° 1', 'niveles': ['Primario', 'Secundario'], 'contexto': 'Rural'},
+    {'id': 2, 'nombre': 'N° 2', 'niveles': ['Secundario']},
+    {'id': 3, 'nombre': 'N° 3', 'niveles': [], 'contexto': ''},
+    {'id': 4, 'nombre': 'N° 4', 'contexto': None},
+]
+PERFIL = {'version': 1, 'nombre_docente': 'Ana', 'apellido_docente': 'Pérez', 'instituciones': ESCUELAS}
+
+
+def test_mostrar_formulario_principal():
+    assert _js(*[['mostrarFormularioPrincipal', [a]] for a in ACCIONES]) == \
+        [list(_viejo_mostrar_formulario_principal(a)) for a in ACCIONES]
+
+
+def test_toggle_mes_container():
+    assert _js(*[['toggleMesContainer', [t]] for t in TIPOS_PLAN]) == \
+        [_viejo_toggle_mes_container(t) for t in TIPOS_PLAN]
+
+
+def test_mostrar_contexto_especifico_crear():
+    for nivel, js in zip(NIVELES, _js(*[['mostrarContextoEspecificoCrear', [n]] for n in NIVELES])):
+        componentes, opciones = _viejo_mostrar_contexto_especifico_crear(nivel)
+        # Antes se recreaban los tres campos (vacíos); ahora se muestran/ocultan y se vacían
+        assert js == [c.style for c in componentes] + [None, None, None] + [opciones]
+
+
+@pytest.mark.parametrize('datos_perfil', [PERFIL, json.dumps(PERFIL), {'perfil': PERFIL}])
+def test_actualizar_niveles_y_contexto(datos_perfil):
+    # Antes el valor del desplegable era la escuela entera en JSON; ahora es su id
+    casos = [(e['id'], json.dumps(e)) for e in ESCUELAS] + [(None, None), (99, None)]
+    resultados_js = _js(*[['actualizarNivelesYContexto', [escuela_id, datos_perfil]] for escuela_id, _ in casos])
+    assert resultados_js == [list(_viejo_actualizar_niveles_y_contexto(viejo)) for _, viejo in casos]
+
+
+def _parametros(funcion):
+    arbol = ast.parse(open(os.path.join(RAIZ, 'pages', '2_Asistente_IA.py'), encoding='utf-8').read())
+    definicion = next(n for n in ast.walk(arbol) if isinstance(n, ast.FunctionDef) and n.name == funcion)
+    return {a.arg for a in definicion.args.args}
+
+
+@pytest.mark.parametrize('accion', ['crear', 'analizar', 'adaptar'])
+def test_empaquetar_solicitud_usa_los_argumentos_de_python(accion):
+    # Las claves del pedido se pasan como **kwargs: una clave de más rompería el callback
+    solicitud, = _js(['empaquetarSolicitud', [1, accion] + [f'valor {i}' for i in range(22)]])
+    assert solicitud['accion'] == accion
+    assert set(solicitud) <= _parametros('_generar_respuesta')
+
+
+def test_empaquetar_lote_usa_los_argumentos_de_python():
+    solicitud, = _js(['empaquetarLote', [f'valor {i}' for i in range(19)]])
+    assert set(solicitud) <= _parametros('_generar_lote')
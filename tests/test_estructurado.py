@@ -0,0 +1,36 @@
+import json
+import time
+
+import pytest
+
+from utils import estructurado, llm
+
+PLAN = json.dumps({'titulo': "Plan", 'unidades': [{'titulo': "Unidad 1"}]})
+RUBRICA = json.dumps({'criterios': [{'criterio': "Lectura", 'logrado': "Sí", 'en_proceso': "Casi", 'inicial': "No"}]})
+
+
+def _generar(monkeypatch, textos, materia):
+    monkeypatch.setattr(llm, 'generar_varios', lambda pedidos, **_kwargs: textos[:len(pedidos)])
+    return estructurado.generar("prompt", 'Primario', materia, '5to Grado', None)
+
+
+def test_rubrica_invalida_no_se_cuenta_ni_se_guarda(monkeypatch):
+    antes = estructurado.resumen()
+    with pytest.raises(ValueError):
+        _generar(monkeypatch, [PLAN, '{"criterios": "no es una lista"}'], 'Lengua')
+    assert estructurado.resumen() == antes
+    assert estructurado.rubrica_guardada('Lengua', '5to Grado', estructurado.RUBRICA_GENERAL) is None
+
+
+def test_rubrica_valida_se_cuenta_y_vence(monkeypatch):
+    antes = estructurado.resumen()
+    plan = _generar(monkeypatch, [PLAN, RUBRICA], 'Matemática')
+    assert [r.desafio for r in plan.rubricas] == [estructurado.RUBRICA_GENERAL]
+    assert estructurado.resumen()['generadas'] == antes['generadas'] + 1
+
+    _generar(monkeypatch, [PLAN], 'Matemática')  # La segunda vez se reutiliza
+    assert estructurado.resumen()['reutilizadas'] == antes['reutilizadas'] + 1
+
+    clave = estructurado._clave_rubrica('Matemática', '5to Grado', estructurado.RUBRICA_GENERAL)
+    _valor, vence = estructurado._guardados.get(clave, expire_time=True)
+    assert vence is not None and vence <= time.time() + estructurado.RUBRICAS_TTL_SEGUNDOS
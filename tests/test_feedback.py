@@ -0,0 +1,124 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from utils import feedback
+
+
+def test_lectores_en_paralelo_no_suman_dos_veces(monkeypatch, tmp_path):
+    monkeypatch.setattr(feedback, 'RUTA_DB', str(tmp_path / 'feedback.db'))
+    # Filas de antes de los agregados: la primera lectura las tiene que sumar una sola vez
+    conexion = feedback.conectar()
+    with conexion:
+        conexion.executemany('INSERT INTO feedback (fecha, mensaje, calificacion) VALUES (?, ?, ?)',
+                             [(time.time(), "muy buena planificacion", 5)] * 300)
+    conexion.close()
+
+    barrera = threading.Barrier(8)
+    errores = []
+
+    def leer():
+        try:
+            barrera.wait()
+            feedback.agregados()
+        except Exception as e:  # noqa: BLE001
+            errores.append(e)
+
+    hilos = [threading.Thread(target=leer) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert not errores
+    resumen = feedback.agregados()
+    assert resumen['envios'] == 300
+    assert resumen['calificaciones'][5] == 300
+
+
+def _base_que_falla(monkeypatch, fallas):
+    # _actualizar_agregados corre dentro de la transacción del lote: si falla, el lote no se guarda
+    original = feedback._actualizar_agregados
+
+    def actualizar(conexion):
+        if fallas[0]:
+            fallas[0] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        original(conexion)
+    monkeypatch.setattr(feedback, '_actualizar_agregados', actualizar)
+    monkeypatch.setattr(feedback, 'ESPERA_REINTENTO', 0.05)
+    monkeypatch.setattr(feedback, 'INTENTOS', 1)
+
+
+def _guardados():
+    conexion = feedback.conectar()
+    try:
+        return conexion.execute('SELECT COUNT(*) FROM feedback').fetchone()[0]
+    finally:
+        conexion.close()
+
+
+def test_un_lote_que_falla_queda_pendiente_y_se_guarda_despues(monkeypatch, tmp_path):
+    monkeypatch.setattr(feedback, 'RUTA_DB', str(tmp_path / 'feedback.db'))
+    fallas = [3]  # Los tres primeros intentos fallan
+    _base_que_falla(monkeypatch, fallas)
+    feedback.registrar("primer envio", 3)
+    for _ in range(100):
+        if _guardados():
+            break
+        time.sleep(0.05)
+    assert _guardados() == 1  # Se reintentó solo, sin que llegara otro envío
+    feedback.vaciar()
+    assert fallas == [0]
+
+
+def test_lo_que_no_se_guarda_al_apagar_va_a_disco(monkeypatch, tmp_path):
+    monkeypatch.setattr(feedback, 'RUTA_DB', str(tmp_path / 'feedback.db'))
+    fallas = [10 ** 6]
+    _base_que_falla(monkeypatch, fallas)
+    feedback.registrar("se guarda en el proximo arranque", 4)
+    feedback.vaciar()
+    assert os.path.exists(feedback._ruta_pendientes())
+
+    fallas[0] = 0  # El próximo escritor encuentra la base bien y levanta el archivo
+    feedback.registrar("otro envio", 5)
+    feedback.vaciar()
+    assert not os.path.exists(feedback._ruta_pendientes())
+    assert _guardados() == 2
+    resumen = feedback.agregados()
+    assert resumen['envios'] == 2
+    assert resumen['calificaciones'][4] == 1
+
+
+def test_calificacion_invalida_no_frena_al_escritor(monkeypatch, tmp_path):
+    monkeypatch.setattr(feedback, 'RUTA_DB', str(tmp_path / 'feedback.db'))
+    for mensaje, calificacion in (("mal", '5x'), ("mal", 7), ("mal", True), (["no", "texto"], 3)):
+        with pytest.raises(ValueError):
+            feedback.registrar(mensaje, calificacion)
+    feedback.registrar("primer mensaje", '5')
+    feedback.registrar("segundo mensaje", 4)
+    feedback.vaciar()
+    assert _guardados() == 2
+    assert feedback.agregados()['calificaciones'][5] == 1
+
+
+def test_un_error_inesperado_no_mata_al_escritor(monkeypatch, tmp_path):
+    monkeypatch.setattr(feedback, 'RUTA_DB', str(tmp_path / 'feedback.db'))
+    original = feedback._actualizar_agregados
+    fallas = [1]
+
+    def actualizar(conexion):
+        if fallas[0]:
+            fallas[0] -= 1
+            raise TypeError("dato inesperado")
+        original(conexion)
+    monkeypatch.setattr(feedback, '_actualizar_agregados', actualizar)
+    feedback.registrar("primer mensaje", 3)
+    time.sleep(feedback.ESPERA_LOTE + 0.3)  # Que el primero vaya en un lote propio
+    feedback.registrar("segundo mensaje", 4)
+    feedback.vaciar()
+    assert _guardados() == 1
+    assert os.path.exists(feedback._ruta_pendientes())  # El primero quedó apartado, no perdido
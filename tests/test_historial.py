@@ -0,0 +1,14 @@
+from utils import historial
+
+DOCENTE = "0123456789abcdef0123456789abcdef"
+
+
+def test_reemplazar_cambia_el_texto_y_la_busqueda():
+    plan_id = historial.guardar(DOCENTE, "# Plan\n\nLectura de cuentos", 'crear', "Plan de Lengua")
+    assert historial.reemplazar(DOCENTE, "# Plan\n\nLectura de cuentos", "# Plan\n\nEscritura de poesías")
+    assert historial.obtener(DOCENTE, plan_id) == "# Plan\n\nEscritura de poesías"
+    planes, _ = historial.listar(DOCENTE, busqueda="poesias")
+    assert [p['id'] for p in planes] == [plan_id]
+    assert planes[0]['resumen'].startswith("Plan Escritura")
+    assert historial.listar(DOCENTE, busqueda="cuentos") == ([], None)
+    assert not historial.reemplazar(DOCENTE, "un texto que no está", "otro")
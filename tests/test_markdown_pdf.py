@@ -0,0 +1,34 @@
+import pytest
+
+from utils import markdown_pdf, pdf
+
+TABLA = "| Criterio | Logrado | En proceso |\n|---|---|---|\n| Lectura | Sin ayuda | Con ayuda |\n"
+
+
+@pytest.mark.parametrize('antes', ["", "Un párrafo sin negrita.\n\n", "*Una línea en itálica*\n\n"])
+def test_tabla_sin_negrita_antes(antes):
+    # La fila de títulos va en negrita aunque el documento todavía no la haya usado
+    datos, _nombre = pdf._renderizar(antes + TABLA)
+    assert datos.startswith(b'%PDF')
+
+
+def test_tabla_mas_alta_que_la_pagina_repite_titulos():
+    filas = '\n'.join(f"| Criterio {i} con bastante texto para ocupar dos líneas en la celda | Sí | No |"
+                      for i in range(80))
+    documento = pdf.nuevo_pdf()
+    markdown_pdf.renderizar(documento, TABLA + filas + '\n')
+    assert documento.page_no() > 1
+
+
+def test_si_falla_el_render_sale_texto_plano(monkeypatch):
+    def falla(_markdown):
+        raise RuntimeError("render roto")
+    monkeypatch.setattr(pdf, '_renderizar', falla)
+    datos, _nombre = pdf.generar_pdf("# Plan\n\nTexto.")
+    assert datos.startswith(b'%PDF')
+
+
+def test_tabla_con_caracteres_que_la_fuente_no_tiene():
+    # Un emoji en una celda no debe mandar todo el documento al texto plano
+    datos, _nombre = pdf._renderizar("| Lectura ✅ | Bien |\n|---|---|\n| Escritura ✍ | Año 5° |\n")
+    assert datos.startswith(b'%PDF')
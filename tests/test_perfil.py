@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from utils import perfil
+
+PERFIL = {'nombre_docente': 'Ana', 'apellido_docente': 'Pérez',
+          'instituciones': [{'id': 0, 'nombre': 'N° 1', 'niveles': ['Primario']}]}
+
+
+@pytest.mark.parametrize('datos', [PERFIL, json.dumps(PERFIL), {'perfil': PERFIL}, json.dumps({'perfil': PERFIL})])
+def test_formatos_aceptados(datos):
+    assert perfil.cargar(datos).escuela(0).nombre == 'N° 1'
+
+
+def test_sin_perfil():
+    assert perfil.cargar(None) is None
+    assert perfil.cargar('') is None
+
+
+@pytest.mark.parametrize('datos', ['[1, 2]', '"texto"', '3', '{"perfil": [1]}', ['no', 'es', 'un', 'dict'],
+                                   'no es JSON', {'nombre_docente': 'Ana'}])
+def test_formato_invalido_es_value_error(datos):
+    with pytest.raises(ValueError):
+        perfil.cargar(datos)
+
+
+def test_el_string_se_valida_una_sola_vez():
+    texto = json.dumps(PERFIL)
+    assert perfil.cargar(texto) is perfil.cargar(texto)
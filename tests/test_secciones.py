@@ -0,0 +1,22 @@
+from utils import secciones
+
+RUBRICA = "| Criterio | Logrado |\n|---|---|\n| Lectura | Lee textos breves con fluidez y comprende lo que lee |\n\n"
+PLAN = "# Plan de Lengua\n\n" + RUBRICA + "## Semana 1\n\nLectura compartida y escritura de un cuento breve.\n\n" + RUBRICA
+
+
+def test_partes_iguales_tienen_claves_distintas():
+    partes = secciones.dividir(PLAN)
+    assert partes[1] == partes[3] == RUBRICA
+    claves = [secciones.clave(i, s) for i, s in enumerate(partes)]
+    assert len(set(claves)) == len(claves)
+    assert [secciones.buscar(partes, c) for c in claves] == list(range(len(partes)))
+
+
+def test_una_clave_vieja_no_encuentra_otra_parte():
+    partes = secciones.dividir(PLAN)
+    clave = secciones.clave(3, partes[3])
+    # La parte 1 cambió de contenido y todo se corrió un lugar: la clave ya no vale
+    otras = secciones.dividir(PLAN.replace("## Semana 1\n", "## Semana 1\n\n## Repaso\n"))
+    assert secciones.buscar(otras, clave) is None
+    assert secciones.buscar(partes, "x-123") is None
+    assert secciones.buscar(partes, "99-" + clave.partition('-')[2]) is None
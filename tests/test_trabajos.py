@@ -0,0 +1,45 @@
+import threading
+import time
+
+from utils import trabajos
+
+
+def _esperar(condicion):
+    for _ in range(400):
+        if condicion():
+            return
+        time.sleep(0.01)
+    raise AssertionError("la condición no se cumplió a tiempo")
+
+
+def test_los_turnos_se_dan_en_orden_de_llegada(monkeypatch):
+    monkeypatch.setitem(trabajos.TURNOS_POR_TIPO, 'prueba', 1)
+    monkeypatch.setattr(trabajos, 'INTERVALO_ESPERA', 0.01)
+    orden, posiciones = [], {}
+    liberar = threading.Event()
+
+    def ocupar():
+        with trabajos.turno('prueba'):
+            liberar.wait()
+
+    def esperar_turno(numero):
+        def al_esperar(_trabajo_id, posicion):
+            posiciones[numero] = posicion
+        with trabajos.turno('prueba', al_esperar=al_esperar):
+            orden.append(numero)
+
+    hilos = [threading.Thread(target=ocupar)]
+    hilos[0].start()
+    _esperar(lambda: trabajos.resumen()['prueba']['ejecutando'] == 1)
+    for numero in range(5):
+        hilos.append(threading.Thread(target=esperar_turno, args=(numero,)))
+        hilos[-1].start()
+        _esperar(lambda: trabajos.resumen()['prueba']['en_cola'] == numero + 1)
+
+    _esperar(lambda: len(posiciones) == 5)
+    assert posiciones == {numero: numero + 1 for numero in range(5)}
+    liberar.set()
+    for hilo in hilos:
+        hilo.join(10)
+    assert orden == list(range(5))
+    assert trabajos.resumen()['prueba'] == {'ejecutando': 0, 'en_cola': 0}
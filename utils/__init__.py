@@ -0,0 +1,2 @@
+# Módulos de soporte de Guidia (IA, cachés, PDF, etc.)
+# Se mantienen fuera de /pages para que Dash no los registre como páginas.
@@ -0,0 +1,112 @@
+import os
+import re
+
+from utils import llm, prompts
+
+# --- Análisis por Partes (map-reduce) ---
+# Una planificación anual completa no entra cómoda en un solo prompt. Se parte
+# el documento por títulos (meses, unidades, encabezados), cada parte se
+# analiza en paralelo y al final un paso de "unión" arma el informe final.
+# El tiempo total depende de la parte más lenta, no del largo del documento.
+
+# A partir de este tamaño (en tokens) se usa el análisis por partes
+UMBRAL_TOKENS = int(os.environ.get('GUIDIA_ANALISIS_UMBRAL_TOKENS', 8000))
+TOKENS_POR_FRAGMENTO = int(os.environ.get('GUIDIA_ANALISIS_TOKENS_FRAGMENTO', 4000))
+MAX_FRAGMENTOS = int(os.environ.get('GUIDIA_ANALISIS_MAX_FRAGMENTOS', 16))
+
+MESES = ('enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio',
+         'agosto', 'septiembre', 'setiembre', 'octubre', 'noviembre', 'diciembre')
+_PATRON_TITULO = re.compile(
+    r'^(#{1,6}\s|(%s|unidad|semana|bloque|eje|trimestre|cuatrimestre|m[oó]dulo)\b)' % '|'.join(MESES),
+    re.IGNORECASE,
+)
+
+
+def es_documento_largo(texto):
+    return prompts.estimar_tokens(prompts.limpiar_texto(texto)) > UMBRAL_TOKENS
+
+
+def _es_titulo(linea):
+    linea = linea.strip()
+    if not linea or len(linea) > 80:
+        return False
+    # Encabezados Markdown, meses/unidades, o líneas en MAYÚSCULAS
+    return bool(_PATRON_TITULO.match(linea)) or (linea.isupper() and len(linea) >= 4)
+
+
+def _secciones(texto):
+    secciones, actual = [], []
+    for linea in texto.split('\n'):
+        if _es_titulo(linea) and any(l.strip() for l in actual):
+            secciones.append('\n'.join(actual))
+            actual = []
+        actual.append(linea)
+    if actual:
+        secciones.append('\n'.join(actual))
+    return secciones
+
+
+def _partir_seccion(seccion, max_tokens):
+    # Una sección demasiado grande se parte por párrafos (y si hace falta, por caracteres)
+    if prompts.estimar_tokens(seccion) <= max_tokens:
+        return [seccion]
+    partes = []
+    for parrafo in seccion.split('\n\n'):
+        while prompts.estimar_tokens(parrafo) > max_tokens:
+            corte = max_tokens * prompts.CARACTERES_POR_TOKEN
+            partes.append(parrafo[:corte])
+            parrafo = parrafo[corte:]
+        partes.append(parrafo)
+    return partes
+
+
+def dividir_documento(texto):
+    """Divide el documento limpio en fragmentos de tamaño parecido, respetando títulos."""
+    texto = prompts.limpiar_texto(texto)
+    max_tokens = max(TOKENS_POR_FRAGMENTO, prompts.estimar_tokens(texto) // MAX_FRAGMENTOS + 1)
+
+    piezas = [p for seccion in _secciones(texto) for p in _partir_seccion(seccion, max_tokens)]
+    fragmentos, actual, tokens_actual = [], [], 0
+    for pieza in piezas:
+        tokens = prompts.estimar_tokens(pieza)
+        if actual and tokens_actual + tokens > max_tokens:
+            fragmentos.append('\n\n'.join(actual))
+            actual, tokens_actual = [], 0
+        actual.append(pieza)
+        tokens_actual += tokens
+    if actual:
+        fragmentos.append('\n\n'.join(actual))
+    return fragmentos
+
+
+def clave_documento(texto, accion_str):
+    """Texto que identifica un análisis por partes (para el caché de respuestas)."""
+    return f"[analisis-por-partes] {accion_str}\n{prompts.limpiar_texto(texto)}"
+
+
+def analizar_por_partes(texto, accion_str, nombre_docente, escuela_nombre, al_avanzar=None, al_recibir=None):
+    """Analiza cada fragmento en paralelo y une los informes parciales.
+
+    `al_avanzar(mensaje)` informa el progreso de la etapa de partes;
+    `al_recibir(texto)` recibe en streaming el informe final.
+    """
+    fragmentos = dividir_documento(texto)
+    total = len(fragmentos)
+    comunes = {'nombre_docente': nombre_docente, 'escuela_nombre': escuela_nombre, 'accion_str': accion_str}
+
+    if al_avanzar:
+        al_avanzar(f"analizando {total} partes en paralelo...")
+    prompts_partes = [
+        prompts.construir_prompt('analizar_parte', plan_base=fragmento, numero=i, total=total, **comunes).texto
+        for i, fragmento in enumerate(fragmentos, start=1)
+    ]
+    parciales = llm.generar_varios(
+        prompts_partes,
+        al_completar=(lambda hechas, total, _indice: al_avanzar(f"partes analizadas: {hechas}/{total}...")) if al_avanzar else None,
+    )
+
+    if al_avanzar:
+        al_avanzar("uniendo el informe final...")
+    informes = '\n\n'.join(f"### Parte {i}\n{parcial}" for i, parcial in enumerate(parciales, start=1))
+    prompt_union = prompts.construir_prompt('analizar_union', plan_base=informes, total=total, **comunes)
+    return llm.generar(prompt_union.texto, al_recibir=al_recibir)
@@ -0,0 +1,126 @@
+import importlib
+import logging
+import os
+import sys
+import time
+
+import psutil
+
+# --- Arranque en Frío ---
+# El plan gratuito duerme la app cuando no se usa, así que cada segundo de
+# arranque lo sufre un docente. Este módulo mide cuánto tarda (y cuánta
+# memoria suma) cada import de la app, y lo informa al terminar de cargar.
+#
+# Dos modos:
+# - Perezoso (por defecto, ej. `python app.py`): Gemini y fpdf se importan
+#   recién con la primera generación o el primer PDF.
+# - Precarga (GUIDIA_PRECARGA=1, lo activa gunicorn.conf.py junto con
+#   preload_app): todo se importa una vez en el proceso maestro antes del
+#   fork, y los workers comparten esa memoria (copy-on-write).
+
+PRECARGA = os.environ.get('GUIDIA_PRECARGA') == '1'
+MODULOS_PESADOS = ('google.generativeai', 'google.api_core.exceptions', 'utils.fuentes_pdf')
+PAQUETES_PROPIOS = ('app', 'pages', 'utils', '__main__')
+FILAS_REPORTE = 15
+
+logger = logging.getLogger('guidia.arranque')
+if not logger.handlers:  # Ni Dash ni Gunicorn configuran el logging de la app
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+_proceso = psutil.Process()
+_pasos = []  # [(nombre, segundos, bytes de RSS sumados)]
+_pila = []  # Módulos que se están importando ahora mismo
+
+
+def _rss():
+    return _proceso.memory_info().rss
+
+
+def _es_propio(nombre):
+    return nombre.split('.')[0] in PAQUETES_PROPIOS
+
+
+class _Medicion:
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio, self.rss_inicio = time.perf_counter(), _rss()
+
+    def __exit__(self, *error):
+        _pasos.append((self.nombre, time.perf_counter() - self.inicio, _rss() - self.rss_inicio))
+
+
+def medir(nombre):
+    """Context manager: registra el tiempo y la memoria de un paso del arranque."""
+    return _Medicion(nombre)
+
+
+class _MedidorImports:
+    """Finder que envuelve el exec_module de cada import para cronometrarlo.
+
+    Solo se registran los imports que hace el código de Guidia (directos desde
+    app.py, pages/ o utils/): su tiempo incluye el de sus dependencias.
+    """
+
+    def find_spec(self, nombre, ruta=None, destino=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(nombre, ruta, destino)
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        if loader is None or isinstance(loader, type) or not hasattr(loader, 'exec_module'):
+            return spec  # Builtins y frozen: son instantáneos
+
+        original = loader.exec_module
+
+        def exec_module(modulo):
+            padre = _pila[-1] if _pila else '__main__'
+            _pila.append(nombre)
+            try:
+                if _es_propio(padre) and not _es_propio(nombre):
+                    with medir(nombre):
+                        original(modulo)
+                else:
+                    original(modulo)
+            finally:
+                _pila.pop()
+
+        loader.exec_module = exec_module
+        return spec
+
+
+_medidor = _MedidorImports()
+
+
+def iniciar():
+    """Empieza a cronometrar los imports (llamarlo lo antes posible en app.py)."""
+    if _medidor not in sys.meta_path:
+        sys.meta_path.insert(0, _medidor)
+
+
+def precargar():
+    """Importa los módulos pesados y carga las fuentes del PDF ahora."""
+    for nombre in MODULOS_PESADOS:
+        importlib.import_module(nombre)  # El medidor de imports ya los registra
+    from utils import pdf
+    with medir('fuentes del PDF'):
+        pdf.precargar_fuentes()
+
+
+def reporte():
+    """Deja en el log el desglose del arranque y deja de cronometrar imports."""
+    if _medidor in sys.meta_path:
+        sys.meta_path.remove(_medidor)
+    total = time.time() - _proceso.create_time()
+    lineas = [f"Arranque en {total:.2f} s, RSS {_rss() / 2**20:.0f} MB "
+              f"(modo {'precarga' if PRECARGA else 'perezoso'}). Pasos más lentos:"]
+    for nombre, segundos, rss in sorted(_pasos, key=lambda p: p[1], reverse=True)[:FILAS_REPORTE]:
+        lineas.append(f"  {nombre:<40} {segundos * 1000:>8.0f} ms {rss / 2**20:>+8.1f} MB")
+    logger.info('\n'.join(lineas))
+    return _pasos
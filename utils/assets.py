@@ -0,0 +1,165 @@
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from dash import html
+from flask import request
+
+from utils.config import BASE_DIR
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin brotli se comprime solo con gzip
+    brotli = None
+
+# --- Imágenes y Archivos Estáticos ---
+# scripts/build_assets.py genera en assets/dist/ versiones AVIF/WebP del
+# tamaño justo de cada imagen, con un hash en el nombre. imagen() arma el
+# <picture> a partir del manifiesto; si no hay build, usa el PNG original.
+# configurar_servidor() agrega los headers de caché y la compresión.
+
+CARPETA_ASSETS = os.path.join(BASE_DIR, 'assets')
+CARPETA_DIST = os.path.join(CARPETA_ASSETS, 'dist')
+MANIFIESTO = 'manifest.json'
+
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'  # 1 año
+CACHE_ASSETS = 'public, max-age=86400'  # 1 día (archivos sin hash en el nombre)
+
+TIPOS_COMPRIMIBLES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+TAMANO_MINIMO = 1024  # Por debajo de esto no vale la pena comprimir
+NIVEL_GZIP = 6
+CALIDAD_BROTLI = 5
+# Los estáticos se comprimen una sola vez por proceso y se reutilizan
+MAX_COMPRIMIDOS_MB = int(os.environ.get('GUIDIA_ESTATICOS_COMPRIMIDOS_MAX_MB', 32))
+
+_manifiesto = None
+_comprimidos = OrderedDict()  # {(ruta, etag, codificación): bytes}
+_bytes_comprimidos = 0
+_lock_comprimidos = threading.Lock()  # gunicorn corre con --threads
+
+
+def _variantes(nombre):
+    global _manifiesto
+    if _manifiesto is None:
+        try:
+            with open(os.path.join(CARPETA_DIST, MANIFIESTO), encoding='utf-8') as f:
+                _manifiesto = json.load(f)
+        except (OSError, ValueError):
+            _manifiesto = {}
+    return _manifiesto.get(nombre)
+
+
+def imagen(nombre, alto, **props):
+    """<picture> con las variantes AVIF/WebP de assets/<nombre> para mostrarla a `alto` px."""
+    info = _variantes(nombre)
+    if not info:
+        return html.Img(src=f'/assets/{nombre}', height=f'{alto}px', **props)
+
+    ancho = round(info['ancho'] * alto / info['alto'])
+    fuentes = [
+        html.Source(
+            type=f'image/{formato}',
+            srcSet=', '.join(f'/assets/dist/{archivo} {w}w' for w, archivo in variantes),
+            sizes=f'{ancho}px',
+        )
+        for formato, variantes in info['variantes'].items()
+    ]
+    # width/height reservan el espacio antes de que llegue la imagen
+    return html.Picture(fuentes + [
+        html.Img(src=f'/assets/{nombre}', width=ancho, height=alto, **props),
+    ])
+
+
+def _codificacion_aceptada():
+    aceptadas = request.headers.get('Accept-Encoding', '')
+    if brotli is not None and 'br' in aceptadas:
+        return 'br'
+    if 'gzip' in aceptadas:
+        return 'gzip'
+    return None
+
+
+def _comprimir(datos, codificacion):
+    if codificacion == 'br':
+        return brotli.compress(datos, quality=CALIDAD_BROTLI)
+    return gzip.compress(datos, compresslevel=NIVEL_GZIP, mtime=0)
+
+
+def _comprimir_estatico(clave, datos):
+    global _bytes_comprimidos
+    with _lock_comprimidos:
+        if clave in _comprimidos:
+            _comprimidos.move_to_end(clave)
+            return _comprimidos[clave]
+    # Se comprime fuera del lock: dos hilos con el mismo archivo pueden hacerlo a la vez, pero se guarda una vez
+    comprimido = _comprimir(datos, clave[2])
+    with _lock_comprimidos:
+        if clave in _comprimidos:
+            return _comprimidos[clave]
+        _comprimidos[clave] = comprimido
+        _bytes_comprimidos += len(comprimido)
+        while _bytes_comprimidos > MAX_COMPRIMIDOS_MB * 1024 * 1024 and len(_comprimidos) > 1:
+            _, descartado = _comprimidos.popitem(last=False)
+            _bytes_comprimidos -= len(descartado)
+    return comprimido
+
+
+def _headers_de_cache(respuesta):
+    ruta = request.path
+    if ruta.startswith('/assets/dist/'):
+        respuesta.headers['Cache-Control'] = CACHE_INMUTABLE
+    elif ruta.startswith('/assets/'):
+        # Dash agrega ?m=<fecha de modificación> a los CSS/JS y al favicon
+        respuesta.headers['Cache-Control'] = CACHE_INMUTABLE if 'm' in request.args else CACHE_ASSETS
+
+
+def _comprimir_respuesta(respuesta):
+    # send_file entrega los archivos "de pasada" (sin leerlos); eso no es streaming
+    if (respuesta.status_code != 200
+            or (respuesta.is_streamed and not respuesta.direct_passthrough)
+            or 'Content-Encoding' in respuesta.headers
+            or not (respuesta.mimetype or '').startswith(TIPOS_COMPRIMIBLES)):
+        return
+    codificacion = _codificacion_aceptada()
+    if codificacion is None:
+        return
+
+    respuesta.direct_passthrough = False
+    datos = respuesta.get_data()
+    if len(datos) < TAMANO_MINIMO:
+        return
+
+    etag, _ = respuesta.get_etag()
+    es_estatico = request.path.startswith(('/assets/', '/_dash-component-suites/'))
+    if es_estatico:
+        comprimido = _comprimir_estatico((request.full_path, etag, codificacion), datos)
+    else:
+        comprimido = _comprimir(datos, codificacion)
+
+    respuesta.set_data(comprimido)
+    respuesta.headers['Content-Encoding'] = codificacion
+    respuesta.vary.add('Accept-Encoding')
+    if etag:
+        # Otra representación del mismo archivo: otro ETag
+        respuesta.set_etag(f'{etag}-{codificacion}')
+
+
+def configurar_servidor(server):
+    """Headers de caché y compresión gzip/brotli para todo lo que sirve Flask."""
+    @server.before_request
+    def etag_sin_codificacion():
+        # El navegador revalida con el ETag comprimido ("abc-br"); se lo
+        # devolvemos a su forma original para que Flask/Dash puedan contestar 304
+        etag = request.environ.get('HTTP_IF_NONE_MATCH')
+        if etag:
+            for codificacion in ('br', 'gzip'):
+                etag = etag.replace(f'-{codificacion}"', '"')
+            request.environ['HTTP_IF_NONE_MATCH'] = etag
+
+    @server.after_request
+    def optimizar_respuesta(respuesta):
+        _headers_de_cache(respuesta)
+        _comprimir_respuesta(respuesta)
+        return respuesta
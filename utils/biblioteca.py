@@ -0,0 +1,118 @@
+import os
+from typing import NamedTuple
+
+import diskcache
+
+from utils import estadisticas
+from utils.config import CACHE_DIR
+from utils.similares import normalizar
+
+# --- Biblioteca de Planes Pregenerados ---
+# La mayoría de los pedidos de "Crear" sin plan base salen de una grilla chica
+# y previsible: nivel x tipo de plan x materia x año/grado. Esos planes se
+# generan de antemano (python -m scripts.pregenerar) y quedan en un índice
+# local; la página los sirve en milisegundos. Si el pedido trae datos propios
+# del curso (inclusión, otro mes, otra cantidad de alumnos...), se puede pedir
+# a un modelo más barato que ajuste el plan de la biblioteca en vez de generar
+# uno desde cero.
+
+CARPETA = os.environ.get('GUIDIA_BIBLIOTECA_DIR', os.path.join(CACHE_DIR, 'biblioteca'))
+PERSONALIZAR = os.environ.get('GUIDIA_BIBLIOTECA_PERSONALIZAR', '1') == '1'
+MODELO_PERSONALIZAR = os.environ.get('GUIDIA_MODELO_PERSONALIZAR', 'models/gemini-flash-latest')
+
+# Niveles de pages/1_Perfil.py y tipos de plan de cada uno (los mismos valores
+# que OPCIONES_PLAN en assets/asistente.js)
+TIPOS_PLAN = {
+    'Inicial': ['Actividades'],
+    'Primario': ['Anual-Primaria', 'Mensual-Primaria'],
+    'Secundario': ['Anual-Secundaria', 'Mensual-Secundaria'],
+}
+MATERIAS = {
+    'Inicial': ['Lenguaje', 'Matemática', 'Ciencias', 'Expresión Artística'],
+    'Primario': ['Matemática', 'Lengua', 'Ciencias Naturales', 'Ciencias Sociales'],
+    'Secundario': ['Matemática', 'Lengua y Literatura', 'Biología', 'Historia', 'Geografía',
+                   'Física', 'Química', 'Inglés'],
+}
+GRADOS = {
+    'Inicial': ['Sala de 3', 'Sala de 4', 'Sala de 5'],
+    'Primario': ['1er Grado', '2do Grado', '3er Grado', '4to Grado', '5to Grado', '6to Grado', '7mo Grado'],
+    'Secundario': ['1er Año', '2do Año', '3er Año', '4to Año', '5to Año'],
+}
+
+# Datos con los que se generan los planes de la biblioteca: los valores por
+# defecto del formulario del Asistente, sin docente ni escuela concretos
+DATOS_BASE = {
+    'nombre_docente': 'el/la docente', 'escuela_nombre': 'la escuela', 'contexto': 'Urbana',
+    'mes_plan': None, 'cant_alumnos': 30, 'dias_clase': 20, 'cant_eval': 2, 'cant_tps': 3,
+    'inclusion_cant': [], 'plan_base_crear': None, 'dias_patios': None, 'libro_matriz': None,
+    'contexto_general': None,
+}
+
+# Sin límite de tamaño ni vencimiento: se llena a mano con el script
+_biblioteca = diskcache.Index(CARPETA)
+
+
+class Combinacion(NamedTuple):
+    nivel: str
+    tipo_plan: str
+    materia: str
+    ano_grado: str
+
+
+def grilla(niveles=None, materias=None):
+    """Todas las combinaciones a pregenerar (opcionalmente, solo algunos niveles o materias)."""
+    materias_pedidas = {normalizar(m) for m in materias} if materias else None
+    combinaciones = []
+    for nivel in niveles or TIPOS_PLAN:
+        for tipo_plan in TIPOS_PLAN[nivel]:
+            for materia in MATERIAS[nivel]:
+                if materias_pedidas and normalizar(materia) not in materias_pedidas:
+                    continue
+                for ano_grado in GRADOS[nivel]:
+                    combinaciones.append(Combinacion(nivel, tipo_plan, materia, ano_grado))
+    return combinaciones
+
+
+def _clave(nivel, tipo_plan, materia, ano_grado):
+    # "Matemática / 5to Grado" y "matematica / 5° grado" son el mismo plan
+    return 'plan:' + '|'.join(normalizar(v) for v in (nivel, tipo_plan, materia, ano_grado))
+
+
+def guardar(combinacion, texto, modelo):
+    _biblioteca[_clave(*combinacion)] = {'combinacion': tuple(combinacion), 'texto': texto, 'modelo': modelo}
+
+
+def contiene(combinacion):
+    return _clave(*combinacion) in _biblioteca
+
+
+def buscar(nivel, tipo_plan, materia, ano_grado):
+    """El plan pregenerado para esa combinación, o None."""
+    entrada = _biblioteca.get(_clave(nivel, tipo_plan, materia, ano_grado))
+    estadisticas.incrementar('biblioteca_aciertos' if entrada else 'biblioteca_fallos')
+    return entrada['texto'] if entrada else None
+
+
+def es_pedido_base(contexto=None, mes_plan=None, cant_alumnos=None, dias_clase=None, cant_eval=None,
+                   cant_tps=None, inclusion_cant=(), dias_patios=None, libro_matriz=None,
+                   contexto_general=None):
+    """True si el pedido no cambia nada respecto de DATOS_BASE: el plan de la biblioteca sirve tal cual."""
+    return (normalizar(contexto) == normalizar(DATOS_BASE['contexto'])
+            and not mes_plan and not any(inclusion_cant or ())
+            and not (dias_patios or libro_matriz or contexto_general)
+            and (cant_alumnos, dias_clase, cant_eval, cant_tps) == tuple(
+                DATOS_BASE[k] for k in ('cant_alumnos', 'dias_clase', 'cant_eval', 'cant_tps')))
+
+
+def resumen():
+    aciertos = estadisticas.valor('biblioteca_aciertos')
+    fallos = estadisticas.valor('biblioteca_fallos')
+    consultas = aciertos + fallos
+    return {
+        'planes': len(_biblioteca),
+        'combinaciones': len(grilla()),
+        'personalizar': MODELO_PERSONALIZAR if PERSONALIZAR else None,
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': round(aciertos / consultas, 3) if consultas else 0.0,
+    }
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import re
+import unicodedata
+
+import diskcache
+
+from utils import estadisticas
+from utils.config import CACHE_DIR
+
+# --- Caché de Respuestas de la IA ---
+# Guarda las respuestas de Gemini en disco (SQLite), de modo que todos los
+# workers de Gunicorn comparten los resultados. Si dos docentes piden
+# exactamente lo mismo, la segunda vez no se paga otra llamada a la IA.
+
+TTL_SEGUNDOS = int(os.environ.get('GUIDIA_CACHE_TTL', 7 * 24 * 3600))  # 1 semana
+TAMANO_MAXIMO = int(os.environ.get('GUIDIA_CACHE_MAX_MB', 256)) * 1024 * 1024
+
+# Al superar el tamaño máximo se descartan las entradas menos usadas (LRU)
+_respuestas = diskcache.Cache(
+    os.path.join(CACHE_DIR, 'respuestas'),
+    size_limit=TAMANO_MAXIMO,
+    eviction_policy='least-recently-used',
+)
+
+
+def normalizar_prompt(prompt):
+    """Forma canónica del prompt: ignora indentación y espacios repetidos."""
+    texto = unicodedata.normalize('NFC', prompt or '')
+    lineas = [re.sub(r'\s+', ' ', linea).strip() for linea in texto.splitlines()]
+    return '\n'.join(linea for linea in lineas if linea)
+
+
+def clave_prompt(prompt, modelo):
+    contenido = f"{modelo}\n{normalizar_prompt(prompt)}"
+    return 'resp:' + hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def obtener(prompt, modelo):
+    """Devuelve la respuesta guardada o None. Actualiza los contadores."""
+    texto = _respuestas.get(clave_prompt(prompt, modelo))
+    if texto is None:
+        estadisticas.incrementar('cache_misses')
+        return None
+    estadisticas.incrementar('cache_hits')
+    estadisticas.incrementar('cache_caracteres_ahorrados', len(texto))
+    return texto
+
+
+def guardar(prompt, modelo, texto):
+    _respuestas.set(clave_prompt(prompt, modelo), texto, expire=TTL_SEGUNDOS)
+
+
+def registrar_bypass():
+    # El docente pidió "Regenerar": no se consulta el caché
+    estadisticas.incrementar('cache_bypass')
+
+
+def resumen():
+    hits = estadisticas.valor('cache_hits')
+    misses = estadisticas.valor('cache_misses')
+    consultas = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'bypass': estadisticas.valor('cache_bypass'),
+        'tasa_aciertos': round(hits / consultas, 3) if consultas else 0.0,
+        'caracteres_ahorrados': estadisticas.valor('cache_caracteres_ahorrados'),
+        'entradas': len(_respuestas),
+        'bytes': _respuestas.volume(),
+    }
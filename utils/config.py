@@ -0,0 +1,10 @@
+import os
+
+# --- Configuración compartida ---
+# Carpeta donde viven los cachés locales (SQLite vía diskcache). Todos los
+# workers de Gunicorn de la misma máquina apuntan a la misma carpeta.
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get('GUIDIA_CACHE_DIR', os.path.join(BASE_DIR, '.cache'))
+
+# Modelo de Gemini usado por defecto
+MODELO_IA = os.environ.get('GUIDIA_MODELO_IA', 'models/gemini-pro-latest')
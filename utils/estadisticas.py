@@ -0,0 +1,19 @@
+import os
+
+import diskcache
+
+from utils.config import CACHE_DIR
+
+# --- Contadores Compartidos ---
+# Contadores simples (aciertos de caché, tokens ahorrados, etc.) guardados en
+# disco. El incremento es atómico, así que todos los procesos suman bien.
+
+_contadores = diskcache.Cache(os.path.join(CACHE_DIR, 'estadisticas'))
+
+
+def incrementar(nombre, cantidad=1):
+    _contadores.incr(nombre, cantidad)
+
+
+def valor(nombre):
+    return _contadores.get(nombre, 0)
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import re
+from typing import Optional
+
+import diskcache
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from utils import estadisticas, llm, prompts
+from utils.cache_respuestas import TTL_SEGUNDOS
+from utils.config import CACHE_DIR
+from utils.markdown_pdf import Bloque, Fragmento, a_markdown
+from utils.similares import normalizar
+
+# --- Planes Estructurados ---
+# En vez de Markdown libre, Gemini responde un JSON con las unidades y
+# actividades del plan, que se valida en objetos con tipos. Las rúbricas van
+# aparte, una por desafío de inclusión, y se guardan por (materia, grado,
+# desafío): los planes siguientes de esa materia y año las reutilizan sin
+# pedirlas de nuevo, hasta que vencen (RUBRICAS_TTL_SEGUNDOS) o se marca
+# "Regenerar", que las pide de nuevo y reemplaza las guardadas. El Markdown de la vista y el PDF salen de los mismos bloques
+# (ver a_bloques), así que el PDF de un plan estructurado no parsea Markdown.
+
+VERSION_ESQUEMA = 1  # Subir si cambia la forma de los modelos (invalida lo guardado)
+RUBRICA_GENERAL = 'Curso en general'  # Si el pedido no marca ningún desafío de inclusión
+RUBRICAS_TTL_SEGUNDOS = int(os.environ.get('GUIDIA_RUBRICAS_TTL', 30 * 24 * 3600))  # 30 días
+
+# Rúbricas y planes ya generados, por el hash de su Markdown
+_guardados = diskcache.Cache(
+    os.path.join(CACHE_DIR, 'estructurado'),
+    size_limit=int(os.environ.get('GUIDIA_ESTRUCTURADO_MAX_MB', 64)) * 1024 * 1024,
+    eviction_policy='least-recently-used',
+)
+
+
+class Actividad(BaseModel):
+    model_config = ConfigDict(frozen=True, str_strip_whitespace=True)
+
+    titulo: str
+    descripcion: str
+    duracion: Optional[str] = None
+    adaptaciones: list[str] = []
+
+
+class Unidad(BaseModel):
+    model_config = ConfigDict(frozen=True, str_strip_whitespace=True)
+
+    titulo: str
+    periodo: Optional[str] = None
+    objetivos: list[str] = []
+    contenidos: list[str] = []
+    actividades: list[Actividad] = []
+    evaluacion: Optional[str] = None
+
+
+class Criterio(BaseModel):
+    model_config = ConfigDict(frozen=True, str_strip_whitespace=True)
+
+    criterio: str
+    logrado: str
+    en_proceso: str
+    inicial: str
+
+
+class Rubrica(BaseModel):
+    model_config = ConfigDict(frozen=True, str_strip_whitespace=True)
+
+    desafio: str
+    criterios: list[Criterio]
+    sugerencias: list[str] = []
+
+
+class Plan(BaseModel):
+    model_config = ConfigDict(frozen=True, str_strip_whitespace=True)
+
+    titulo: str
+    fundamentacion: Optional[str] = None
+    unidades: list[Unidad]
+    rubricas: list[Rubrica] = []
+
+
+def _validar(modelo, texto, **extra):
+    # Con formato JSON Gemini no debería envolverlo en ```json, pero por las dudas
+    texto = re.sub(r'^```(?:json)?\s*|\s*```$', '', texto.strip())
+    try:
+        return modelo.model_validate({**json.loads(texto), **extra})
+    except (ValueError, TypeError, ValidationError) as e:
+        raise ValueError(f"La IA no devolvió un {modelo.__name__.lower()} válido ({e.__class__.__name__})") from e
+
+
+# --- 1. Rúbricas reutilizables ---
+
+def desafios_pedidos(inclusion_cant):
+    """Los desafíos de DESAFIOS_INCLUSION con alumnos en el pedido (o la rúbrica general)."""
+    desafios = [desafio for desafio, cant in zip(prompts.DESAFIOS_INCLUSION, inclusion_cant or ()) if cant]
+    return desafios or [RUBRICA_GENERAL]
+
+
+def _clave_rubrica(materia, ano_grado, desafio):
+    # "Matemática / 5to Grado" y "matematica / 5° grado" comparten rúbricas
+    return f'rubrica:{VERSION_ESQUEMA}:' + '|'.join(normalizar(v) for v in (materia, ano_grado, desafio))
+
+
+def rubrica_guardada(materia, ano_grado, desafio):
+    datos = _guardados.get(_clave_rubrica(materia, ano_grado, desafio))
+    return Rubrica.model_validate_json(datos) if datos else None
+
+
+def _prompt_rubrica(nivel, materia, ano_grado, desafio):
+    destinatarios = ("el curso en general, sin adaptaciones específicas" if desafio == RUBRICA_GENERAL
+                     else f"alumnos con {desafio}")
+    return prompts.construir_prompt('rubrica', nivel=nivel, materia=materia, ano_grado=ano_grado,
+                                    destinatarios=destinatarios).texto
+
+
+# --- 2. Generación ---
+
+def generar(prompt, nivel, materia, ano_grado, inclusion_cant, modelo=None, regenerar=False, al_avanzar=None):
+    """Plan validado, con una rúbrica por desafío pedido.
+
+    `prompt` es el de la plantilla 'crear_estructurado'. El plan y las rúbricas
+    que faltan se piden en paralelo; con `regenerar` se piden todas de nuevo.
+    `al_avanzar(mensaje)` recibe el progreso.
+    """
+    desafios = desafios_pedidos(inclusion_cant)
+    rubricas = {} if regenerar else {d: r for d in desafios if (r := rubrica_guardada(materia, ano_grado, d))}
+    faltantes = [d for d in desafios if d not in rubricas]
+    pedidos = [prompt] + [_prompt_rubrica(nivel, materia, ano_grado, d) for d in faltantes]
+
+    def al_completar(hechas, total, _indice):
+        if al_avanzar:
+            al_avanzar(f"plan y rúbricas: {hechas} de {total} partes listas")
+
+    if al_avanzar:
+        reutilizadas = f" ({len(rubricas)} reutilizada/s)" if rubricas else ""
+        al_avanzar(f"generando el plan y {len(desafios)} rúbrica/s{reutilizadas}...")
+    textos = llm.generar_varios(pedidos, al_completar=al_completar, modelo=modelo, formato_json=True)
+
+    plan = _validar(Plan, textos[0], rubricas=[])
+    nuevas = {desafio: _validar(Rubrica, texto, desafio=desafio) for desafio, texto in zip(faltantes, textos[1:])}
+    # Se guardan y se cuentan solo si todo el plan salió válido
+    for desafio, rubrica in nuevas.items():
+        _guardados.set(_clave_rubrica(materia, ano_grado, desafio), rubrica.model_dump_json(),
+                       expire=RUBRICAS_TTL_SEGUNDOS)
+    estadisticas.incrementar('rubricas_reutilizadas', len(rubricas))
+    estadisticas.incrementar('rubricas_generadas', len(nuevas))
+    rubricas.update(nuevas)
+    return plan.model_copy(update={'rubricas': [rubricas[d] for d in desafios]})
+
+
+# --- 3. Render: bloques para la vista (Markdown) y el PDF ---
+
+def _parrafo(texto, estilo=''):
+    return Bloque('parrafo', (Fragmento(texto, estilo),))
+
+
+def _items(textos, nivel=0):
+    return [Bloque('item', (Fragmento(t),), nivel=nivel, marcador='•') for t in textos]
+
+
+def _actividad(actividad):
+    titulo = actividad.titulo + (f" ({actividad.duracion})" if actividad.duracion else "")
+    bloques = [Bloque('item', (Fragmento(titulo, 'B'), Fragmento(': ' + actividad.descripcion)), marcador='•')]
+    bloques += [Bloque('item', (Fragmento('Adaptación:', 'I'), Fragmento(' ' + a)), nivel=1, marcador='•')
+                for a in actividad.adaptaciones]
+    return bloques
+
+
+def a_bloques(plan):
+    """El plan como bloques de utils/markdown_pdf.py."""
+    bloques = [Bloque('titulo', (Fragmento(plan.titulo),), nivel=1)]
+    if plan.fundamentacion:
+        bloques += [Bloque('titulo', (Fragmento("Fundamentación"),), nivel=2), _parrafo(plan.fundamentacion)]
+    for numero, unidad in enumerate(plan.unidades, 1):
+        bloques.append(Bloque('titulo', (Fragmento(f"Unidad {numero}: {unidad.titulo}"),), nivel=2))
+        if unidad.periodo:
+            bloques.append(_parrafo(f"Período: {unidad.periodo}", 'I'))
+        for titulo, lista in (("Objetivos", unidad.objetivos), ("Contenidos", unidad.contenidos)):
+            if lista:
+                bloques += [Bloque('titulo', (Fragmento(titulo),), nivel=3)] + _items(lista)
+        if unidad.actividades:
+            bloques.append(Bloque('titulo', (Fragmento("Actividades"),), nivel=3))
+            for actividad in unidad.actividades:
+                bloques += _actividad(actividad)
+        if unidad.evaluacion:
+            bloques += [Bloque('titulo', (Fragmento("Evaluación"),), nivel=3), _parrafo(unidad.evaluacion)]
+    if plan.rubricas:
+        bloques.append(Bloque('titulo', (Fragmento("Rúbricas de Evaluación"),), nivel=2))
+    for rubrica in plan.rubricas:
+        bloques.append(Bloque('titulo', (Fragmento(rubrica.desafio),), nivel=3))
+        filas = [("Criterio", "Logrado", "En proceso", "Inicial")]
+        filas += [(c.criterio, c.logrado, c.en_proceso, c.inicial) for c in rubrica.criterios]
+        bloques.append(Bloque('tabla', filas=tuple(filas)))
+        bloques += _items(rubrica.sugerencias)
+    return bloques
+
+
+def _clave_plan(markdown):
+    return f'plan:{VERSION_ESQUEMA}:' + hashlib.sha256(markdown.encode('utf-8')).hexdigest()
+
+
+def registrar(plan):
+    """Devuelve el Markdown del plan y guarda el plan bajo ese texto, para el PDF."""
+    markdown = a_markdown(a_bloques(plan))
+    _guardados.set(_clave_plan(markdown), plan.model_dump_json(), expire=TTL_SEGUNDOS)
+    return markdown
+
+
+def buscar(markdown):
+    """El plan estructurado que produjo este Markdown, o None (ej. si se regeneró una parte)."""
+    datos = _guardados.get(_clave_plan(markdown or ''))
+    return Plan.model_validate_json(datos) if datos else None
+
+
+def resumen():
+    reutilizadas = estadisticas.valor('rubricas_reutilizadas')
+    generadas = estadisticas.valor('rubricas_generadas')
+    total = reutilizadas + generadas
+    return {
+        'reutilizadas': reutilizadas,
+        'generadas': generadas,
+        'tasa_reutilizacion': round(reutilizadas / total, 3) if total else 0.0,
+    }
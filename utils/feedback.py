@@ -0,0 +1,394 @@
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter
+from contextlib import contextmanager
+
+from utils import metricas
+from utils.config import CACHE_DIR
+
+# --- Registro de Feedback ---
+# El callback de la página de feedback solo pone el mensaje en una cola en
+# memoria y responde al instante; un hilo escritor por proceso junta lo que
+# llegue y lo guarda por lotes en una base SQLite local (modo WAL, solo se
+# agregan filas). Así una ráfaga de envíos (ej. al final de un taller) no
+# espera al disco, cada lote es una sola transacción (o se guarda entero o
+# no se guarda), y al apagarse el worker se vacía la cola antes de salir.
+# Si la base falla, el lote no se descarta: queda pendiente y se reintenta
+# con los envíos siguientes; si al apagar todavía no se pudo guardar, va a
+# un archivo al lado de la base que el próximo escritor levanta al arrancar.
+#
+# En la misma transacción de cada lote se actualizan los agregados que lee
+# la página de estadísticas (cantidad por calificación, totales por semana y
+# términos más frecuentes), así esa página no recorre todos los envíos.
+
+RUTA_DB = os.environ.get('GUIDIA_FEEDBACK_DB', os.path.join(CACHE_DIR, 'feedback.db'))
+TAMANIO_LOTE = 200
+ESPERA_LOTE = 0.5  # Segundos que se juntan envíos antes de escribir
+INTENTOS = 3  # Por lote, antes de dejarlo pendiente
+ESPERA_REINTENTO = 5  # Segundos hasta reintentar los pendientes si no llega nada nuevo
+LARGO_MAXIMO = 5000  # Caracteres por mensaje
+ESPERA_CIERRE = 10  # Segundos máximos para vaciar la cola al apagar
+MAX_TERMINOS = 200  # Términos que sigue el resumen de frecuentes (Space-Saving)
+LARGO_MINIMO_TERMINO = 4
+
+PALABRAS_VACIAS = {
+    'para', 'pero', 'como', 'esta', 'este', 'esto', 'estos', 'estas', 'porque', 'cuando', 'donde', 'sobre',
+    'entre', 'tiene', 'tienen', 'tengo', 'todo', 'toda', 'todos', 'todas', 'algo', 'seria', 'puede',
+    'pueden', 'hace', 'hacer', 'desde', 'hasta', 'cada', 'otro', 'otra', 'otros', 'otras', 'ellos',
+    'ellas', 'nada', 'bien', 'tambien', 'solo', 'sino', 'aqui', 'cual', 'quien', 'mismo', 'misma',
+    'estoy', 'estan', 'fueron', 'habia', 'tener', 'mucho', 'muchas', 'muchos', 'gracias',
+}
+
+_FIN = object()  # Marca para que el escritor termine
+
+logger = logging.getLogger('guidia.feedback')
+if not logger.handlers:  # Ni Dash ni Gunicorn configuran el logging de la app
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+
+def conectar():
+    os.makedirs(os.path.dirname(RUTA_DB), exist_ok=True)
+    conexion = sqlite3.connect(RUTA_DB, timeout=30)
+    conexion.execute('PRAGMA journal_mode=WAL')
+    conexion.execute('PRAGMA synchronous=FULL')  # Un lote confirmado sobrevive a un corte de luz
+    conexion.executescript("""
+        CREATE TABLE IF NOT EXISTS feedback (
+            id INTEGER PRIMARY KEY,
+            fecha REAL NOT NULL,
+            mensaje TEXT NOT NULL,
+            calificacion INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS feedback_comentarios ON feedback (id) WHERE mensaje != '';
+        CREATE TABLE IF NOT EXISTS feedback_calificaciones (
+            calificacion INTEGER PRIMARY KEY,
+            cantidad INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS feedback_semanas (
+            semana TEXT PRIMARY KEY,
+            envios INTEGER NOT NULL,
+            calificados INTEGER NOT NULL,
+            suma_calificaciones INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS feedback_terminos (
+            termino TEXT PRIMARY KEY,
+            cantidad INTEGER NOT NULL,
+            error INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS feedback_agregado (
+            clave TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL
+        );""")
+    return conexion
+
+
+# --- Agregados Incrementales ---
+
+def _semana(fecha):
+    dia = datetime.date.fromtimestamp(fecha)
+    return (dia - datetime.timedelta(days=dia.weekday())).isoformat()  # El lunes de esa semana
+
+
+def terminos(mensaje):
+    """Palabras con contenido de un mensaje, sin tildes ni mayúsculas."""
+    texto = unicodedata.normalize('NFKD', mensaje.lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return [p for p in re.findall(r'[a-zñ]+', texto)
+            if len(p) >= LARGO_MINIMO_TERMINO and p not in PALABRAS_VACIAS]
+
+
+def _sumar_terminos(conexion, conteo):
+    # Space-Saving: se siguen a lo sumo MAX_TERMINOS términos; uno nuevo reemplaza
+    # al menos frecuente y hereda su cuenta como error. Un término frecuente de
+    # verdad nunca queda afuera, y su cuenta real está entre cantidad - error y cantidad.
+    seguidos = dict(conexion.execute('SELECT termino, cantidad FROM feedback_terminos'))
+    for termino, cantidad in conteo.most_common():
+        if termino in seguidos:
+            seguidos[termino] += cantidad
+            conexion.execute('UPDATE feedback_terminos SET cantidad = cantidad + ? WHERE termino = ?',
+                             (cantidad, termino))
+        elif len(seguidos) < MAX_TERMINOS:
+            seguidos[termino] = cantidad
+            conexion.execute('INSERT INTO feedback_terminos VALUES (?, ?, 0)', (termino, cantidad))
+        else:
+            menos_frecuente = min(seguidos, key=seguidos.get)
+            piso = seguidos.pop(menos_frecuente)
+            seguidos[termino] = piso + cantidad
+            conexion.execute('DELETE FROM feedback_terminos WHERE termino = ?', (menos_frecuente,))
+            conexion.execute('INSERT INTO feedback_terminos VALUES (?, ?, ?)', (termino, piso + cantidad, piso))
+
+
+def _actualizar_agregados(conexion):
+    # Suma las filas nuevas desde la última vez. Corre dentro de la transacción del
+    # lote: filas y agregados se guardan juntos, y si hay filas de antes de que
+    # existieran los agregados, se suman en el primer lote o la primera lectura.
+    fila = conexion.execute("SELECT valor FROM feedback_agregado WHERE clave = 'ultimo_id'").fetchone()
+    filas = conexion.execute('SELECT id, fecha, mensaje, calificacion FROM feedback WHERE id > ? ORDER BY id',
+                             (fila[0] if fila else 0,)).fetchall()
+    if not filas:
+        return
+
+    calificaciones, semanas, conteo_terminos = Counter(), {}, Counter()
+    for _, fecha, mensaje, calificacion in filas:
+        semana = semanas.setdefault(_semana(fecha), [0, 0, 0])
+        semana[0] += 1
+        if calificacion is not None:
+            calificaciones[calificacion] += 1
+            semana[1] += 1
+            semana[2] += calificacion
+        conteo_terminos.update(set(terminos(mensaje)))  # En cuántos mensajes aparece
+
+    conexion.executemany("""
+        INSERT INTO feedback_calificaciones VALUES (?, ?)
+        ON CONFLICT (calificacion) DO UPDATE SET cantidad = cantidad + excluded.cantidad""",
+        calificaciones.items())
+    conexion.executemany("""
+        INSERT INTO feedback_semanas VALUES (?, ?, ?, ?)
+        ON CONFLICT (semana) DO UPDATE SET
+            envios = envios + excluded.envios,
+            calificados = calificados + excluded.calificados,
+            suma_calificaciones = suma_calificaciones + excluded.suma_calificaciones""",
+        [(semana, *valores) for semana, valores in semanas.items()])
+    _sumar_terminos(conexion, conteo_terminos)
+    conexion.execute("INSERT OR REPLACE INTO feedback_agregado VALUES ('ultimo_id', ?)", (filas[-1][0],))
+
+
+# --- Pendientes en Disco ---
+# Solo se usa al apagar con lotes que la base no aceptó: una línea JSON por envío.
+
+def _ruta_pendientes():
+    return RUTA_DB + '.pendientes.jsonl'
+
+
+def _guardar_pendientes(filas):
+    with open(_ruta_pendientes(), 'a', encoding='utf-8') as archivo:
+        archivo.writelines(json.dumps(fila, ensure_ascii=False) + '\n' for fila in filas)
+    logger.error("Feedback: %d envío(s) sin guardar en la base quedaron en %s", len(filas), _ruta_pendientes())
+
+
+def _tomar_pendientes():
+    # Se renombra antes de leer: si hay varios workers, uno solo se lleva cada archivo
+    tomado = f'{_ruta_pendientes()}.{os.getpid()}'
+    try:
+        os.replace(_ruta_pendientes(), tomado)
+    except FileNotFoundError:
+        return []
+    with open(tomado, encoding='utf-8') as archivo:
+        filas = [tuple(json.loads(linea)) for linea in archivo if linea.strip()]
+    os.remove(tomado)  # Desde acá viven en memoria, como los pendientes del proceso
+    logger.info("Feedback: %d envío(s) pendientes de un apagado anterior", len(filas))
+    return filas
+
+
+# --- Escritor en Segundo Plano ---
+
+class _Escritor:
+    def __init__(self):
+        self.cola = queue.SimpleQueue()
+        self.hilo = threading.Thread(target=self._correr, name='feedback-escritor', daemon=True)
+        self.hilo.start()
+
+    def _juntar_lote(self, espera=None):
+        try:
+            lote = [self.cola.get(timeout=espera)]
+        except queue.Empty:
+            return []
+        limite = time.monotonic() + ESPERA_LOTE
+        while lote[-1] is not _FIN and len(lote) < TAMANIO_LOTE:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self.cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _correr(self):
+        conexion = conectar()
+        pendientes = _tomar_pendientes()  # Lotes que no se pudieron guardar, en orden de llegada
+        terminar = False
+        while not terminar:
+            lote = self._juntar_lote(ESPERA_REINTENTO if pendientes else None)
+            if lote and lote[-1] is _FIN:
+                terminar = True
+                lote.pop()
+                # Lo que quede en la cola también se guarda antes de salir
+                while True:
+                    try:
+                        lote.append(self.cola.get_nowait())
+                    except queue.Empty:
+                        break
+            lote = pendientes + lote
+            try:
+                # Al apagar hay un solo intento: el cierre no puede esperar los reintentos
+                if lote and not self._guardar(conexion, lote, 1 if terminar else INTENTOS):
+                    pendientes = lote
+                else:
+                    pendientes = []
+            except Exception:
+                # Un error que no es de la base no se arregla reintentando: el lote va
+                # al archivo de pendientes y el escritor sigue con los envíos siguientes
+                metricas.incrementar('guidia_feedback_errores_total')
+                logger.exception("Error inesperado al guardar %d feedback(s)", len(lote))
+                self._apartar(lote)
+                pendientes = []
+        if pendientes:
+            self._apartar(pendientes)
+        conexion.close()
+
+    def _apartar(self, filas):
+        try:
+            _guardar_pendientes(filas)
+        except OSError:
+            logger.exception("Feedback: no se pudieron guardar %d envío(s) pendientes", len(filas))
+
+    def _guardar(self, conexion, lote, intentos):
+        # Si la base está ocupada o falla, se reintenta el mismo lote; si sigue
+        # fallando, devuelve False y quien llama lo deja pendiente
+        for intento in range(intentos):
+            try:
+                with conexion:
+                    conexion.executemany(
+                        'INSERT INTO feedback (fecha, mensaje, calificacion) VALUES (?, ?, ?)', lote)
+                    _actualizar_agregados(conexion)
+                return True
+            except sqlite3.Error as e:
+                metricas.incrementar('guidia_feedback_errores_total')
+                logger.warning("Error al guardar %d feedback(s) (intento %d de %d): %s",
+                               len(lote), intento + 1, intentos, e)
+                if intento + 1 < intentos:
+                    time.sleep(0.5 * 2 ** intento)
+        return False
+
+    def cerrar(self):
+        self.cola.put(_FIN)
+        self.hilo.join(ESPERA_CIERRE)
+
+
+_escritor = None
+_lock_escritor = threading.Lock()
+
+
+def _validar_calificacion(calificacion):
+    # Viene del navegador: el slider manda un entero, pero un POST puede mandar cualquier cosa
+    if calificacion is None:
+        return None
+    if isinstance(calificacion, str) and calificacion.strip().isdigit():
+        calificacion = int(calificacion)
+    elif isinstance(calificacion, float) and calificacion.is_integer():
+        calificacion = int(calificacion)
+    if type(calificacion) is not int or not 1 <= calificacion <= 5:
+        raise ValueError("La calificación tiene que ser un número del 1 al 5.")
+    return calificacion
+
+
+def registrar(mensaje, calificacion=None):
+    """Encola un feedback para guardarlo. No toca el disco: vuelve al instante.
+
+    Lanza ValueError si el mensaje no es texto o la calificación no es del 1 al 5.
+    """
+    global _escritor
+    if mensaje is not None and not isinstance(mensaje, str):
+        raise ValueError("El mensaje tiene que ser texto.")
+    calificacion = _validar_calificacion(calificacion)
+    if _escritor is None:
+        with _lock_escritor:
+            if _escritor is None:
+                _escritor = _Escritor()
+    _escritor.cola.put((time.time(), (mensaje or '').strip()[:LARGO_MAXIMO], calificacion))
+
+
+def vaciar():
+    """Guarda lo pendiente y detiene el escritor (al apagar el worker)."""
+    global _escritor
+    with _lock_escritor:
+        escritor, _escritor = _escritor, None
+    if escritor is not None:
+        escritor.cerrar()
+
+
+# --- Lectura (página de estadísticas) ---
+
+@contextmanager
+def _leer():
+    conexion = conectar()
+    try:
+        # Filas guardadas antes de que existieran los agregados (casi siempre no hay ninguna)
+        ultimo = conexion.execute("SELECT valor FROM feedback_agregado WHERE clave = 'ultimo_id'").fetchone()
+        maximo = conexion.execute('SELECT MAX(id) FROM feedback').fetchone()[0]
+        if maximo is not None and (ultimo is None or maximo > ultimo[0]):
+            # Con el lock de escritura tomado antes de leer 'ultimo_id', otro lector
+            # o el escritor no pueden sumar las mismas filas en paralelo
+            with conexion:
+                conexion.execute('BEGIN IMMEDIATE')
+                _actualizar_agregados(conexion)
+        yield conexion
+    finally:
+        conexion.close()
+
+
+def _promedio(filas):
+    calificados = sum(f[2] for f in filas)
+    return sum(f[3] for f in filas) / calificados if calificados else None
+
+
+def agregados(semanas=26, cantidad_terminos=20, ventana=4):
+    """Resumen para la página de estadísticas. No depende de cuántos envíos haya guardados."""
+    with _leer() as conexion:
+        calificaciones = dict(conexion.execute('SELECT calificacion, cantidad FROM feedback_calificaciones'))
+        # Algunas semanas de más para que el promedio móvil de las primeras esté completo
+        por_semana = conexion.execute("""
+            SELECT semana, envios, calificados, suma_calificaciones FROM feedback_semanas
+            ORDER BY semana DESC LIMIT ?""", (semanas + ventana - 1,)).fetchall()[::-1]
+        top = conexion.execute('SELECT termino, cantidad, error FROM feedback_terminos ORDER BY cantidad DESC LIMIT ?',
+                               (cantidad_terminos,)).fetchall()
+        envios = conexion.execute('SELECT SUM(envios) FROM feedback_semanas').fetchone()[0] or 0
+
+    calificados = sum(calificaciones.values())
+    inicio = max(0, len(por_semana) - semanas)
+    return {
+        'envios': envios,
+        'calificaciones': {c: calificaciones.get(c, 0) for c in range(1, 6)},
+        'promedio': sum(c * n for c, n in calificaciones.items()) / calificados if calificados else None,
+        'semanas': [
+            {'semana': fila[0], 'envios': fila[1], 'promedio': _promedio([fila]),
+             'promedio_movil': _promedio(por_semana[max(0, i - ventana + 1):i + 1])}
+            for i, fila in enumerate(por_semana) if i >= inicio
+        ],
+        'terminos': [{'termino': t, 'cantidad': n, 'minimo': n - e} for t, n, e in top],
+    }
+
+
+def comentarios(antes_de=None, cantidad=20):
+    """Una página de comentarios, del más nuevo al más viejo, desde el cursor `antes_de` (un id).
+
+    Devuelve (comentarios, cursor de la página siguiente o None si no hay más).
+    """
+    with _leer() as conexion:
+        filas = conexion.execute("""
+            SELECT id, fecha, mensaje, calificacion FROM feedback
+            WHERE mensaje != '' AND id < ? ORDER BY id DESC LIMIT ?""",
+            (antes_de if antes_de is not None else 2 ** 63 - 1, cantidad + 1)).fetchall()
+    siguiente = filas[cantidad - 1][0] if len(filas) > cantidad else None
+    return [{'id': i, 'fecha': f, 'mensaje': m, 'calificacion': c} for i, f, m, c in filas[:cantidad]], siguiente
+
+
+def _despues_de_fork():
+    # El hilo escritor no pasa al proceso hijo: que arranque uno propio si lo necesita
+    global _escritor, _lock_escritor
+    _escritor = None
+    _lock_escritor = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_despues_de_fork)
+atexit.register(vaciar)
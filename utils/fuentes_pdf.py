@@ -0,0 +1,68 @@
+import copy
+import io
+import os
+
+from fontTools import ttLib
+from fpdf import FPDF
+from fpdf.enums import TextEmphasis
+from fpdf.fonts import SubsetMap
+
+from utils.config import BASE_DIR
+
+# --- Fuentes del PDF ---
+# Todo lo que necesita fpdf/fontTools (~0,3 s de import) vive acá, así
+# utils/pdf.py se puede importar al arrancar sin pagarlo: este módulo se
+# carga con el primer PDF, o antes del fork con utils.arranque.precargar().
+
+# Fuera de /assets: Dash no las sirve al navegador
+CARPETA_FUENTES = os.path.join(BASE_DIR, 'fonts')
+FUENTES = {
+    '': 'arial.ttf',
+    'B': 'arialbd.ttf',
+    'I': 'ariali.ttf',
+    'BI': 'arialbi.ttf',
+}
+_fuentes_base = None  # {clave: (fuente ya analizada, bytes del .ttf)}
+
+
+def precargar_fuentes():
+    """Carga las fuentes en este proceso (y en los que se creen con fork después)."""
+    global _fuentes_base
+    if _fuentes_base is None:
+        plantilla = FPDF()
+        bytes_fuentes = {}
+        for estilo, archivo in FUENTES.items():
+            ruta = os.path.join(CARPETA_FUENTES, archivo)
+            plantilla.add_font('Arial', estilo, ruta)
+            with open(ruta, 'rb') as f:
+                bytes_fuentes['arial' + estilo] = f.read()
+        _fuentes_base = {clave: (fuente, bytes_fuentes[clave]) for clave, fuente in plantilla.fonts.items()}
+    return _fuentes_base
+
+
+class PDFGuidia(FPDF):
+    """FPDF que toma las fuentes precargadas recién cuando se usan.
+
+    Así un documento sin itálicas no paga el recorte (subset) de esa fuente.
+    """
+
+    def set_font(self, family=None, style='', size=0):
+        estilo = TextEmphasis.coerce(style).style if style else ''
+        clave = (family or self.font_family).lower() + ''.join(sorted(c for c in estilo if c in 'BI'))
+        if clave not in self.fonts and clave in precargar_fuentes():
+            fuente, datos = precargar_fuentes()[clave]
+            # Se reutilizan las métricas ya calculadas (anchos, cmap), pero cada
+            # documento abre su propia TTFont desde memoria: al guardarse, fpdf
+            # recorta (subset) la fuente a los caracteres usados, modificándola
+            copia = copy.deepcopy(fuente)
+            copia.ttfont = ttLib.TTFont(io.BytesIO(datos), recalcTimestamp=False, fontNumber=0, lazy=True)
+            copia.subset = SubsetMap(copia)
+            copia.i = len(self.fonts) + 1
+            self.fonts[clave] = copia
+        super().set_font(family, style, size)
+
+
+def nuevo_pdf():
+    """Un FPDF con Arial (normal, negrita, itálica) lista para usar."""
+    precargar_fuentes()
+    return PDFGuidia()
@@ -0,0 +1,156 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from utils.config import CACHE_DIR
+
+# --- Historial de Planes ---
+# Cada plan generado queda guardado con su contexto (escuela, nivel, materia,
+# grado, acción) en una base SQLite local con un índice de texto completo
+# (FTS5), así el docente puede buscarlo y volver a abrirlo sin pagar otra
+# llamada a Gemini. El listado solo lee título y resumen: el documento
+# completo (en su propia tabla) se lee recién al abrirlo.
+#
+# No hay cuentas de usuario: cada navegador tiene un identificador al azar
+# (guardado en su localStorage) y solo ve los planes generados con él.
+
+RUTA_DB = os.environ.get('GUIDIA_HISTORIAL_DB', os.path.join(CACHE_DIR, 'historial.db'))
+MAX_POR_DOCENTE = int(os.environ.get('GUIDIA_HISTORIAL_MAX', 300))  # Los más viejos se borran
+LARGO_RESUMEN = 160
+
+_local = threading.local()
+
+
+def _conexion():
+    # Una conexión por hilo y proceso (los callbacks en segundo plano son procesos aparte)
+    conexion = getattr(_local, 'conexion', None)
+    if conexion is None or _local.pid != os.getpid():
+        os.makedirs(os.path.dirname(RUTA_DB), exist_ok=True)
+        conexion = sqlite3.connect(RUTA_DB, timeout=30)
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS planes (
+                id INTEGER PRIMARY KEY,
+                docente TEXT NOT NULL,
+                fecha REAL NOT NULL,
+                accion TEXT NOT NULL,
+                titulo TEXT NOT NULL,
+                escuela TEXT,
+                nivel TEXT,
+                materia TEXT,
+                grado TEXT,
+                resumen TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS planes_docente ON planes (docente, id);
+            CREATE TABLE IF NOT EXISTS planes_texto (
+                id INTEGER PRIMARY KEY,
+                texto TEXT NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS planes_busqueda USING fts5(
+                docente, contexto, texto, tokenize = 'unicode61 remove_diacritics 2'
+            );""")
+        _local.conexion, _local.pid = conexion, os.getpid()
+    return conexion
+
+
+def docente_valido(docente):
+    """El identificador del navegador tiene que ser el que genera assets/asistente.js (32 hex)."""
+    return isinstance(docente, str) and re.fullmatch(r'[0-9a-f]{32}', docente) is not None
+
+
+def _resumen(texto):
+    # Primeras palabras del plan, sin la sintaxis de Markdown
+    plano = re.sub(r'[#*_>`|\-]+', ' ', texto)
+    plano = ' '.join(plano.split())
+    return plano if len(plano) <= LARGO_RESUMEN else plano[:LARGO_RESUMEN].rsplit(' ', 1)[0] + '…'
+
+
+def guardar(docente, texto, accion, titulo, escuela=None, nivel=None, materia=None, grado=None):
+    """Agrega un plan al historial del docente y devuelve su id (None si el docente no es válido)."""
+    if not docente_valido(docente):
+        return None
+    conexion = _conexion()
+    contexto = ' '.join(str(v) for v in (titulo, escuela, nivel, materia, grado) if v)
+    with conexion:
+        cursor = conexion.execute(
+            'INSERT INTO planes (docente, fecha, accion, titulo, escuela, nivel, materia, grado, resumen) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (docente, time.time(), accion, titulo, escuela, nivel, materia, grado, _resumen(texto)))
+        plan_id = cursor.lastrowid
+        conexion.execute('INSERT INTO planes_texto (id, texto) VALUES (?, ?)', (plan_id, texto))
+        conexion.execute('INSERT INTO planes_busqueda (rowid, docente, contexto, texto) VALUES (?, ?, ?, ?)',
+                         (plan_id, docente, contexto, texto))
+        _recortar(conexion, docente)
+    return plan_id
+
+
+def reemplazar(docente, anterior, texto):
+    """Cambia el texto del plan más reciente del docente que decía `anterior` (ej. al regenerar una parte).
+
+    Devuelve True si encontró el plan.
+    """
+    if not docente_valido(docente):
+        return False
+    conexion = _conexion()
+    with conexion:
+        fila = conexion.execute(
+            'SELECT p.id FROM planes p JOIN planes_texto t ON t.id = p.id WHERE p.docente = ? AND t.texto = ? '
+            'ORDER BY p.id DESC LIMIT 1', (docente, anterior)).fetchone()
+        if fila is None:
+            return False
+        conexion.execute('UPDATE planes SET resumen = ? WHERE id = ?', (_resumen(texto), fila[0]))
+        conexion.execute('UPDATE planes_texto SET texto = ? WHERE id = ?', (texto, fila[0]))
+        conexion.execute('UPDATE planes_busqueda SET texto = ? WHERE rowid = ?', (texto, fila[0]))
+    return True
+
+
+def _recortar(conexion, docente):
+    viejos = [fila[0] for fila in conexion.execute(
+        'SELECT id FROM planes WHERE docente = ? ORDER BY id DESC LIMIT -1 OFFSET ?', (docente, MAX_POR_DOCENTE))]
+    for tabla in ('planes', 'planes_texto'):
+        conexion.executemany(f'DELETE FROM {tabla} WHERE id = ?', [(i,) for i in viejos])
+    conexion.executemany('DELETE FROM planes_busqueda WHERE rowid = ?', [(i,) for i in viejos])
+
+
+def _consulta_fts(busqueda):
+    # Cada palabra como prefijo ("rubri" encuentra "rúbrica"); todas deben aparecer
+    palabras = re.findall(r'\w+', busqueda)
+    return ' '.join(f'"{p}"*' for p in palabras)
+
+
+def listar(docente, busqueda=None, antes_de=None, cantidad=10):
+    """Una página del historial (sin el texto completo), del más nuevo al más viejo.
+
+    `antes_de` es el cursor (un id). Devuelve (planes, cursor de la página
+    siguiente o None si no hay más).
+    """
+    if not docente_valido(docente):
+        return [], None
+    cursor = antes_de if antes_de is not None else 2 ** 63 - 1
+    columnas = 'p.id, p.fecha, p.accion, p.titulo, p.escuela, p.resumen'
+    consulta = _consulta_fts(busqueda or '')
+    if consulta:
+        # El docente también va en el índice: la búsqueda no recorre los planes de otros
+        filas = _conexion().execute(
+            f'SELECT {columnas} FROM planes_busqueda b JOIN planes p ON p.id = b.rowid '
+            'WHERE planes_busqueda MATCH ? AND b.rowid < ? ORDER BY b.rowid DESC LIMIT ?',
+            (f'docente:"{docente}" AND ({consulta})', cursor, cantidad + 1)).fetchall()
+    else:
+        filas = _conexion().execute(
+            f'SELECT {columnas} FROM planes p WHERE p.docente = ? AND p.id < ? ORDER BY p.id DESC LIMIT ?',
+            (docente, cursor, cantidad + 1)).fetchall()
+    siguiente = filas[cantidad - 1][0] if len(filas) > cantidad else None
+    planes = [dict(zip(('id', 'fecha', 'accion', 'titulo', 'escuela', 'resumen'), fila)) for fila in filas[:cantidad]]
+    return planes, siguiente
+
+
+def obtener(docente, plan_id):
+    """El texto completo de un plan del docente, o None."""
+    if not docente_valido(docente):
+        return None
+    fila = _conexion().execute(
+        'SELECT t.texto FROM planes p JOIN planes_texto t ON t.id = p.id WHERE p.id = ? AND p.docente = ?',
+        (plan_id, docente)).fetchone()
+    return fila[0] if fila else None
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+from utils import metricas
+from utils.config import MODELO_IA
+from utils.prompts import estimar_tokens
+
+# --- Cliente de Gemini ---
+# Todas las llamadas a la IA pasan por acá. Cada proceso tiene un único cliente
+# configurado y un event loop propio (en un hilo aparte) donde corren las
+# llamadas asíncronas, limitadas por un semáforo. Así una ráfaga de clics no
+# se convierte en una ráfaga de errores 429.
+
+CONCURRENCIA_MAXIMA = int(os.environ.get('GUIDIA_LLM_CONCURRENCIA', 4))
+TIMEOUT_SEGUNDOS = float(os.environ.get('GUIDIA_LLM_TIMEOUT', 180))
+REINTENTOS = int(os.environ.get('GUIDIA_LLM_REINTENTOS', 3))
+ESPERA_BASE = 1.0  # segundos; se duplica en cada reintento (con jitter)
+
+# Pedir JSON en vez de Markdown (modo estructurado, ver utils/estructurado.py)
+CONFIG_JSON = {'response_mime_type': 'application/json'}
+
+# 429 (cuota) y errores 5xx del servicio son transitorios: vale la pena reintentar
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class ErrorIA(Exception):
+    pass
+
+
+def configurada():
+    return bool(os.environ.get('GOOGLE_API_KEY'))
+
+
+class _ClienteProceso:
+    """Cliente, modelos y event loop de un proceso."""
+
+    def __init__(self):
+        import google.generativeai as genai  # ~0,5 s: se importa con el primer uso
+
+        self.pid = os.getpid()
+        # Reconfigurar descarta los canales heredados de un fork
+        genai.configure(api_key=os.environ['GOOGLE_API_KEY'])
+        self.modelos = {}
+        self.loop = asyncio.new_event_loop()
+        self.semaforo = asyncio.Semaphore(CONCURRENCIA_MAXIMA)
+        threading.Thread(target=self.loop.run_forever, name='guidia-llm', daemon=True).start()
+
+    def modelo(self, nombre):
+        if nombre not in self.modelos:
+            import google.generativeai as genai
+            self.modelos[nombre] = genai.GenerativeModel(nombre)
+        return self.modelos[nombre]
+
+
+_cliente = None
+_lock_cliente = threading.Lock()
+
+
+def _cliente_actual():
+    global _cliente
+    with _lock_cliente:
+        # Después de un fork (Gunicorn, callbacks en segundo plano) hay que crear uno nuevo
+        if _cliente is None or _cliente.pid != os.getpid():
+            _cliente = _ClienteProceso()
+        return _cliente
+
+
+def _es_reintentable(error):
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    from google.api_core import exceptions as google_exceptions
+    return isinstance(error, google_exceptions.GoogleAPICallError) and error.code in CODIGOS_REINTENTABLES
+
+
+async def _una_llamada(modelo, prompt, al_recibir, progreso, opciones):
+    if al_recibir is None:
+        respuesta = await modelo.generate_content_async(prompt, **opciones)
+        return respuesta.text
+
+    texto = ""
+    respuesta = await modelo.generate_content_async(prompt, stream=True, **opciones)
+    async for chunk in respuesta:
+        texto += chunk.text
+        if not progreso['recibido']:
+            progreso['primer_fragmento'] = time.perf_counter()
+        progreso['recibido'] = True
+        al_recibir(texto)
+    return texto
+
+
+async def generar_async(prompt, al_recibir=None, modelo=None, timeout=None, formato_json=False):
+    """Llama a Gemini con límite de concurrencia, timeout y reintentos.
+
+    Si se pasa `al_recibir`, la respuesta llega en streaming y se llama
+    `al_recibir(texto_acumulado)` con cada fragmento. Con `formato_json=True`
+    Gemini responde un JSON (sin Markdown alrededor).
+    """
+    opciones = {'generation_config': CONFIG_JSON} if formato_json else {}
+    cliente = _cliente_actual()
+    nombre_modelo = modelo or MODELO_IA
+    modelo_ia = cliente.modelo(nombre_modelo)
+    inicio_espera = time.perf_counter()
+    async with cliente.semaforo:
+        metricas.observar('guidia_llm_espera_segundos', time.perf_counter() - inicio_espera, modelo=nombre_modelo)
+        metricas.observar('guidia_llm_tokens_prompt', estimar_tokens(prompt), modelo=nombre_modelo)
+        for intento in range(REINTENTOS + 1):
+            progreso = {'recibido': False}
+            inicio = time.perf_counter()
+            try:
+                texto = await asyncio.wait_for(
+                    _una_llamada(modelo_ia, prompt, al_recibir, progreso, opciones),
+                    timeout or TIMEOUT_SEGUNDOS,
+                )
+                metricas.observar('guidia_llm_segundos', time.perf_counter() - inicio, modelo=nombre_modelo, resultado='ok')
+                metricas.observar('guidia_llm_tokens_respuesta', estimar_tokens(texto), modelo=nombre_modelo)
+                if 'primer_fragmento' in progreso:
+                    metricas.observar('guidia_llm_primer_fragmento_segundos',
+                                      progreso['primer_fragmento'] - inicio, modelo=nombre_modelo)
+                return texto
+            except Exception as e:
+                metricas.observar('guidia_llm_segundos', time.perf_counter() - inicio, modelo=nombre_modelo, resultado='error')
+                metricas.incrementar('guidia_llm_errores_total', modelo=nombre_modelo, error=type(e).__name__)
+                # Si ya se mostró texto parcial no se reintenta: se duplicaría
+                if progreso['recibido'] or not _es_reintentable(e) or intento == REINTENTOS:
+                    raise ErrorIA(str(e) or type(e).__name__) from e
+                await asyncio.sleep(random.uniform(0, ESPERA_BASE * 2 ** intento))
+
+
+def ejecutar(corrutina):
+    """Corre la corrutina en el event loop de este proceso y espera su resultado."""
+    return asyncio.run_coroutine_threadsafe(corrutina, _cliente_actual().loop).result()
+
+
+def generar(prompt, al_recibir=None, modelo=None, timeout=None, formato_json=False):
+    """Versión síncrona de `generar_async`, para usar desde los callbacks."""
+    return ejecutar(generar_async(prompt, al_recibir=al_recibir, modelo=modelo, timeout=timeout,
+                                  formato_json=formato_json))
+
+
+def generar_varios(prompts, al_completar=None, modelo=None, timeout=None, tolerar_errores=False,
+                   formato_json=False):
+    """Lanza varias llamadas en paralelo y devuelve los textos en el mismo orden.
+
+    La concurrencia real la limita el semáforo del proceso. `al_completar(hechas, total, indice)`
+    se llama cada vez que termina una llamada. Con `tolerar_errores=True`, una
+    llamada fallida deja su `ErrorIA` en la lista en vez de cortar todo.
+    """
+    async def _todas():
+        hechas = 0
+
+        async def _una(indice, prompt):
+            nonlocal hechas
+            try:
+                texto = await generar_async(prompt, modelo=modelo, timeout=timeout, formato_json=formato_json)
+            except ErrorIA as e:
+                if not tolerar_errores:
+                    raise
+                texto = e
+            hechas += 1
+            if al_completar:
+                al_completar(hechas, len(prompts), indice)
+            return texto
+
+        return await asyncio.gather(*(_una(i, prompt) for i, prompt in enumerate(prompts)))
+
+    return ejecutar(_todas())
@@ -0,0 +1,52 @@
+import io
+import re
+import zipfile
+
+from utils import pdf
+
+# --- Generación en Lote (varios meses) ---
+# Los planes mensuales de un rango de meses se generan en paralelo y se unen
+# en un único documento, con un título fijo por mes para poder separarlos
+# después (ZIP con un PDF por mes).
+
+MESES_ESCOLARES = ['Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto',
+                   'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+TITULO_MES = "# Planificación de {mes}"
+_PATRON_TITULO_MES = re.compile(r'^# Planificación de (%s)\s*$' % '|'.join(MESES_ESCOLARES), re.MULTILINE)
+
+
+def rango_meses(desde, hasta):
+    inicio, fin = MESES_ESCOLARES.index(desde), MESES_ESCOLARES.index(hasta)
+    return MESES_ESCOLARES[inicio:fin + 1]
+
+
+def combinar(textos_por_mes):
+    """Une [(mes, texto), ...] en un solo Markdown, un título por mes."""
+    return '\n\n---\n\n'.join(f"{TITULO_MES.format(mes=mes)}\n\n{texto.strip()}" for mes, texto in textos_por_mes)
+
+
+def separar(markdown_text):
+    """Inverso de `combinar`. Si el texto no viene de un lote, devuelve un único plan."""
+    titulos = list(_PATRON_TITULO_MES.finditer(markdown_text))
+    if not titulos:
+        return [('Planificacion', markdown_text)]
+    partes = []
+    for actual, siguiente in zip(titulos, titulos[1:] + [None]):
+        fin = siguiente.start() if siguiente else len(markdown_text)
+        texto = markdown_text[actual.end():fin].strip()
+        texto = re.sub(r'\n+---\s*$', '', texto)
+        partes.append((actual.group(1), texto))
+    return partes
+
+
+def zip_por_mes(markdown_text):
+    """ZIP con el Markdown y el PDF de cada mes del lote."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archivo_zip:
+        for numero, (mes, texto) in enumerate(separar(markdown_text), start=1):
+            nombre = f"{numero:02d}_{mes}"
+            archivo_zip.writestr(f"{nombre}.md", texto)
+            resultado = pdf.generar_pdf(texto)
+            if resultado is not None:
+                archivo_zip.writestr(f"{nombre}.pdf", resultado[0])
+    return buffer.getvalue()
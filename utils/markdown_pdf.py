@@ -0,0 +1,321 @@
+import re
+from typing import NamedTuple
+
+# --- Markdown a PDF ---
+# Convierte la respuesta de Gemini (Markdown) en un árbol simple de bloques
+# (títulos, párrafos, listas, tablas) con fragmentos de texto en negrita o
+# itálica, y lo dibuja directamente con las primitivas de FPDF. Una sola
+# pasada, sin HTML intermedio (si el render falla, utils/pdf.py exporta el
+# texto plano como último recurso).
+
+
+class Fragmento(NamedTuple):
+    texto: str
+    estilo: str = ''  # '', 'B', 'I' o 'BI' (como en FPDF.set_font)
+
+
+class Bloque(NamedTuple):
+    tipo: str                 # 'titulo', 'parrafo', 'item', 'cita', 'codigo', 'tabla', 'separador'
+    fragmentos: tuple = ()
+    nivel: int = 0            # Nivel del título o sangría del ítem
+    marcador: str = ''        # Viñeta o número de los ítems de lista
+    filas: tuple = ()         # Celdas (texto plano) de las tablas
+
+
+# --- 1. Parseo ---
+
+_TITULO = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_ITEM = re.compile(r'^(\s*)([*+-]|\d+[.)])\s+(.*)$')
+_SEPARADOR = re.compile(r'^\s*([-*_])(\s*\1){2,}\s*$')
+_FILA_SEPARADORA = re.compile(r'^\s*\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?\s*$')
+_INLINE = re.compile(
+    r'\*\*\*(?P<bi>.+?)\*\*\*'
+    r'|\*\*(?P<b>.+?)\*\*'
+    r'|__(?P<b2>.+?)__'
+    r'|(?<![\w*])\*(?![\s*])(?P<i>.+?)(?<![\s*])\*(?![\w*])'
+    r'|(?<!\w)_(?![\s_])(?P<i2>.+?)(?<![\s_])_(?!\w)'
+    r'|`(?P<codigo>[^`]+)`'
+    r'|\[(?P<enlace>[^\]]+)\]\((?P<url>[^)\s]+)\)'
+)
+
+
+def parsear_inline(texto):
+    """Divide una línea en fragmentos con su estilo (negrita/itálica)."""
+    fragmentos = []
+    posicion = 0
+    for match in _INLINE.finditer(texto):
+        if match.start() > posicion:
+            fragmentos.append(Fragmento(texto[posicion:match.start()]))
+        grupo = match.lastgroup
+        if grupo == 'url':
+            fragmentos.append(Fragmento(f"{match.group('enlace')} ({match.group('url')})"))
+        else:
+            estilo = {'bi': 'BI', 'b': 'B', 'b2': 'B', 'i': 'I', 'i2': 'I'}.get(grupo, '')
+            fragmentos.append(Fragmento(match.group(grupo), estilo))
+        posicion = match.end()
+    if posicion < len(texto):
+        fragmentos.append(Fragmento(texto[posicion:]))
+    return tuple(fragmentos)
+
+
+def texto_plano(texto):
+    return ''.join(f.texto for f in parsear_inline(texto))
+
+
+def _celdas(linea):
+    linea = linea.strip()
+    if linea.startswith('|'):
+        linea = linea[1:]
+    if linea.endswith('|') and not linea.endswith('\\|'):
+        linea = linea[:-1]
+    return [texto_plano(c.strip().replace('\\|', '|')) for c in re.split(r'(?<!\\)\|', linea)]
+
+
+def parsear(markdown):
+    """Convierte el Markdown en una lista de `Bloque`."""
+    bloques = []
+    lineas = (markdown or '').replace('\r\n', '\n').split('\n')
+    parrafo = []  # Líneas del párrafo en curso
+
+    def cerrar_parrafo():
+        if parrafo:
+            texto = ' '.join(l.strip() for l in parrafo)
+            bloques.append(Bloque('parrafo', parsear_inline(texto)))
+            parrafo.clear()
+
+    i = 0
+    while i < len(lineas):
+        linea = lineas[i]
+        limpia = linea.strip()
+
+        if not limpia:
+            cerrar_parrafo()
+        elif limpia.startswith('```'):
+            cerrar_parrafo()
+            codigo = []
+            i += 1
+            while i < len(lineas) and not lineas[i].strip().startswith('```'):
+                codigo.append(lineas[i])
+                i += 1
+            bloques.append(Bloque('codigo', (Fragmento('\n'.join(codigo)),)))
+        elif _TITULO.match(limpia):
+            cerrar_parrafo()
+            marcas, titulo = _TITULO.match(limpia).groups()
+            bloques.append(Bloque('titulo', parsear_inline(titulo), nivel=len(marcas)))
+        elif _SEPARADOR.match(limpia):
+            cerrar_parrafo()
+            bloques.append(Bloque('separador'))
+        elif limpia.startswith('|') and i + 1 < len(lineas) and _FILA_SEPARADORA.match(lineas[i + 1]):
+            cerrar_parrafo()
+            filas = [_celdas(linea)]
+            i += 2
+            while i < len(lineas) and lineas[i].strip().startswith('|'):
+                filas.append(_celdas(lineas[i]))
+                i += 1
+            columnas = max(len(f) for f in filas)
+            filas = tuple(tuple(f + [''] * (columnas - len(f))) for f in filas)
+            bloques.append(Bloque('tabla', filas=filas))
+            continue
+        elif _ITEM.match(linea):
+            cerrar_parrafo()
+            sangria, marcador, texto = _ITEM.match(linea).groups()
+            # Las líneas siguientes con sangría continúan el mismo ítem
+            while (i + 1 < len(lineas) and lineas[i + 1].startswith(' ') and lineas[i + 1].strip()
+                   and not _ITEM.match(lineas[i + 1]) and not lineas[i + 1].strip().startswith('|')):
+                i += 1
+                texto += ' ' + lineas[i].strip()
+            marcador = '•' if marcador in '*+-' else marcador
+            nivel = min(len(sangria.replace('\t', '  ')) // 2, 4)
+            bloques.append(Bloque('item', parsear_inline(texto), nivel=nivel, marcador=marcador))
+        elif limpia.startswith('>'):
+            cerrar_parrafo()
+            bloques.append(Bloque('cita', parsear_inline(limpia.lstrip('> '))))
+        else:
+            parrafo.append(linea)
+        i += 1
+
+    cerrar_parrafo()
+    return bloques
+
+
+# --- 2. Dibujo sobre FPDF ---
+
+FUENTE = 'Arial'
+TAMANO_TEXTO = 11
+TAMANO_TITULO = {1: 18, 2: 15, 3: 13}
+SANGRIA_ITEM = 6  # mm por nivel de lista
+
+
+def _escribir(pdf, fragmentos, tamano, alto, estilo_base=''):
+    for fragmento in fragmentos:
+        estilo = ''.join(sorted(set(estilo_base + fragmento.estilo)))
+        pdf.set_font(FUENTE, estilo, tamano)
+        pdf.write(alto, fragmento.texto)
+
+
+def _cortar_lineas(pdf, texto, ancho, anchos):
+    """Corta el texto de una celda en líneas de hasta `ancho` mm (por palabras)."""
+    espacio = pdf.get_string_width(' ')
+    lineas, actual, usado = [], [], 0.0
+    for palabra in texto.split():
+        if palabra not in anchos:
+            anchos[palabra] = pdf.get_string_width(palabra)
+        largo = anchos[palabra]
+        if actual and usado + espacio + largo > ancho:
+            lineas.append(' '.join(actual))
+            actual, usado = [], 0.0
+        usado += (espacio if actual else 0.0) + largo
+        actual.append(palabra)
+    # Una palabra más ancha que la columna queda sola en su línea (se sale un poco del borde)
+    return lineas + [' '.join(actual)] if actual else lineas or ['']
+
+
+def _con_glifos(fuente, texto):
+    # text() no tolera caracteres que la fuente no tiene (ej. emojis): se quitan,
+    # como hace write() en los párrafos
+    if texto.isascii():
+        return texto
+    return ''.join(c for c in texto if ord(c) in fuente.cmap or c.isspace())
+
+
+def _dibujar_tabla(pdf, filas, alto):
+    # Las celdas son texto plano: se cortan en líneas en una sola pasada, con el
+    # ancho de cada palabra medido una vez por estilo (las rúbricas repiten
+    # mucho vocabulario), y se dibujan con text() y rect(). pdf.table() pasa dos
+    # veces por multi_cell en cada celda y era más de la mitad del render.
+    tamano = TAMANO_TEXTO - 1
+    columnas = max(len(fila) for fila in filas)
+    ancho_columna = pdf.epw / columnas
+    relleno = 1.0  # mm entre el borde y el texto
+    alto_linea = alto * 0.9
+    anchos = {'': {}, 'B': {}}
+
+    def medir(fila, estilo):
+        pdf.set_font(FUENTE, estilo, tamano)
+        return [_cortar_lineas(pdf, _con_glifos(pdf.current_font, celda), ancho_columna - 2 * relleno,
+                               anchos[estilo]) for celda in fila]
+
+    def dibujar_fila(lineas_fila, estilo):
+        alto_fila = max(len(lineas) for lineas in lineas_fila) * alto_linea + 2 * relleno
+        if pdf.get_y() + alto_fila > pdf.page_break_trigger:
+            pdf.add_page()
+            if estilo == '':
+                dibujar_fila(encabezado, 'B')  # Se repite la fila de títulos en la página nueva
+        pdf.set_font(FUENTE, estilo, tamano)
+        y = pdf.get_y()
+        for i, lineas in enumerate(lineas_fila):
+            x = pdf.l_margin + i * ancho_columna
+            pdf.rect(x, y, ancho_columna, alto_fila)
+            for j, linea in enumerate(lineas):
+                # text() ubica la línea de base: se baja ~80% del alto de la línea
+                pdf.text(x + relleno, y + relleno + (j + 0.8) * alto_linea, linea)
+        pdf.set_xy(pdf.l_margin, y + alto_fila)
+
+    encabezado = medir(filas[0], 'B')
+    dibujar_fila(encabezado, 'B')
+    for fila in filas[1:]:
+        dibujar_fila(medir(fila, ''), '')
+
+
+def dibujar(pdf, bloques):
+    """Dibuja los bloques en el PDF (que ya debe tener las fuentes cargadas)."""
+    alto = TAMANO_TEXTO * 0.55
+    margen = pdf.l_margin
+    for bloque in bloques:
+        if bloque.tipo == 'titulo':
+            tamano = TAMANO_TITULO.get(bloque.nivel, TAMANO_TEXTO + 1)
+            pdf.ln(alto * 0.6)
+            _escribir(pdf, bloque.fragmentos, tamano, tamano * 0.55, estilo_base='B')
+            pdf.ln(tamano * 0.55 + 1.5)
+        elif bloque.tipo == 'parrafo':
+            _escribir(pdf, bloque.fragmentos, TAMANO_TEXTO, alto)
+            pdf.ln(alto + 1.5)
+        elif bloque.tipo == 'item':
+            # Sangría colgante: la viñeta queda afuera y el texto alineado
+            x_vineta = margen + SANGRIA_ITEM * bloque.nivel
+            pdf.set_font(FUENTE, '', TAMANO_TEXTO)
+            ancho_vineta = pdf.get_string_width(bloque.marcador) + 2.5
+            pdf.set_left_margin(x_vineta + ancho_vineta)
+            pdf.set_x(x_vineta)
+            pdf.cell(ancho_vineta, alto, bloque.marcador)
+            _escribir(pdf, bloque.fragmentos, TAMANO_TEXTO, alto)
+            pdf.set_left_margin(margen)
+            pdf.ln(alto + 0.5)
+        elif bloque.tipo == 'cita':
+            pdf.set_left_margin(margen + SANGRIA_ITEM)
+            pdf.set_x(margen + SANGRIA_ITEM)
+            _escribir(pdf, bloque.fragmentos, TAMANO_TEXTO, alto, estilo_base='I')
+            pdf.set_left_margin(margen)
+            pdf.ln(alto + 1.5)
+        elif bloque.tipo == 'codigo':
+            pdf.set_font(FUENTE, '', TAMANO_TEXTO - 1)
+            pdf.multi_cell(0, alto, bloque.fragmentos[0].texto, fill=False)
+            pdf.ln(1.5)
+        elif bloque.tipo == 'tabla':
+            pdf.ln(1)
+            _dibujar_tabla(pdf, bloque.filas, alto)
+            pdf.ln(alto)
+        elif bloque.tipo == 'separador':
+            y = pdf.get_y() + 1
+            pdf.line(margen, y, pdf.w - pdf.r_margin, y)
+            pdf.ln(3)
+
+
+def renderizar(pdf, markdown, bloques=None):
+    """Parsea el Markdown una vez y lo dibuja en una página nueva del PDF.
+
+    Si ya se tienen los `bloques` (un plan estructurado, ver utils/estructurado.py)
+    se dibujan esos y el Markdown no se parsea.
+    """
+    pdf.add_page()
+    dibujar(pdf, bloques if bloques is not None else parsear(markdown))
+    return pdf
+
+
+# --- 3. Bloques a Markdown ---
+# Lo inverso de parsear(): los planes estructurados se arman como bloques y de
+# ahí salen tanto el Markdown de la vista como el PDF.
+
+_MARCAS_ESTILO = {'B': '**', 'I': '*', 'BI': '***'}
+
+
+def _inline(fragmentos):
+    partes = []
+    for fragmento in fragmentos:
+        texto = re.sub(r'\s+', ' ', fragmento.texto)
+        marca = _MARCAS_ESTILO.get(fragmento.estilo, '')
+        partes.append(f"{marca}{texto.strip()}{marca}" if texto.strip() and marca else texto)
+    return ''.join(partes).strip()
+
+
+def _fila_markdown(fila):
+    return '| ' + ' | '.join(' '.join(c.split()).replace('|', '\\|') for c in fila) + ' |'
+
+
+def a_markdown(bloques):
+    """Escribe los bloques como Markdown (parsear() devuelve los mismos bloques)."""
+    lineas = []
+    anterior = None
+    for bloque in bloques:
+        # Los ítems seguidos van en la misma lista; el resto, separado por una línea en blanco
+        if lineas and not (bloque.tipo == anterior == 'item'):
+            lineas.append('')
+        if bloque.tipo == 'titulo':
+            lineas.append('#' * bloque.nivel + ' ' + _inline(bloque.fragmentos))
+        elif bloque.tipo == 'item':
+            marcador = '*' if bloque.marcador == '•' else bloque.marcador
+            lineas.append('  ' * bloque.nivel + f"{marcador} {_inline(bloque.fragmentos)}")
+        elif bloque.tipo == 'cita':
+            lineas.append('> ' + _inline(bloque.fragmentos))
+        elif bloque.tipo == 'codigo':
+            lineas.extend(['```', bloque.fragmentos[0].texto, '```'])
+        elif bloque.tipo == 'tabla':
+            lineas.append(_fila_markdown(bloque.filas[0]))
+            lineas.append('|' + '---|' * len(bloque.filas[0]))
+            lineas.extend(_fila_markdown(fila) for fila in bloque.filas[1:])
+        elif bloque.tipo == 'separador':
+            lineas.append('---')
+        else:
+            lineas.append(_inline(bloque.fragmentos))
+        anterior = bloque.tipo
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,187 @@
+import bisect
+import os
+import re
+import time
+
+import diskcache
+from flask import Response, g, request
+
+from utils.config import CACHE_DIR
+
+# --- Métricas (formato Prometheus) ---
+# Histogramas de latencia y contadores de errores de los callbacks de Dash,
+# de las llamadas a Gemini y de la exportación a PDF, más la cola de
+# trabajos, expuestos en /metrics. Como los callbacks corren en varios
+# workers y procesos en segundo plano, los valores no viven en memoria: cada
+# observación suma atómicamente en un caché en disco compartido (como
+# utils/estadisticas.py), y /metrics los lee y arma el texto al consultarlo.
+
+ACTIVAS = os.environ.get('GUIDIA_METRICAS', '1') == '1'
+
+SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKENS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+BYTES = (10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+# nombre -> (ayuda, límites de los buckets)
+HISTOGRAMAS = {
+    'guidia_callback_segundos': ("Duración de las peticiones a /_dash-update-component, por callback", SEGUNDOS),
+    'guidia_llm_segundos': ("Duración de cada intento de llamada a Gemini", SEGUNDOS),
+    'guidia_llm_primer_fragmento_segundos': ("Tiempo hasta el primer fragmento en streaming", SEGUNDOS),
+    'guidia_llm_espera_segundos': ("Espera por el límite de concurrencia de Gemini del proceso", SEGUNDOS),
+    'guidia_llm_tokens_prompt': ("Tokens estimados de los prompts enviados", TOKENS),
+    'guidia_llm_tokens_respuesta': ("Tokens estimados de las respuestas recibidas", TOKENS),
+    'guidia_ruta_segundos': ("Duración de cada pedido por ruta de modelo, incluido el respaldo (ver utils/rutas.py)",
+                             SEGUNDOS),
+    'guidia_pdf_segundos': ("Duración del render de un PDF (sin contar el caché)", SEGUNDOS),
+    'guidia_pdf_bytes': ("Tamaño de los PDFs generados", BYTES),
+    'guidia_trabajos_espera_segundos': ("Espera en cola hasta conseguir un turno de trabajo", SEGUNDOS),
+}
+CONTADORES = {
+    'guidia_callback_errores_total': "Peticiones de callbacks que terminaron con un error 5xx",
+    'guidia_llm_errores_total': "Intentos de llamada a Gemini fallidos",
+    'guidia_ruta_respaldos_total': "Pedidos que pasaron al modelo de respaldo, por ruta y motivo (plazo o error)",
+    'guidia_ruta_fuera_de_slo_total': "Pedidos que terminaron después del SLO de su ruta",
+    'guidia_pdf_errores_total': "PDFs que no se pudieron generar",
+    'guidia_feedback_errores_total': "Intentos fallidos de guardar un lote de feedback (el lote queda pendiente)",
+}
+
+RUTA_CALLBACKS = '/_dash-update-component'
+_ESCALA_SUMA = 1_000_000  # Las sumas se guardan como enteros (millonésimas)
+
+_valores = diskcache.Cache(os.path.join(CACHE_DIR, 'metricas'))
+
+
+def _etiquetas(etiquetas):
+    def escapar(valor):
+        return str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    return ','.join(f'{k}="{escapar(v)}"' for k, v in sorted(etiquetas.items()))
+
+
+def observar(nombre, valor, **etiquetas):
+    """Suma una observación al histograma `nombre`."""
+    if not ACTIVAS:
+        return
+    etiquetas_str = _etiquetas(etiquetas)
+    # Se guarda solo el bucket que corresponde; los acumulados se calculan al exponer
+    indice = bisect.bisect_left(HISTOGRAMAS[nombre][1], valor)
+    _valores.incr(f'h|{nombre}|{etiquetas_str}|{indice}')
+    _valores.incr(f's|{nombre}|{etiquetas_str}', round(valor * _ESCALA_SUMA))
+
+
+def incrementar(nombre, cantidad=1, **etiquetas):
+    if ACTIVAS:
+        _valores.incr(f'c|{nombre}|{_etiquetas(etiquetas)}', cantidad)
+
+
+class _Cronometro:
+    def __init__(self, nombre, etiquetas):
+        self.nombre, self.etiquetas = nombre, etiquetas
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *error):
+        observar(self.nombre, time.perf_counter() - self.inicio, **self.etiquetas)
+
+
+def cronometrar(nombre, **etiquetas):
+    """Context manager: observa en `nombre` los segundos que dura el bloque."""
+    return _Cronometro(nombre, etiquetas)
+
+
+def _numero(valor):
+    return repr(float(valor)) if valor != int(valor) else str(int(valor))
+
+
+def exponer():
+    """Texto en formato de exposición de Prometheus con todas las métricas."""
+    histogramas, sumas, contadores = {}, {}, {}
+    for clave in list(_valores.iterkeys()):
+        valor = _valores.get(clave)
+        if valor is None:
+            continue
+        tipo, nombre, etiquetas = clave.split('|', 2)
+        if tipo == 'h' and nombre in HISTOGRAMAS:
+            etiquetas, indice = etiquetas.rsplit('|', 1)
+            buckets = histogramas.setdefault(nombre, {}).setdefault(etiquetas, [0] * (len(HISTOGRAMAS[nombre][1]) + 1))
+            buckets[int(indice)] += valor
+        elif tipo == 's':
+            sumas[nombre, etiquetas] = valor / _ESCALA_SUMA
+        elif tipo == 'c' and nombre in CONTADORES:
+            contadores.setdefault(nombre, {})[etiquetas] = valor
+
+    lineas = []
+    for nombre, (ayuda, limites) in HISTOGRAMAS.items():
+        lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} histogram']
+        for etiquetas, buckets in sorted(histogramas.get(nombre, {}).items()):
+            separador = ',' if etiquetas else ''
+            acumulado = 0
+            for limite, cantidad in zip(list(limites) + ['+Inf'], buckets):
+                acumulado += cantidad
+                le = limite if limite == '+Inf' else _numero(limite)
+                lineas.append(f'{nombre}_bucket{{{etiquetas}{separador}le="{le}"}} {acumulado}')
+            sufijo = f'{{{etiquetas}}}' if etiquetas else ''
+            lineas.append(f'{nombre}_sum{sufijo} {_numero(sumas.get((nombre, etiquetas), 0))}')
+            lineas.append(f'{nombre}_count{sufijo} {acumulado}')
+    for nombre, ayuda in CONTADORES.items():
+        lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} counter']
+        for etiquetas, valor in sorted(contadores.get(nombre, {}).items()):
+            lineas.append(f'{nombre}{{{etiquetas}}} {valor}' if etiquetas else f'{nombre} {valor}')
+    lineas += _medidores()
+    return '\n'.join(lineas) + '\n'
+
+
+def _medidores():
+    # Valores que ya se llevan en otros módulos: se leen al momento de consultar
+    from utils import cache_respuestas, trabajos
+
+    lineas = ['# HELP guidia_trabajos Trabajos en segundo plano ejecutando y en cola, por tipo',
+              '# TYPE guidia_trabajos gauge']
+    for tipo, estados in sorted(trabajos.resumen().items()):
+        for estado, cantidad in sorted(estados.items()):
+            lineas.append(f'guidia_trabajos{{{_etiquetas({"tipo": tipo, "estado": estado})}}} {cantidad}')
+
+    cache = cache_respuestas.resumen()
+    lineas += ['# HELP guidia_cache_respuestas_total Consultas al caché de respuestas de la IA',
+               '# TYPE guidia_cache_respuestas_total counter']
+    for resultado, clave in (('acierto', 'hits'), ('fallo', 'misses'), ('bypass', 'bypass')):
+        lineas.append(f'guidia_cache_respuestas_total{{resultado="{resultado}"}} {cache[clave]}')
+    return lineas
+
+
+def _nombre_callback():
+    # Solo los callbacks registrados: un cliente no puede inventar series nuevas
+    import dash
+    salida = (request.get_json(silent=True) or {}).get('output')
+    if not isinstance(salida, str) or salida not in dash.get_app().callback_map:
+        return 'desconocido'
+    return re.sub(r'@[0-9a-f]{16,}', '', salida)  # Sufijo de las salidas con allow_duplicate
+
+
+def configurar_servidor(server):
+    """Cronometra los callbacks de Dash y agrega la ruta /metrics al servidor Flask."""
+
+    @server.before_request
+    def _empezar_callback():
+        if request.path == RUTA_CALLBACKS:
+            g.inicio_callback = time.perf_counter()
+
+    @server.after_request
+    def _terminar_callback(respuesta):
+        inicio = g.pop('inicio_callback', None)
+        if inicio is None:
+            return respuesta
+        etiquetas = {
+            'callback': _nombre_callback(),
+            # Los callbacks en segundo plano reciben una petición inicial y luego consultas de estado
+            'tipo': 'sondeo' if 'cacheKey' in request.args else 'normal',
+        }
+        observar('guidia_callback_segundos', time.perf_counter() - inicio, **etiquetas)
+        if respuesta.status_code >= 500:
+            incrementar('guidia_callback_errores_total', **etiquetas)
+        return respuesta
+
+    @server.route('/metrics')
+    def metricas():
+        return Response(exponer(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import traceback
+
+import diskcache
+
+from utils import estructurado, markdown_pdf, metricas
+from utils.config import CACHE_DIR
+
+# --- Exportación a PDF ---
+# Las fuentes TTF (Arial, ~1 MB cada una) se leen una sola vez por proceso y
+# cada documento nuevo recibe una copia de la fuente ya cargada, en vez de
+# volver a parsear el archivo en cada clic. Los PDFs terminados se guardan en
+# un caché en disco: descargar dos veces el mismo plan es instantáneo.
+# fpdf y las fuentes se cargan en utils/fuentes_pdf.py, recién al necesitarlos.
+
+VERSION_RENDER = 3  # Subir si cambia el formato de los PDFs (invalida el caché)
+
+_pdfs = diskcache.Cache(
+    os.path.join(CACHE_DIR, 'pdfs'),
+    size_limit=int(os.environ.get('GUIDIA_CACHE_PDF_MAX_MB', 128)) * 1024 * 1024,
+    eviction_policy='least-recently-used',
+)
+
+
+def precargar_fuentes():
+    """Carga fpdf y las fuentes en este proceso (y en los que se creen con fork después)."""
+    from utils import fuentes_pdf
+    return fuentes_pdf.precargar_fuentes()
+
+
+def nuevo_pdf():
+    """Un FPDF con Arial (normal, negrita, itálica) lista para usar."""
+    from utils import fuentes_pdf
+    return fuentes_pdf.nuevo_pdf()
+
+
+def _a_bytes(pdf):
+    pdf_output = pdf.output()
+    if isinstance(pdf_output, str):
+        return pdf_output.encode('latin-1')
+    return bytes(pdf_output)
+
+
+def _renderizar(markdown_text):
+    # Un solo render: el Markdown se dibuja directo con FPDF (utils/markdown_pdf.py).
+    # Si es un plan estructurado se dibuja desde el plan, sin parsear el Markdown.
+    pdf = nuevo_pdf()
+    plan = estructurado.buscar(markdown_text)
+    markdown_pdf.renderizar(pdf, markdown_text, bloques=estructurado.a_bloques(plan) if plan else None)
+    return _a_bytes(pdf), "Guidia_Planificacion.pdf"
+
+
+def _renderizar_texto_plano(markdown_text):
+    # Último recurso si el render con formato falla: el texto tal cual, para
+    # que la descarga no quede vacía
+    pdf = nuevo_pdf()
+    pdf.add_page()
+    pdf.set_font(markdown_pdf.FUENTE, '', markdown_pdf.TAMANO_TEXTO)
+    pdf.multi_cell(0, markdown_pdf.TAMANO_TEXTO * 0.55, markdown_text)
+    return _a_bytes(pdf), "Guidia_Planificacion.pdf"
+
+
+def clave_pdf(markdown_text):
+    contenido = f"{VERSION_RENDER}\n{markdown_text}"
+    return 'pdf:' + hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def pdf_en_cache(markdown_text):
+    """(bytes, nombre_archivo) si este Markdown ya se exportó, si no None."""
+    return _pdfs.get(clave_pdf(markdown_text))
+
+
+def generar_pdf(markdown_text):
+    """Devuelve (bytes, nombre_archivo), usando el caché si es posible."""
+    clave = clave_pdf(markdown_text)
+    resultado = _pdfs.get(clave)
+    if resultado is None:
+        try:
+            with metricas.cronometrar('guidia_pdf_segundos'):
+                resultado = _renderizar(markdown_text)
+        except Exception as e:
+            metricas.incrementar('guidia_pdf_errores_total')
+            print(f"Error al generar el PDF con formato, se exporta como texto plano: {e}")
+            traceback.print_exc()
+            try:
+                # No se guarda en el caché: cuando se corrija el render, que salga con formato
+                return _renderizar_texto_plano(markdown_text)
+            except Exception as e:
+                print(f"Error crítico al generar el PDF: {e}")
+                return None
+        metricas.observar('guidia_pdf_bytes', len(resultado[0]))
+        _pdfs.set(clave, resultado)
+    return resultado
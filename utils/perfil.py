@@ -0,0 +1,66 @@
+import json
+from functools import lru_cache
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+# --- Perfil del Docente ---
+# El perfil viaja en 'session-storage' como un dict (no como un string JSON),
+# y las escuelas se eligen por su id. cargar() valida el dict directamente
+# (armar una clave para memorizarlo cuesta más que validarlo); el formato
+# anterior, un string JSON, se memoriza usando el mismo string como clave.
+
+VERSION_PERFIL = 1  # Subir si cambia la forma del perfil
+
+
+class Escuela(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    id: int
+    nombre: str
+    niveles: list[str] = []
+    contexto: Optional[str] = 'Urbana'
+
+
+class Perfil(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    version: int = VERSION_PERFIL
+    nombre_docente: str
+    apellido_docente: str
+    correo_docente: Optional[str] = None
+    instituciones: list[Escuela] = []
+
+    def escuela(self, escuela_id):
+        """La escuela con ese id, o None."""
+        for escuela in self.instituciones:
+            if escuela.id == escuela_id:
+                return escuela
+        return None
+
+
+def _validar(datos):
+    if isinstance(datos, dict):
+        datos = datos.get('perfil', datos)
+    if not isinstance(datos, dict):
+        raise ValueError("El perfil guardado no tiene el formato esperado.")
+    return Perfil.model_validate(datos)
+
+
+@lru_cache(maxsize=256)
+def _validar_texto(texto):
+    return _validar(json.loads(texto))
+
+
+def cargar(datos):
+    """Perfil validado a partir de lo guardado en 'session-storage'.
+
+    Acepta también el formato anterior (un string JSON, a veces dentro de
+    {'perfil': ...}) de las pestañas abiertas antes de actualizar la app.
+    Devuelve None si no hay perfil; si no es válido lanza ValueError.
+    """
+    if not datos:
+        return None
+    if isinstance(datos, str):
+        return _validar_texto(datos)
+    return _validar(datos)
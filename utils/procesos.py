@@ -0,0 +1,76 @@
+import threading
+
+from dash import DiskcacheManager
+from flask import g
+
+# --- Lanzar Trabajos sin Heredar Bloqueos de SQLite ---
+# Dash lanza cada callback en segundo plano con fork(). Con Gunicorn en modo
+# hilos (--threads > 1), si en ese momento otro hilo del worker está dentro de
+# una operación de diskcache, el proceso hijo hereda el estado interno de
+# SQLite con ese bloqueo tomado por un hilo que en el hijo no existe: toda
+# escritura a ese archivo queda esperando hasta el timeout (lo encontró
+# benchmarks/carga.py). SQLite no soporta usar sus conexiones a través de
+# fork(), así que acá el fork espera a que ningún otro pedido del worker esté
+# en curso, y los pedidos nuevos esperan a que el fork termine.
+
+
+class _BloqueoFork:
+    """Lectores: los pedidos en curso. Escritor: el fork (tiene prioridad)."""
+
+    def __init__(self):
+        self._condicion = threading.Condition()
+        self._pedidos = 0
+        self._forks_esperando = 0
+        self._forkeando = False
+
+    def entrar(self):
+        with self._condicion:
+            self._condicion.wait_for(lambda: not self._forkeando and not self._forks_esperando)
+            self._pedidos += 1
+
+    def salir(self):
+        with self._condicion:
+            self._pedidos -= 1
+            self._condicion.notify_all()
+
+    def forkear(self, lanzar):
+        # Lo llama un pedido en curso: deja de contarse mientras espera a los demás
+        with self._condicion:
+            self._pedidos -= 1
+            self._forks_esperando += 1
+            self._condicion.wait_for(lambda: not self._forkeando and not self._pedidos)
+            self._forks_esperando -= 1
+            self._forkeando = True
+        try:
+            return lanzar()
+        finally:
+            with self._condicion:
+                self._forkeando = False
+                self._pedidos += 1
+                self._condicion.notify_all()
+
+
+_bloqueo = _BloqueoFork()
+
+
+class GestorSegundoPlano(DiskcacheManager):
+    """DiskcacheManager que lanza los trabajos solo cuando no hay otro pedido usando SQLite."""
+
+    def call_job_fn(self, key, job_fn, args, context):
+        if not g.get('dentro_de_pedido'):
+            return super().call_job_fn(key, job_fn, args, context)
+        return _bloqueo.forkear(lambda: super(GestorSegundoPlano, self).call_job_fn(key, job_fn, args, context))
+
+
+def configurar_servidor(server):
+    """Registra cada pedido al servidor Flask para que los forks esperen a que terminen."""
+
+    @server.before_request
+    def _entrar():
+        _bloqueo.entrar()
+        g.dentro_de_pedido = True
+
+    @server.teardown_request
+    def _salir(error=None):
+        if g.pop('dentro_de_pedido', False):
+            _bloqueo.salir()
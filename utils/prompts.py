@@ -0,0 +1,313 @@
+import math
+import os
+import re
+import textwrap
+import unicodedata
+from typing import NamedTuple
+
+from utils import estadisticas
+
+# --- Constructor de Prompts ---
+# Arma los prompts de cada acción a partir de plantillas, limpia lo que pega
+# el docente (espacios, párrafos repetidos) y lo recorta a un presupuesto de
+# tokens, para no mandar a Gemini un libro matriz entero de 60 páginas.
+
+# Presupuesto de tokens para el texto pegado por el docente, por acción
+PRESUPUESTO_TOKENS = {
+    'crear': int(os.environ.get('GUIDIA_TOKENS_CREAR', 6000)),
+    'analizar': int(os.environ.get('GUIDIA_TOKENS_ANALIZAR', 24000)),
+    'adaptar': int(os.environ.get('GUIDIA_TOKENS_ADAPTAR', 3000)),
+    # Análisis por partes (ver utils/analisis.py): cada fragmento ya viene
+    # dimensionado, y la unión recibe los informes parciales
+    'analizar_parte': int(os.environ.get('GUIDIA_TOKENS_ANALIZAR', 24000)),
+    'analizar_union': int(os.environ.get('GUIDIA_TOKENS_ANALIZAR', 24000)),
+    # Ajuste de un plan de la biblioteca pregenerada (ver utils/biblioteca.py)
+    'personalizar': int(os.environ.get('GUIDIA_TOKENS_PERSONALIZAR', 8000)),
+    # Una sola parte de un plan ya generado (ver utils/secciones.py)
+    'seccion': int(os.environ.get('GUIDIA_TOKENS_SECCION', 4000)),
+    # Modo estructurado (ver utils/estructurado.py): el plan en JSON, y las
+    # rúbricas por desafío, que no llevan texto pegado
+    'crear_estructurado': int(os.environ.get('GUIDIA_TOKENS_CREAR', 6000)),
+    'rubrica': 0,
+}
+CARACTERES_POR_TOKEN = 4  # Aproximación razonable para texto en español
+
+DESAFIOS_INCLUSION = [
+    'TDAH (Déficit de Atención con Hiperactividad)',
+    'Dislexia',
+    'TDA (Déficit de Atención sin Hiperactividad)',
+    'TEA (Trastorno del Espectro Autista Leve)',
+    'Discalculia (Dificultad Matemática)',
+    'Altas Capacidades',
+]
+
+PLANTILLAS = {
+    'crear': """
+        **Rol:** Eres Guidia, un Asesor Pedagógico experto en Nivel {nivel} en una escuela {contexto} de Mendoza.
+        **Cliente:** {nombre_docente} (Escuela: {escuela_nombre}).
+        **Tarea:** CREAR una "{plan_str}" para la materia {materia}, en el año/grado {ano_grado}.
+
+        **Contexto del Aula y Plan:**
+        * Días de clase: {dias_clase}
+        * Cantidad de Alumnos: {cant_alumnos}
+        * Carga evaluativa: {cant_eval} evaluaciones y {cant_tps} trabajos prácticos.
+        * Contexto del Nivel: {contexto_nivel_str}
+        * Desafíos de Inclusión y cantidad de alumnos a considerar: {inclusion_str}
+
+        **Input Base del Docente (Temas, Parrilla Anual, etc.):**
+        ---
+        {plan_base}
+        ---
+        **Output Requerido:** Genera el plan detallado, actividades, y las RÚBRICAS de evaluación adaptadas
+        a los desafíos de inclusión mencionados. Si el Input Base está vacío, crea la planificación desde cero
+        basándote en el currículo estándar para {materia} en {ano_grado}.
+        """,
+    'analizar': """
+        **Rol:** Eres Guidia, un Asesor Pedagógico experto (para {nombre_docente} de {escuela_nombre}).
+        **Tarea:** ANALIZAR el siguiente documento.
+        **Acciones Requeridas:** {accion_str} (Ej. Generar Rúbricas, Resumir para suplente, Sugerir adaptaciones).
+        **Input Base (Documento Pegado):**
+        ---
+        {plan_base}
+        ---
+        **Output Requerido:** Entrega un informe claro en Markdown que cumpla con las acciones pedidas.
+        Si se piden Rúbricas, genéralas. Si se pide Resumen, que sea claro y conciso.
+        """,
+    'adaptar': """
+        **Rol:** Eres Guidia, un Asesor Pedagógico experto en adaptaciones rápidas.
+        **Tarea:** ADAPTAR una actividad diaria para {nombre_docente} (Escuela: {escuela_nombre}).
+        **Desafíos de Inclusión:** {inclusion_str}
+        **Input Base (Actividad Diaria):**
+        ---
+        {plan_base}
+        ---
+        **Output Requerido:** Genera 2-3 sugerencias de adaptación concretas y el párrafo para el informe de GEI.
+        """,
+    'analizar_parte': """
+        **Rol:** Eres Guidia, un Asesor Pedagógico experto (para {nombre_docente} de {escuela_nombre}).
+        **Tarea:** Estás analizando la PARTE {numero} de {total} de una planificación larga.
+        **Acciones Requeridas:** {accion_str}
+        **Fragmento del Documento:**
+        ---
+        {plan_base}
+        ---
+        **Output Requerido:** Extrae en Markdown breve solo lo que hace falta para las acciones pedidas sobre
+        ESTA parte: temas y objetivos clave, criterios de evaluación para las rúbricas y puntos que necesiten
+        adaptaciones de inclusión. Sin introducción ni conclusión: otro paso unirá todas las partes.
+        """,
+    'analizar_union': """
+        **Rol:** Eres Guidia, un Asesor Pedagógico experto (para {nombre_docente} de {escuela_nombre}).
+        **Tarea:** UNIR los informes parciales de las {total} partes de una planificación en un único informe.
+        **Acciones Requeridas:** {accion_str} (Ej. Generar Rúbricas, Resumir para suplente, Sugerir adaptaciones).
+        **Informes Parciales:**
+        ---
+        {plan_base}
+        ---
+        **Output Requerido:** Entrega un informe claro en Markdown que cumpla con las acciones pedidas para el
+        documento completo, sin repetir contenido. Si se piden Rúbricas, genéralas. Si se pide Resumen, que sea
+        claro y conciso.
+        """,
+    'personalizar': """
+        **Rol:** Eres Guidia, un Asesor Pedagógico experto en Nivel {nivel} en una escuela {contexto} de Mendoza.
+        **Cliente:** {nombre_docente} (Escuela: {escuela_nombre}).
+        **Tarea:** AJUSTAR la siguiente "{plan_str}" para la materia {materia}, en el año/grado {ano_grado}, que
+        ya está hecha para un curso estándar. No la rehagas: conserva su estructura y contenidos y cambia solo
+        lo necesario para este curso.
+
+        **Contexto del Aula y Plan:**
+        * Días de clase: {dias_clase}
+        * Cantidad de Alumnos: {cant_alumnos}
+        * Carga evaluativa: {cant_eval} evaluaciones y {cant_tps} trabajos prácticos.
+        * Contexto del Nivel: {contexto_nivel_str}
+        * Desafíos de Inclusión y cantidad de alumnos a considerar: {inclusion_str}
+
+        **Planificación a Ajustar:**
+        ---
+        {plan_base}
+        ---
+        **Output Requerido:** La planificación completa ya ajustada, con las RÚBRICAS de evaluación adaptadas
+        a los desafíos de inclusión mencionados.
+        """,
+    'seccion': """
+        **Rol:** Eres Guidia, un Asesor Pedagógico experto en planificación e inclusión.
+        **Tarea:** REESCRIBIR solo UNA PARTE de una planificación ya hecha. El resto del plan no cambia.
+        **Resumen del resto del plan (solo como contexto, no lo reescribas):**
+        {contexto_plan}
+
+        **Indicaciones del docente:** {indicaciones}
+        **Parte a Reescribir:**
+        ---
+        {plan_base}
+        ---
+        **Output Requerido:** Solo la parte reescrita, en Markdown y con el mismo formato: el mismo nivel de
+        título y, si es una tabla (ej. una rúbrica), una tabla con las mismas columnas. Sin introducción ni
+        comentarios.
+        """,
+    'crear_estructurado': """
+        **Rol:** Eres Guidia, un Asesor Pedagógico experto en Nivel {nivel} en una escuela {contexto} de Mendoza.
+        **Cliente:** {nombre_docente} (Escuela: {escuela_nombre}).
+        **Tarea:** CREAR una "{plan_str}" para la materia {materia}, en el año/grado {ano_grado}.
+
+        **Contexto del Aula y Plan:**
+        * Días de clase: {dias_clase}
+        * Cantidad de Alumnos: {cant_alumnos}
+        * Carga evaluativa: {cant_eval} evaluaciones y {cant_tps} trabajos prácticos.
+        * Contexto del Nivel: {contexto_nivel_str}
+        * Desafíos de Inclusión y cantidad de alumnos a considerar: {inclusion_str}
+
+        **Input Base del Docente (Temas, Parrilla Anual, etc.):**
+        ---
+        {plan_base}
+        ---
+        **Output Requerido:** SOLO un objeto JSON (sin Markdown ni texto alrededor) con esta forma:
+        {{"titulo": "...", "fundamentacion": "...",
+          "unidades": [{{"titulo": "...", "periodo": "...", "objetivos": ["..."], "contenidos": ["..."],
+                         "actividades": [{{"titulo": "...", "descripcion": "...", "duracion": "...",
+                                          "adaptaciones": ["..."]}}],
+                         "evaluacion": "..."}}]}}
+        En "adaptaciones" van los ajustes de cada actividad para los desafíos de inclusión mencionados.
+        No incluyas rúbricas: se generan aparte. Texto plano en cada campo, sin Markdown. Si el Input Base
+        está vacío, crea la planificación desde cero basándote en el currículo estándar para {materia}
+        en {ano_grado}.
+        """,
+    'rubrica': """
+        **Rol:** Eres Guidia, un Asesor Pedagógico experto en evaluación inclusiva en Nivel {nivel}.
+        **Tarea:** Crear una RÚBRICA de evaluación para la materia {materia}, en el año/grado {ano_grado},
+        pensada para {destinatarios}. Tiene que servir para cualquier planificación de esa materia y año:
+        criterios generales de la materia, no de un tema puntual.
+        **Output Requerido:** SOLO un objeto JSON (sin Markdown ni texto alrededor) con esta forma:
+        {{"criterios": [{{"criterio": "...", "logrado": "...", "en_proceso": "...", "inicial": "..."}}],
+          "sugerencias": ["..."]}}
+        Entre 4 y 6 criterios. En "sugerencias", 2 o 3 ajustes concretos de la forma de evaluar.
+        Texto plano en cada campo, sin Markdown.
+        """,
+}
+
+
+class PromptConstruido(NamedTuple):
+    texto: str
+    tokens_antes: int    # Lo que se habría mandado sin limpiar ni recortar
+    tokens_despues: int  # Lo que realmente se manda
+    recortado: bool
+
+
+def estimar_tokens(texto):
+    return math.ceil(len(texto or '') / CARACTERES_POR_TOKEN)
+
+
+def limpiar_texto(texto):
+    """Normaliza espacios y quita líneas/párrafos duplicados del texto pegado."""
+    texto = unicodedata.normalize('NFC', texto or '').replace('\r\n', '\n').replace('\r', '\n')
+    parrafos_vistos = set()
+    parrafos = []
+    for parrafo in re.split(r'\n\s*\n', texto):
+        lineas = []
+        for linea in parrafo.split('\n'):
+            # Se conserva la sangría (listas anidadas) pero no los espacios repetidos
+            sangria = re.match(r'[ \t]*', linea).group().replace('\t', '  ')
+            linea = sangria + re.sub(r'[ \t]+', ' ', linea).strip()
+            if linea.strip() and (not lineas or linea != lineas[-1]):
+                lineas.append(linea)
+        if not lineas:
+            continue
+        clave = re.sub(r'\W+', ' ', ' '.join(lineas)).strip().lower()
+        # Encabezados/pies de página repetidos y bloques pegados dos veces
+        if clave in parrafos_vistos:
+            continue
+        parrafos_vistos.add(clave)
+        parrafos.append('\n'.join(lineas))
+    return '\n\n'.join(parrafos)
+
+
+def recortar_a_presupuesto(texto, max_tokens):
+    """Conserva los párrafos iniciales hasta llenar el presupuesto de tokens."""
+    if estimar_tokens(texto) <= max_tokens:
+        return texto, False
+    parrafos = texto.split('\n\n')
+    conservados = []
+    usados = 0
+    for parrafo in parrafos:
+        tokens = estimar_tokens(parrafo) + 1
+        if usados + tokens > max_tokens:
+            break
+        conservados.append(parrafo)
+        usados += tokens
+    if not conservados:
+        # Un único párrafo gigante: se corta por caracteres
+        conservados = [parrafos[0][:max_tokens * CARACTERES_POR_TOKEN]]
+    omitidos = len(parrafos) - len(conservados)
+    conservados.append(f"[... se omitieron {omitidos} párrafo/s del final por longitud ...]")
+    return '\n\n'.join(conservados), True
+
+
+def construir_prompt(accion, plan_base='', **campos):
+    """Arma el prompt de `accion` ('crear', 'analizar' o 'adaptar')."""
+    plantilla = PLANTILLAS[accion]
+    tokens_antes = estimar_tokens(plantilla.format(plan_base=plan_base or '', **campos))
+
+    campos = {k: limpiar_texto(v) if isinstance(v, str) else v for k, v in campos.items()}
+    plan_base, recortado = recortar_a_presupuesto(limpiar_texto(plan_base), PRESUPUESTO_TOKENS[accion])
+    texto = textwrap.dedent(plantilla).strip().format(plan_base=plan_base, **campos)
+
+    prompt = PromptConstruido(texto, tokens_antes, estimar_tokens(texto), recortado)
+    registrar(accion, prompt)
+    return prompt
+
+
+def prompt_crear(nombre_docente, escuela_nombre, nivel, contexto,
+                 tipo_plan_crear, materia, ano_grado, mes_plan, cant_alumnos,
+                 dias_clase, cant_eval, cant_tps, inclusion_cant,
+                 plan_base_crear, dias_patios, libro_matriz, contexto_general, accion='crear'):
+    """Prompt de "Crear Planificación" a partir de los campos del formulario.
+
+    Lo usan la generación normal, la de varios meses en lote y la biblioteca
+    pregenerada (con accion='personalizar', `plan_base_crear` es el plan a ajustar).
+    """
+    # Añadir el mes al tipo de plan si está definido
+    plan_str = f"{tipo_plan_crear} para el mes de {mes_plan}" if mes_plan and 'Mensual' in tipo_plan_crear else tipo_plan_crear
+
+    # Procesar los desafíos de inclusión
+    desafios_con_cantidad = []
+    for i, cant in enumerate(inclusion_cant):
+        if cant and cant > 0:
+            desafio_nombre = DESAFIOS_INCLUSION[i].split(' (')[0] # Tomar nombre corto
+            desafios_con_cantidad.append(f"{desafio_nombre} ({cant} alumno/s)")
+
+    inclusion_str = ", ".join(desafios_con_cantidad) if desafios_con_cantidad else "ninguno especificado"
+
+    contexto_nivel_str = ""
+    if nivel == 'Primario' and dias_patios:
+        contexto_nivel_str = f"Eventos especiales a considerar (días patrios): {dias_patios}"
+    elif nivel == 'Secundario' and libro_matriz:
+        contexto_nivel_str = f"Temario / Libro Matriz de referencia: {libro_matriz}"
+    elif contexto_general:
+        contexto_nivel_str = f"Contexto general provisto: {contexto_general}"
+
+    return construir_prompt(
+        accion, plan_base=plan_base_crear,
+        nivel=nivel, contexto=contexto, nombre_docente=nombre_docente, escuela_nombre=escuela_nombre,
+        plan_str=plan_str, materia=materia, ano_grado=ano_grado, dias_clase=dias_clase,
+        cant_alumnos=cant_alumnos, cant_eval=cant_eval, cant_tps=cant_tps,
+        contexto_nivel_str=contexto_nivel_str, inclusion_str=inclusion_str,
+    )
+
+
+def registrar(accion, prompt):
+    estadisticas.incrementar(f'prompt_{accion}_cantidad')
+    estadisticas.incrementar(f'prompt_{accion}_tokens_antes', prompt.tokens_antes)
+    estadisticas.incrementar(f'prompt_{accion}_tokens_despues', prompt.tokens_despues)
+
+
+def resumen():
+    """Tokens antes/después de limpiar, acumulados por acción."""
+    datos = {}
+    for accion in PLANTILLAS:
+        antes = estadisticas.valor(f'prompt_{accion}_tokens_antes')
+        despues = estadisticas.valor(f'prompt_{accion}_tokens_despues')
+        datos[accion] = {
+            'prompts': estadisticas.valor(f'prompt_{accion}_cantidad'),
+            'tokens_antes': antes,
+            'tokens_despues': despues,
+            'ahorro': round(1 - despues / antes, 3) if antes else 0.0,
+        }
+    return datos
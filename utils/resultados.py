@@ -0,0 +1,36 @@
+import os
+import secrets
+
+import diskcache
+
+from utils.config import CACHE_DIR
+
+# --- Almacén de Pedidos y Resultados ---
+# Los pedidos a la IA (con los textos pegados) y los planes generados quedan
+# guardados en el servidor bajo un ID corto. El navegador solo guarda ese ID
+# en un dcc.Store, así descargar el PDF o consultar el estado de un trabajo
+# en segundo plano manda unos pocos bytes en vez del documento completo.
+
+TTL_SEGUNDOS = int(os.environ.get('GUIDIA_RESULTADOS_TTL', 24 * 3600))  # 1 día
+TAMANO_MAXIMO = int(os.environ.get('GUIDIA_RESULTADOS_MAX_MB', 64)) * 1024 * 1024
+
+# Al superar el tamaño máximo se descartan los menos usados (LRU)
+_almacen = diskcache.Cache(
+    os.path.join(CACHE_DIR, 'resultados'),
+    size_limit=TAMANO_MAXIMO,
+    eviction_policy='least-recently-used',
+)
+
+
+def guardar(valor, resultado_id=None):
+    """Guarda un pedido o un resultado y devuelve su ID (con `resultado_id`, reemplaza ese)."""
+    resultado_id = resultado_id or secrets.token_urlsafe(12)
+    _almacen.set(resultado_id, valor, expire=TTL_SEGUNDOS)
+    return resultado_id
+
+
+def obtener(resultado_id):
+    """El valor guardado, o None si el ID no existe o ya expiró."""
+    if not resultado_id:
+        return None
+    return _almacen.get(resultado_id)
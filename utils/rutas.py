@@ -0,0 +1,94 @@
+import asyncio
+import os
+import time
+from typing import NamedTuple, Optional
+
+from utils import llm, metricas
+from utils.config import MODELO_IA
+from utils.prompts import estimar_tokens
+
+# --- Elección del Modelo por Pedido ---
+# No todo necesita el modelo pro: una adaptación rápida (2-3 sugerencias y un
+# párrafo para el GEI) sale bien y en pocos segundos con el modelo rápido, y
+# un plan anual sí justifica el pro. Cada ruta de la tabla dice qué modelo
+# usar según la acción y el tamaño del prompt, su SLO de latencia y un modelo
+# de respaldo más rápido. Si al vencer el SLO el principal todavía no mostró
+# nada, o falla, se pasa al de respaldo; si ya empezó a responder en streaming
+# se lo deja terminar (cambiarlo borraría el texto que el docente está leyendo).
+
+ACTIVAS = os.environ.get('GUIDIA_RUTAS', '1') == '1'  # '0': todo al modelo por defecto, como antes
+MODELO_RAPIDO = os.environ.get('GUIDIA_MODELO_RAPIDO', 'models/gemini-flash-latest')
+
+
+class Ruta(NamedTuple):
+    nombre: str
+    accion: str
+    hasta_tokens: Optional[int]   # Tamaño máximo del prompt para usar esta ruta (None: cualquiera)
+    modelo: str
+    slo_segundos: float
+    respaldo: Optional[str]       # Sin respaldo, el SLO solo se mide
+
+
+# Se usa la primera ruta de la acción en la que entra el prompt
+RUTAS = [
+    Ruta('adaptar', 'adaptar', None, MODELO_RAPIDO, 10, None),
+    Ruta('crear_anual', 'crear_anual', None, MODELO_IA, 120, MODELO_RAPIDO),
+    Ruta('crear', 'crear', None, MODELO_IA, 60, MODELO_RAPIDO),
+    Ruta('analizar_corto', 'analizar', 3000, MODELO_RAPIDO, 30, None),
+    Ruta('analizar', 'analizar', None, MODELO_IA, 90, MODELO_RAPIDO),
+    Ruta('seccion', 'seccion', None, MODELO_IA, 30, MODELO_RAPIDO),
+]
+
+
+def elegir(accion, prompt):
+    """La ruta para este pedido (el modelo por defecto, sin respaldo, si ninguna aplica)."""
+    if ACTIVAS:
+        tokens = estimar_tokens(prompt)
+        for ruta in RUTAS:
+            if ruta.accion == accion and (ruta.hasta_tokens is None or tokens <= ruta.hasta_tokens):
+                return ruta
+    return Ruta(accion, accion, None, MODELO_IA, llm.TIMEOUT_SEGUNDOS, None)
+
+
+async def generar_async(ruta, prompt, al_recibir=None):
+    """Llama al modelo de la ruta y, si hace falta, al de respaldo. Devuelve (texto, modelo que respondió)."""
+    inicio = time.perf_counter()
+    recibido = False
+
+    def recibir(texto):
+        nonlocal recibido
+        recibido = True
+        al_recibir(texto)
+
+    principal = asyncio.ensure_future(
+        llm.generar_async(prompt, al_recibir=recibir if al_recibir else None, modelo=ruta.modelo))
+    modelo, motivo, resultado = ruta.modelo, None, 'error'
+    try:
+        try:
+            await asyncio.wait({principal}, timeout=ruta.slo_segundos if ruta.respaldo else None)
+            if principal.done() or recibido:
+                texto = await principal
+            else:
+                motivo = 'plazo'
+        except llm.ErrorIA:
+            if recibido or not ruta.respaldo:
+                raise
+            motivo = 'error'
+        if motivo:
+            principal.cancel()
+            metricas.incrementar('guidia_ruta_respaldos_total', ruta=ruta.nombre, motivo=motivo)
+            modelo = ruta.respaldo
+            texto = await llm.generar_async(prompt, al_recibir=al_recibir, modelo=modelo)
+        resultado = 'ok'
+        return texto, modelo
+    finally:
+        principal.cancel()  # Si ya terminó no hace nada; si cancelaron el trabajo, corta la llamada
+        duracion = time.perf_counter() - inicio
+        metricas.observar('guidia_ruta_segundos', duracion, ruta=ruta.nombre, modelo=modelo, resultado=resultado)
+        if duracion > ruta.slo_segundos:
+            metricas.incrementar('guidia_ruta_fuera_de_slo_total', ruta=ruta.nombre)
+
+
+def generar(ruta, prompt, al_recibir=None):
+    """Versión síncrona de `generar_async`, para usar desde los callbacks."""
+    return llm.ejecutar(generar_async(ruta, prompt, al_recibir=al_recibir))
@@ -0,0 +1,107 @@
+import hashlib
+import re
+
+from utils.prompts import CARACTERES_POR_TOKEN
+
+# --- Secciones de un Plan ---
+# Divide el Markdown de un plan en partes que se pueden regenerar por
+# separado: cada título (#, ##, ...) con su contenido, y cada tabla (las
+# rúbricas) como una parte propia. Unir las partes devuelve exactamente el
+# texto original. Para regenerar una parte solo se manda a Gemini esa parte
+# y un resumen corto del resto (el índice de títulos y lo que la rodea).
+
+MIN_CARACTERES = 80  # Partes más chicas (ej. un título suelto) no se ofrecen para regenerar
+TOKENS_VECINAS = 120  # Cuánto de las partes vecinas va en el contexto
+
+_TITULO = re.compile(r'^\s{0,3}#{1,6}\s')
+_FILA_TABLA = re.compile(r'^\s*\|')
+
+
+def dividir(texto):
+    """Lista de partes del plan; ''.join() de ellas devuelve el texto tal cual."""
+    secciones, actual, en_tabla = [], [], False
+    for linea in (texto or '').splitlines(keepends=True):
+        es_fila = bool(_FILA_TABLA.match(linea))
+        # Empieza una parte nueva con cada título, y al entrar o salir de una tabla
+        # (las líneas en blanco que siguen a una tabla quedan con ella)
+        if actual and (_TITULO.match(linea) or (es_fila and not en_tabla)
+                       or (en_tabla and not es_fila and linea.strip())):
+            secciones.append(''.join(actual))
+            actual = []
+        if linea.strip():
+            en_tabla = es_fila
+        actual.append(linea)
+    if actual:
+        secciones.append(''.join(actual))
+    return secciones
+
+
+def unir(secciones):
+    return ''.join(secciones)
+
+
+def regenerable(seccion):
+    return len(seccion.strip()) >= MIN_CARACTERES
+
+
+def clave(i, seccion):
+    """Identifica la parte i por su posición y su contenido (dos partes iguales no comparten clave)."""
+    return f"{i}-" + hashlib.sha1(seccion.encode('utf-8')).hexdigest()[:12]
+
+
+def buscar(secciones, clave_seccion):
+    """Posición de la parte con esa clave, o None si esa parte ya no es la que se mostró."""
+    posicion = str(clave_seccion).partition('-')[0]
+    if not posicion.isdigit():
+        return None
+    i = int(posicion)
+    return i if i < len(secciones) and clave(i, secciones[i]) == clave_seccion else None
+
+
+def titulo(secciones, i):
+    """El título que encabeza la parte i (o el último antes de ella, para tablas)."""
+    for seccion in reversed(secciones[:i + 1]):
+        primera = seccion.lstrip().split('\n', 1)[0]
+        if _TITULO.match(primera):
+            return primera.lstrip('# ').strip()
+    return "Inicio del plan"
+
+
+def _recorte(texto, desde_el_final=False):
+    maximo = TOKENS_VECINAS * CARACTERES_POR_TOKEN
+    texto = texto.strip()
+    if len(texto) <= maximo:
+        return texto
+    return '…' + texto[-maximo:] if desde_el_final else texto[:maximo] + '…'
+
+
+def _nivel(seccion):
+    """Nivel del título que abre la parte (1 para #, 2 para ##...), o None si no abre con un título."""
+    primera = seccion.lstrip().split('\n', 1)[0]
+    return len(primera) - len(primera.lstrip('#')) if _TITULO.match(primera) else None
+
+
+def contexto(secciones, i):
+    """Resumen compacto del resto del plan para regenerar la parte i.
+
+    El índice lleva los títulos principales (# y ##) y, dentro del mismo
+    apartado que la parte, también los subtítulos: en un plan anual no hacen
+    falta las semanas de los otros meses.
+    """
+    niveles = [_nivel(s) for s in secciones]
+    desde = max((j for j in range(i + 1) if niveles[j] is not None and niveles[j] <= 2), default=0)
+    hasta = min((j for j in range(i + 1, len(secciones)) if niveles[j] is not None and niveles[j] <= 2),
+                default=len(secciones))
+    indice = []
+    for j, seccion in enumerate(secciones):
+        if niveles[j] is not None and (niveles[j] <= 2 or desde <= j < hasta):
+            marca = '  <- ESTA PARTE' if j == i else ''
+            indice.append(seccion.lstrip().split('\n', 1)[0].strip() + marca)
+    if niveles[i] is None:
+        indice.append(f"(La parte a regenerar es una tabla dentro de \"{titulo(secciones, i)}\")")
+    partes = ["Índice del plan:\n" + '\n'.join(indice)]
+    if i > 0:
+        partes.append("Justo antes de esta parte:\n" + _recorte(secciones[i - 1], desde_el_final=True))
+    if i + 1 < len(secciones):
+        partes.append("Justo después de esta parte:\n" + _recorte(secciones[i + 1]))
+    return '\n\n'.join(partes)
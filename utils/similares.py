@@ -0,0 +1,170 @@
+import hashlib
+import os
+import random
+import re
+import secrets
+import unicodedata
+from typing import NamedTuple
+
+import diskcache
+
+from utils import estadisticas
+from utils.config import CACHE_DIR
+
+# --- Índice de Pedidos Similares ---
+# El caché de respuestas solo acierta si el prompt es idéntico. Acá se indexan
+# los pedidos ya generados por sus campos normalizados ("Matemática, 5to
+# Grado" == "matematica 5° grado") más una firma MinHash del texto pegado, con
+# LSH (bandas) para encontrar candidatos sin recorrer todo el índice. Si un
+# pedido nuevo es lo bastante parecido a uno anterior, su plan se ofrece al
+# instante como punto de partida (o se usa como plan base del prompt).
+
+UMBRAL = float(os.environ.get('GUIDIA_SIMILITUD_UMBRAL', 0.85))  # Jaccard estimado del texto pegado
+# 'ofrecer': devolver el plan parecido al instante | 'semilla': usarlo como
+# plan base del prompt | 'no': desactivado
+MODO = os.environ.get('GUIDIA_SIMILITUD_MODO', 'ofrecer')
+TTL_SEGUNDOS = int(os.environ.get('GUIDIA_CACHE_TTL', 7 * 24 * 3600))  # Igual que el caché de respuestas
+TAMANO_MAXIMO = int(os.environ.get('GUIDIA_SIMILITUD_MAX_MB', 128)) * 1024 * 1024
+
+PERMUTACIONES = 64
+BANDAS = 16  # 16 bandas x 4 filas: candidatos desde ~50% de similitud
+FILAS_POR_BANDA = PERMUTACIONES // BANDAS
+PALABRAS_POR_SHINGLE = 3
+MAX_CANDIDATOS_POR_BANDA = 32
+
+_PRIMO = (1 << 61) - 1
+_MASCARA = (1 << 32) - 1
+_azar = random.Random(20251104)  # Fijo: las firmas tienen que valer entre procesos y reinicios
+_COEFICIENTES = [(_azar.randrange(1, _PRIMO), _azar.randrange(0, _PRIMO)) for _ in range(PERMUTACIONES)]
+
+_indice = diskcache.Cache(
+    os.path.join(CACHE_DIR, 'similares'),
+    size_limit=TAMANO_MAXIMO,
+    eviction_policy='least-recently-used',
+)
+
+ORDINALES = {
+    'primer': '1', 'primero': '1', 'primera': '1', 'segundo': '2', 'segunda': '2',
+    'tercer': '3', 'tercero': '3', 'tercera': '3', 'cuarto': '4', 'cuarta': '4',
+    'quinto': '5', 'quinta': '5', 'sexto': '6', 'sexta': '6', 'septimo': '7', 'septima': '7',
+}
+PALABRAS_IGNORADAS = {'grado', 'ano', 'anos', 'de', 'del', 'el', 'la', 'y', 'sala', 'nivel'}
+
+
+class Similar(NamedTuple):
+    texto: str
+    similitud: float
+
+
+def normalizar(valor):
+    """Forma canónica de un campo: sin tildes, mayúsculas ni ordinales escritos."""
+    if isinstance(valor, (list, tuple)):
+        return ','.join(normalizar(v) for v in valor)
+    texto = unicodedata.normalize('NFKD', str(valor if valor is not None else ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    texto = re.sub(r'\b(\d+)(?:ro|do|to|mo|vo|no|er|o|a)\b', r'\1', texto.replace('°', ''))  # 5to, 1er, 5° -> 5
+    palabras = [ORDINALES.get(p, p) for p in re.findall(r'\w+', texto)]
+    return ' '.join(p for p in palabras if p not in PALABRAS_IGNORADAS)
+
+
+def _shingles(texto):
+    palabras = normalizar(texto).split()
+    if len(palabras) < PALABRAS_POR_SHINGLE:
+        return {' '.join(palabras)} if palabras else set()
+    return {' '.join(palabras[i:i + PALABRAS_POR_SHINGLE])
+            for i in range(len(palabras) - PALABRAS_POR_SHINGLE + 1)}
+
+
+def firma(texto):
+    """Firma MinHash del texto (tupla de PERMUTACIONES enteros). None si está vacío."""
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big') & _MASCARA
+              for s in _shingles(texto)]
+    if not hashes:
+        return None
+    return tuple(min((a * h + b) % _PRIMO for h in hashes) for a, b in _COEFICIENTES)
+
+
+def similitud(firma_a, firma_b):
+    """Jaccard estimado entre dos firmas (dos textos vacíos son idénticos)."""
+    if firma_a is None or firma_b is None:
+        return 1.0 if firma_a == firma_b else 0.0
+    return sum(x == y for x, y in zip(firma_a, firma_b)) / PERMUTACIONES
+
+
+def _clave_campos(accion, campos):
+    contenido = accion + '\n' + '\n'.join(f'{k}={normalizar(campos[k])}' for k in sorted(campos))
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:16]
+
+
+def _bandas(clave, firma_texto):
+    if firma_texto is None:
+        return [f'banda:{clave}:vacio']
+    bandas = []
+    for i in range(BANDAS):
+        filas = repr(firma_texto[i * FILAS_POR_BANDA:(i + 1) * FILAS_POR_BANDA]).encode('utf-8')
+        bandas.append(f'banda:{clave}:{i}:{hashlib.blake2b(filas, digest_size=8).hexdigest()}')
+    return bandas
+
+
+def _cambiar_nombres(texto, anteriores, actuales):
+    # El plan puede nombrar al docente y la escuela del pedido original
+    for anterior, actual in zip(anteriores, actuales):
+        if anterior and actual and len(anterior) >= 3:
+            texto = texto.replace(anterior, actual)
+    return texto
+
+
+def buscar(accion, campos, texto_base, nombres=()):
+    """El plan de un pedido anterior parecido a este, o None.
+
+    `campos` deben coincidir (normalizados); `texto_base` (lo pegado) alcanza
+    con que supere el UMBRAL. `nombres` (docente, escuela) reemplazan a los
+    del pedido original en el texto devuelto.
+    """
+    if MODO == 'no':
+        return None
+    clave = _clave_campos(accion, campos)
+    firma_texto = firma(texto_base)
+    candidatos = set()
+    for banda in _bandas(clave, firma_texto):
+        candidatos.update(_indice.get(banda, ()))
+
+    mejor = None
+    for entrada_id in candidatos:
+        entrada = _indice.get(entrada_id)
+        if entrada is None:  # Expirada o descartada por tamaño
+            continue
+        valor = similitud(firma_texto, entrada['firma'])
+        if valor >= UMBRAL and (mejor is None or valor > mejor.similitud):
+            mejor = Similar(_cambiar_nombres(entrada['texto'], entrada['nombres'], nombres), valor)
+
+    estadisticas.incrementar('similares_aciertos' if mejor else 'similares_fallos')
+    return mejor
+
+
+def registrar(accion, campos, texto_base, texto_generado, nombres=()):
+    """Agrega un plan recién generado al índice."""
+    if MODO == 'no':
+        return
+    clave = _clave_campos(accion, campos)
+    firma_texto = firma(texto_base)
+    entrada_id = 'entrada:' + secrets.token_hex(8)
+    _indice.set(entrada_id, {'firma': firma_texto, 'texto': texto_generado, 'nombres': tuple(nombres)}, expire=TTL_SEGUNDOS)
+    for banda in _bandas(clave, firma_texto):
+        with _indice.transact():  # Leer y escribir la lista sin pisar a otro worker
+            ids = _indice.get(banda, [])
+            ids = [entrada_id] + ids[:MAX_CANDIDATOS_POR_BANDA - 1]
+            _indice.set(banda, ids, expire=TTL_SEGUNDOS)
+
+
+def resumen():
+    aciertos = estadisticas.valor('similares_aciertos')
+    fallos = estadisticas.valor('similares_fallos')
+    consultas = aciertos + fallos
+    return {
+        'modo': MODO,
+        'umbral': UMBRAL,
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': round(aciertos / consultas, 3) if consultas else 0.0,
+    }
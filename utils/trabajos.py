@@ -0,0 +1,119 @@
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+import diskcache
+import psutil
+
+from utils import metricas
+from utils.config import CACHE_DIR
+
+# --- Registro de Trabajos en Segundo Plano ---
+# Cada callback en segundo plano (generación, PDF) corre en su propio proceso.
+# Para que cinco docentes generando a la vez no saturen la máquina, cada tipo
+# de trabajo tiene un número fijo de "turnos": el resto espera en cola.
+# El estado vive en disco, así que lo ven todos los workers de Gunicorn.
+# Cada trabajo saca un número al llegar y los turnos se dan en ese orden (no
+# al primero que consulta), así la posición en cola que ve el docente es real.
+
+TURNOS_POR_TIPO = {
+    'ia': int(os.environ.get('GUIDIA_MAX_TRABAJOS_IA', 4)),
+    'pdf': int(os.environ.get('GUIDIA_MAX_TRABAJOS_PDF', 2)),
+}
+DURACION_MAXIMA = 15 * 60  # Un trabajo colgado libera su turno a los 15 min
+INTERVALO_ESPERA = 0.5
+
+_estado = diskcache.Cache(os.path.join(CACHE_DIR, 'trabajos'))
+
+
+def proceso_vivo(pid):
+    try:
+        return psutil.pid_exists(pid) and psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.Error:
+        return False
+
+
+def _turno_libre(clave):
+    # Libre si nadie lo tiene o si el proceso que lo tenía murió (ej. trabajo cancelado)
+    actual = _estado.get(clave)
+    return actual is None or not proceso_vivo(actual[0])
+
+
+def _tomar_turno(tipo, trabajo_id):
+    duenio = (os.getpid(), trabajo_id)
+    for i in range(TURNOS_POR_TIPO.get(tipo, 1)):
+        clave = f'turno:{tipo}:{i}'
+        if _estado.add(clave, duenio, expire=DURACION_MAXIMA):
+            return clave
+        with _estado.transact():
+            if _turno_libre(clave):
+                _estado.set(clave, duenio, expire=DURACION_MAXIMA)
+                return clave
+    return None
+
+
+def _turnos_libres(tipo):
+    return sum(_turno_libre(f'turno:{tipo}:{i}') for i in range(TURNOS_POR_TIPO.get(tipo, 1)))
+
+
+def _trabajos(tipo=None):
+    for clave in list(_estado.iterkeys()):
+        if not str(clave).startswith('trabajo:'):
+            continue
+        trabajo = _estado.get(clave)
+        if trabajo and (tipo is None or trabajo['tipo'] == tipo) and proceso_vivo(trabajo['pid']):
+            yield trabajo
+
+
+def posicion_en_cola(tipo, trabajo_id):
+    en_cola = sorted((t.get('numero', 0), t['id']) for t in _trabajos(tipo) if t['estado'] == 'en_cola')
+    ids = [t_id for _, t_id in en_cola]
+    return ids.index(trabajo_id) + 1 if trabajo_id in ids else 0
+
+
+def resumen():
+    """Cantidad de trabajos ejecutando y en cola, por tipo."""
+    conteo = {tipo: {'ejecutando': 0, 'en_cola': 0} for tipo in TURNOS_POR_TIPO}
+    for trabajo in _trabajos():
+        conteo.setdefault(trabajo['tipo'], {'ejecutando': 0, 'en_cola': 0})[trabajo['estado']] += 1
+    return conteo
+
+
+@contextmanager
+def turno(tipo, al_esperar=None):
+    """Espera un turno libre para `tipo` y lo retiene mientras dura el bloque.
+
+    Devuelve el ID corto del trabajo. `al_esperar(trabajo_id, posicion)` se llama
+    periódicamente mientras el trabajo está en cola.
+    """
+    trabajo_id = uuid.uuid4().hex[:8]
+    clave_trabajo = f'trabajo:{trabajo_id}'
+    trabajo = {'id': trabajo_id, 'tipo': tipo, 'estado': 'en_cola', 'pid': os.getpid(), 'creado': time.time(),
+               'numero': _estado.incr(f'numero:{tipo}')}
+    _estado.set(clave_trabajo, trabajo, expire=DURACION_MAXIMA)
+
+    inicio = time.perf_counter()
+    try:
+        while True:
+            # Con N turnos libres los toman los N primeros de la cola; los demás esperan
+            posicion = posicion_en_cola(tipo, trabajo_id)
+            if posicion <= _turnos_libres(tipo):
+                clave_turno = _tomar_turno(tipo, trabajo_id)
+                if clave_turno is not None:
+                    break
+            if al_esperar:
+                al_esperar(trabajo_id, posicion)
+            time.sleep(INTERVALO_ESPERA)
+            _estado.touch(clave_trabajo, expire=DURACION_MAXIMA)  # Una cola larga no lo hace vencer
+    except BaseException:
+        _estado.delete(clave_trabajo)  # Cancelado mientras esperaba: deja de ocupar un lugar en la cola
+        raise
+    metricas.observar('guidia_trabajos_espera_segundos', time.perf_counter() - inicio, tipo=tipo)
+
+    _estado.set(clave_trabajo, {**trabajo, 'estado': 'ejecutando'}, expire=DURACION_MAXIMA)
+    try:
+        yield trabajo_id
+    finally:
+        _estado.delete(clave_turno)
+        _estado.delete(clave_trabajo)
@@ -0,0 +1,179 @@
+import concurrent.futures
+import os
+import secrets
+import threading
+import time
+
+import diskcache
+
+from utils import estadisticas
+from utils.config import CACHE_DIR
+from utils.llm import ErrorIA
+from utils.trabajos import proceso_vivo
+
+# --- Pedidos Idénticos en Curso (single-flight) ---
+# Un doble clic en "Generar", una recarga mientras se espera o un curso entero
+# pidiendo lo mismo a la vez lanzaban una llamada a Gemini por pedido. Acá el
+# primero en llegar (el "líder") hace la llamada y los demás esperan su
+# resultado, viendo el mismo texto parcial mientras llega.
+#
+# Dos niveles: entre hilos del mismo proceso, con un Future en memoria; y
+# entre procesos (workers de Gunicorn, callbacks en segundo plano), con una
+# tabla en disco: quién es el líder de cada clave, su texto parcial y su
+# resultado. Si el proceso líder muere (ej. trabajo cancelado), otro toma
+# su lugar.
+
+DURACION_MAXIMA = 15 * 60  # Igual que utils/trabajos.py: un líder colgado libera la clave
+VIDA_RESULTADO = 5 * 60  # Lo que se guarda el resultado para los que estaban esperando
+INTERVALO_ESPERA = 0.5
+
+_tabla = diskcache.Cache(os.path.join(CACHE_DIR, 'vuelo_unico'))
+_locales = {}  # clave -> _Vuelo de este proceso
+_lock_locales = threading.Lock()
+
+
+class _Vuelo:
+    def __init__(self):
+        self.futuro = concurrent.futures.Future()
+        self.parcial = ''
+
+
+def compartir(clave, generar, al_recibir=None, al_unirse=None):
+    """Ejecuta `generar(al_recibir)` una sola vez por `clave` entre los pedidos simultáneos.
+
+    Todos reciben lo mismo que devolvió `generar` (o el mismo error, como ErrorIA). Los que
+    esperan a otro reciben también el texto parcial por `al_recibir`, y se
+    llama `al_unirse()` al empezar a esperar.
+    """
+    with _lock_locales:
+        vuelo = _locales.get(clave)
+        es_lider = vuelo is None
+        if es_lider:
+            vuelo = _locales[clave] = _Vuelo()
+    if not es_lider:
+        _unirse(al_unirse)
+        return _esperar_hilo(vuelo, al_recibir)
+
+    try:
+        texto = _entre_procesos(clave, generar, vuelo, al_recibir, al_unirse)
+    except BaseException as e:
+        vuelo.futuro.set_exception(e)
+        raise
+    else:
+        vuelo.futuro.set_result(texto)
+        return texto
+    finally:
+        with _lock_locales:
+            _locales.pop(clave, None)
+
+
+def _unirse(al_unirse):
+    estadisticas.incrementar('vuelo_unico_compartidos')
+    if al_unirse:
+        al_unirse()
+
+
+def _esperar_hilo(vuelo, al_recibir):
+    visto = ''
+    while True:
+        try:
+            return vuelo.futuro.result(timeout=INTERVALO_ESPERA)
+        except concurrent.futures.TimeoutError:
+            if al_recibir and vuelo.parcial != visto:
+                visto = vuelo.parcial
+                al_recibir(visto)
+
+
+def _entre_procesos(clave, generar, vuelo, al_recibir, al_unirse):
+    clave_lider = f'lider:{clave}'
+    unido = False
+    while True:
+        vuelo_id = secrets.token_hex(8)
+        if _tabla.add(clave_lider, (os.getpid(), vuelo_id), expire=DURACION_MAXIMA):
+            estadisticas.incrementar('vuelo_unico_lideres')
+            return _liderar(clave_lider, vuelo_id, generar, vuelo, al_recibir)
+
+        lider = _tabla.get(clave_lider)
+        if lider is None:
+            # El líder terminó entre el add() y el get(): su resultado sigue guardado
+            resultado = _tabla.get(f'resultado:{_tabla.get(f"ultimo:{clave_lider}")}')
+            if resultado is not None:
+                if not unido:
+                    _unirse(al_unirse)
+                return _desempaquetar(resultado)
+            continue
+        if not proceso_vivo(lider[0]):
+            with _tabla.transact():
+                if _tabla.get(clave_lider) == lider:
+                    _tabla.delete(clave_lider)
+            continue
+
+        if not unido:
+            _unirse(al_unirse)
+            unido = True
+        resultado = _esperar_proceso(clave_lider, lider, vuelo, al_recibir)
+        if resultado is not None:
+            return _desempaquetar(resultado)
+        # El líder desapareció sin dejar resultado: alguien (quizás este) lo reemplaza
+
+
+def _desempaquetar(resultado):
+    estado, texto = resultado
+    if estado == 'error':
+        raise ErrorIA(texto)
+    return texto
+
+
+def _liderar(clave_lider, vuelo_id, generar, vuelo, al_recibir):
+    ultima_publicacion = 0.0
+
+    def publicar(parcial):
+        nonlocal ultima_publicacion
+        vuelo.parcial = parcial
+        if al_recibir:
+            al_recibir(parcial)
+        ahora = time.monotonic()
+        if ahora - ultima_publicacion >= INTERVALO_ESPERA:  # No escribir a disco con cada fragmento
+            ultima_publicacion = ahora
+            _tabla.set(f'parcial:{vuelo_id}', parcial, expire=DURACION_MAXIMA)
+
+    def guardar_resultado(resultado):
+        _tabla.set(f'resultado:{vuelo_id}', resultado, expire=VIDA_RESULTADO)
+        _tabla.set(f'ultimo:{clave_lider}', vuelo_id, expire=VIDA_RESULTADO)
+
+    try:
+        texto = generar(publicar)
+    except Exception as e:
+        guardar_resultado(('error', str(e) or type(e).__name__))
+        raise
+    else:
+        guardar_resultado(('ok', texto))
+        return texto
+    finally:
+        # El resultado se escribe antes de soltar la clave: nadie queda sin verlo
+        _tabla.delete(clave_lider)
+        _tabla.delete(f'parcial:{vuelo_id}')
+
+
+def _esperar_proceso(clave_lider, lider, vuelo, al_recibir):
+    pid, vuelo_id = lider
+    visto = ''
+    while True:
+        resultado = _tabla.get(f'resultado:{vuelo_id}')
+        if resultado is not None:
+            return resultado
+        if _tabla.get(clave_lider) != lider or not proceso_vivo(pid):
+            return _tabla.get(f'resultado:{vuelo_id}')
+        parcial = _tabla.get(f'parcial:{vuelo_id}')
+        if parcial and parcial != visto:
+            visto = vuelo.parcial = parcial  # También para los hilos que esperan a este
+            if al_recibir:
+                al_recibir(parcial)
+        time.sleep(INTERVALO_ESPERA)
+
+
+def resumen():
+    return {
+        'lideres': estadisticas.valor('vuelo_unico_lideres'),
+        'compartidos': estadisticas.valor('vuelo_unico_compartidos'),
+    }